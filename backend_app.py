@@ -1,21 +1,50 @@
 import subprocess
 import os
 import json
-from flask import Flask, request, jsonify, send_from_directory
+import datetime
+import functools
+import shutil
+import threading
+import time
+import uuid
+import concurrent.futures
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context, has_request_context
+from flask.json.provider import DefaultJSONProvider
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
 import sys
-from dotenv import load_dotenv
 
-# Load environment variables from .env file in the project root
-load_dotenv()
+# Load environment variables from .env file in the project root. This comes before the
+# src.APIs imports because many of their settings are read when the modules are imported.
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("Warning: python-dotenv not installed; .env file not loaded.", file=sys.stderr)
 
-# Import refactored astronomy functions
-from src.APIs.astronomy_api import get_location_from_ip, get_star_chart_image_url
+from src.APIs.lazy_import import lazy_module
+from src.APIs.script_template import TemplateClient, is_supported as template_supported
+from src.APIs.static_cache import send_static, file_fingerprint, available_encodings
+from src.APIs.job_queue import JobStore, JobWorkerPool, public_view, TERMINAL_STATES, DEFAULT_DEDUP_TTL
+from src.APIs.shared_cache import get_shared_cache
+from src.APIs.upstream import (hedge_metrics, breaker_state, stale_while_revalidate, BREAKER_COOLDOWN, OPEN as BREAKER_OPEN,
+                                CIRCUIT_OPEN_EXIT_CODE, CircuitOpenError)
+from src.APIs import warmup
+from src.APIs import tile_cache
+from src.APIs import deadlines
+from src.APIs import admission
+from src.APIs.gazetteer import get_gazetteer
+from src.APIs import response_encoding
+
+# Heavy modules are imported on first use so the server (and each worker) starts fast.
+# astronomy_api pulls in requests.
+astronomy_api = lazy_module("src.APIs.astronomy_api")
+fish_table = lazy_module("src.APIs.fish_table") # Pulls in numpy
+star_chart = lazy_module("src.APIs.star_chart") # Pulls in numpy
 
 # --- Configuration ---
 # Assuming your scripts are in src/APIs relative to this backend file
 SCRIPT_DIR = os.path.join(os.path.dirname(__file__), 'src', 'APIs')
-SCRIPT_DIR = os.path.join(os.path.dirname(__file__), 'src', 'APIs')
 # Ensure the script directory is in the Python path if scripts import local modules like 'secret'
 sys.path.insert(0, SCRIPT_DIR)
 
@@ -28,15 +57,143 @@ MAP_OUTPUT_DIR = os.path.dirname(__file__)
 MAP_FILENAME = "adventure_map.html"
 MAP_OUTPUT_PATH = os.path.join(MAP_OUTPUT_DIR, MAP_FILENAME)
 
+# Scripts are forked from a preloaded template process when possible (set SCRIPT_TEMPLATE=0 to disable)
+USE_SCRIPT_TEMPLATE = os.getenv('SCRIPT_TEMPLATE', '1') != '0' and template_supported()
+script_template = TemplateClient() if USE_SCRIPT_TEMPLATE else None
+
+# --- Response Encoding ---
+
+def negotiated_media_type():
+    """The binary media type (MessagePack/CBOR) an /api/* request asked for, or None for JSON."""
+    if not has_request_context() or not request.path.startswith('/api/'):
+        return None
+    offers = response_encoding.offered()
+    if not offers:
+        return None
+    # JSON is listed first, so it wins ties (e.g. "Accept: */*")
+    best = request.accept_mimetypes.best_match(['application/json'] + offers)
+    return best if best in offers else None
+
+class NegotiatingJSONProvider(DefaultJSONProvider):
+    """jsonify() that answers in MessagePack or CBOR when an /api/* client asks for it."""
+    compact = True # No indentation, even in debug mode
+
+    def response(self, *args, **kwargs):
+        media_type = negotiated_media_type()
+        if media_type is None:
+            response = super().response(*args, **kwargs)
+        else:
+            if args and kwargs:
+                raise TypeError("jsonify() behavior undefined when passed both args and kwargs")
+            obj = args[0] if len(args) == 1 else (list(args) if args else kwargs)
+            response = self._app.response_class(response_encoding.encode(obj, media_type), mimetype=media_type)
+        if has_request_context() and request.path.startswith('/api/') and response_encoding.offered():
+            response.vary.add('Accept')
+        return response
+
 app = Flask(__name__)
+app.json = NegotiatingJSONProvider(app)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# Runtime state (job database, per-job maps) lives in Flask's instance folder
+os.makedirs(app.instance_path, exist_ok=True)
+JOB_DB_PATH = os.getenv('JOB_DB_PATH', os.path.join(app.instance_path, 'jobs.sqlite3'))
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_SHUTDOWN_GRACE = 30  # Seconds a stopping worker waits for running jobs (unfinished ones are requeued)
+JOB_MAPS_DIR = os.path.join(app.instance_path, 'maps')
+os.makedirs(JOB_MAPS_DIR, exist_ok=True)
+# Job, route and warm-up maps are deleted once no job result or warm-up entry can point at them
+MAP_TTL = max(DEFAULT_DEDUP_TTL, warmup.RESULT_TTL)
+MAP_SWEEP_INTERVAL = 600  # Seconds between sweeps of JOB_MAPS_DIR in each worker
+
+# Static assets and their precompressed (gzip/brotli) variants
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'frontend_web')
+STATIC_CACHE_DIR = os.path.join(app.instance_path, 'static_cache')
+if 'br' not in available_encodings():
+    print("Note: 'brotli' is not installed; static files will be sent gzip-compressed only (pip install brotli).",
+          file=sys.stderr)
+
+# Precomputed fish table (build with: python src/APIs/fish_table.py build)
+FISH_TABLE_PATH = os.getenv('FISH_TABLE_PATH', os.path.join(app.instance_path, 'fish_table'))
+
+# Star charts rendered by the local astronomy engine. ASTRONOMY_ENGINE=remote makes
+# astronomyapi.com the primary source; either way the other engine is the fallback.
+CHARTS_DIR = os.path.join(app.instance_path, 'charts')
+ASTRONOMY_ENGINE = os.getenv('ASTRONOMY_ENGINE', 'local')
+
+# Caching proxy for map tiles (TILE_PROXY=1; size bound from TILE_CACHE_MAX_MB)
+TILE_CACHE_DIR = os.path.join(app.instance_path, 'tiles')
+tiles = tile_cache.TileCache(TILE_CACHE_DIR)
+
+# Cache shared by all worker processes (SQLite in WAL mode)
+SHARED_CACHE_PATH = os.getenv('SHARED_CACHE_PATH', os.path.join(app.instance_path, 'shared_cache.sqlite3'))
+
+@app.before_request
+def ensure_started():
+    get_job_pool()
+    maybe_sweep_maps()
+
+_last_map_sweep = 0.0
+
+def sweep_maps(max_age=MAP_TTL):
+    """Deletes maps (and their _data directories) in JOB_MAPS_DIR older than max_age seconds. Returns the count."""
+    cutoff = time.time() - max_age
+    removed = 0
+    for name in os.listdir(JOB_MAPS_DIR):
+        path = os.path.join(JOB_MAPS_DIR, name)
+        try:
+            if os.path.getmtime(path) >= cutoff:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            removed += 1
+        except OSError:
+            continue  # Already removed by another worker
+    return removed
+
+def maybe_sweep_maps():
+    """Sweeps old maps in the background at most every MAP_SWEEP_INTERVAL seconds."""
+    global _last_map_sweep
+    now = time.time()
+    if now - _last_map_sweep < MAP_SWEEP_INTERVAL:
+        return
+    _last_map_sweep = now
+
+    def sweep():
+        removed = sweep_maps()
+        if removed:
+            print(f"Removed {removed} map file(s) older than {MAP_TTL}s.", file=sys.stderr)
+    threading.Thread(target=sweep, name="map-sweep", daemon=True).start()
+
 # --- Helper Function to Run Scripts ---
 def run_script(script_name, args_list):
-    """Runs a Python script using subprocess and returns its output."""
+    """Runs a Python script (forked from the template process, or via subprocess) and returns its output.
+
+    Under a request deadline the script gets the time remaining (in REQUEST_DEADLINE) and is
+    killed when it runs out, raising DeadlineExceeded. A script that exits with deadlines.EXIT_CODE
+    or CIRCUIT_OPEN_EXIT_CODE raises DeadlineExceeded or CircuitOpenError here too.
+    """
     script_path = os.path.join(SCRIPT_DIR, script_name)
     command = [sys.executable, script_path] + args_list
     print(f"Running command: {' '.join(command)}", file=sys.stderr) # Log the command being run
+    timeout = deadlines.capped_timeout(None) # Raises if the deadline has already passed
+    extra_env = {deadlines.DEADLINE_ENV: repr(deadlines.current())} if timeout is not None else {}
+    if script_template is not None and os.path.exists(script_path):
+        process = script_template.run(script_path, args_list, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                      env=extra_env, timeout=timeout)
+        if process is not None and process.get("timed_out"):
+            raise deadlines.DeadlineExceeded(f"{script_name} was stopped at the request deadline.")
+        if process is not None:
+            print(f"Script {script_name} stdout:\n{process['stdout']}", file=sys.stderr)
+            print(f"Script {script_name} stderr:\n{process['stderr']}", file=sys.stderr)
+            raise_for_exit_code(script_name, process["returncode"])
+            if process["returncode"] != 0:
+                error_msg = f"Error running script {script_name}: exit status {process['returncode']}\nStderr: {process['stderr']}\nStdout: {process['stdout']}"
+                print(error_msg, file=sys.stderr)
+                return {"success": False, "output": process["stdout"], "error": error_msg}
+            return {"success": True, "output": process["stdout"], "error": process["stderr"]}
     try:
         # Set cwd to the directory containing backend_app.py so relative paths in scripts work as expected
         # (e.g., adventure_finder saving map to MAP_OUTPUT_PATH)
@@ -45,7 +202,9 @@ def run_script(script_name, args_list):
             capture_output=True,
             text=True,
             check=True,
-            cwd=os.path.dirname(__file__) # Run script from the backend app's directory
+            cwd=os.path.dirname(__file__), # Run script from the backend app's directory
+            env=dict(os.environ, **extra_env),
+            timeout=timeout # subprocess.run kills the script when it expires
         )
         print(f"Script {script_name} stdout:\n{process.stdout}", file=sys.stderr)
         print(f"Script {script_name} stderr:\n{process.stderr}", file=sys.stderr)
@@ -54,7 +213,10 @@ def run_script(script_name, args_list):
         error_msg = f"Error: Script '{script_path}' not found."
         print(error_msg, file=sys.stderr)
         return {"success": False, "output": "", "error": error_msg}
+    except subprocess.TimeoutExpired:
+        raise deadlines.DeadlineExceeded(f"{script_name} was stopped at the request deadline.")
     except subprocess.CalledProcessError as e:
+        raise_for_exit_code(script_name, e.returncode)
         error_msg = f"Error running script {script_name}: {e}\nStderr: {e.stderr}\nStdout: {e.stdout}"
         print(error_msg, file=sys.stderr)
         return {"success": False, "output": e.stdout, "error": error_msg}
@@ -64,61 +226,517 @@ def run_script(script_name, args_list):
         return {"success": False, "output": "", "error": error_msg}
 
 
-# --- API Endpoints ---
+def raise_for_exit_code(script_name, returncode):
+    """Turns a script's deadline/open-breaker exit status back into the exception it stood for."""
+    if returncode == deadlines.EXIT_CODE:
+        raise deadlines.DeadlineExceeded(f"{script_name} ran out of time.")
+    if returncode == CIRCUIT_OPEN_EXIT_CODE:
+        raise CircuitOpenError(f"{script_name} stopped: an upstream service is temporarily unavailable.")
 
-@app.route('/api/plan_trip', methods=['POST'])
-def plan_trip():
-    """Endpoint to generate the adventure map."""
-    data = request.json
+
+# --- Request Deadlines ---
+# Seconds each endpoint (and background job kind) may take end to end; override with
+# DEADLINE_<NAME>, e.g. DEADLINE_PLAN_TRIP=60 or DEADLINE_JOB_PLAN_ROUTE=900.
+ENDPOINT_BUDGETS = {
+    "plan_trip": deadlines.budget("plan_trip", 120),
+    "plan_route": deadlines.budget("plan_route", 240),
+    "identify": deadlines.budget("identify", 60),
+    "fishy": deadlines.budget("fishy", 45),
+    "astronomy": deadlines.budget("astronomy", 30),
+    "astronomy_range": deadlines.budget("astronomy_range", 60),
+}
+JOB_BUDGETS = {
+    "plan_trip": deadlines.budget("job_plan_trip", 300),
+    "plan_route": deadlines.budget("job_plan_route", 600),
+    warmup.JOB_KIND: deadlines.budget("job_warm_trip", 300),
+}
+
+def endpoint_deadline(name):
+    """Runs the view under its time budget; an expired deadline becomes a 504 right away."""
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with deadlines.deadline(ENDPOINT_BUDGETS[name]):
+                try:
+                    return view(*args, **kwargs)
+                except deadlines.DeadlineExceeded as e:
+                    deadlines.record_expired(name)
+                    print(f"Deadline exceeded in {name}: {e}", file=sys.stderr)
+                    return jsonify({"success": False, "error": "The request took too long and was stopped. Please try again.",
+                                    "timed_out": True}), 504
+        return wrapper
+    return decorate
+
+
+# --- Admission Control ---
+# Endpoint -> (traffic class, tokens it costs from the client's bucket). A client may
+# demote its own requests (e.g. a scripted bulk job) with "X-Request-Priority: batch".
+ENDPOINT_ADMISSION = {
+    "plan_trip": (admission.INTERACTIVE, 1),
+    "identify": (admission.INTERACTIVE, 2),
+    "fishy": (admission.INTERACTIVE, 1),
+    "astronomy": (admission.INTERACTIVE, 1),
+    "astronomy_range": (admission.INTERACTIVE, 3),
+    "plan_route": (admission.BATCH, 5),
+}
+# Background jobs share the same slots, behind interactive requests
+JOB_ADMISSION = {
+    "plan_trip": admission.BATCH,
+    "plan_route": admission.BATCH,
+    warmup.JOB_KIND: admission.BACKGROUND,
+}
+admission_gate = admission.Gate()
+
+def too_many_requests(error, retry_after):
+    response = jsonify({"success": False, "error": error, "retry_after": retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def admitted(name):
+    """Admits the view through the client's token bucket and its class queue; answers 429 otherwise."""
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            cls, cost = ENDPOINT_ADMISSION[name]
+            requested = request.headers.get('X-Request-Priority')
+            if requested in admission.CLASSES and admission.CLASSES[requested]["priority"] > admission.CLASSES[cls]["priority"]:
+                cls = requested
+            client = admission.client_key(request.headers.get('X-API-Key'), request.remote_addr,
+                                          request.headers.get('X-Forwarded-For'))
+            try:
+                with admission.admit(admission_gate, client, cls, cost, timeout=deadlines.remaining()):
+                    return view(*args, **kwargs)
+            except admission.Rejected as e:
+                print(f"Rejected {name} request from {client}: {e}", file=sys.stderr)
+                return too_many_requests(str(e), e.retry_after)
+        return wrapper
+    return decorate
+
+def admitted_job(kind, handler):
+    """Runs a job handler in a gate slot of its traffic class (without a token bucket)."""
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        if not admission.ENABLED:
+            return handler(*args, **kwargs)
+        # Accepted jobs wait for a slot as long as their budget allows instead of failing on a full queue
+        with admission_gate.slot(JOB_ADMISSION[kind], timeout=deadlines.remaining(), bounded=False):
+            return handler(*args, **kwargs)
+    return wrapper
+
+
+@app.errorhandler(CircuitOpenError)
+def circuit_open(error):
+    """503 (with Retry-After) for a call refused by an open circuit breaker, here or in a script."""
+    print(f"Upstream unavailable: {error}", file=sys.stderr)
+    response = jsonify({"success": False, "error": "A required service is temporarily unavailable. Please try again shortly."})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(int(BREAKER_COOLDOWN))
+    return response
+
+def upstream_unavailable(upstream):
+    """A 503 response (with Retry-After) while the upstream's circuit breaker is open, otherwise None."""
+    if breaker_state(upstream) != BREAKER_OPEN:
+        return None
+    response = jsonify({"success": False, "error": f"The {upstream} service is temporarily unavailable. Please try again shortly."})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(int(BREAKER_COOLDOWN))
+    return response
+
+
+# --- Trip Planning ---
+
+def parse_trip_request(data):
+    """Validates plan_trip input. Returns (params, None) or (None, (error_response, status))."""
     latitude = data.get('latitude')
     longitude = data.get('longitude')
     radius_miles = data.get('radius_miles', 15.0) # Default to 15 miles
 
+    if (not latitude or not longitude) and data.get('place'):
+        # A place name instead of coordinates, resolved by the offline gazetteer
+        matches = get_gazetteer().geocode(data['place'], limit=1)
+        if not matches:
+            return None, (jsonify({"success": False, "error": f"Unknown place: {data['place']}"}), 400)
+        print(f"plan_trip: '{data['place']}' resolved to {matches[0]['label']}", file=sys.stderr)
+        latitude, longitude = matches[0]['latitude'], matches[0]['longitude']
+
     if not latitude or not longitude:
-        return jsonify({"success": False, "error": "Missing latitude or longitude"}), 400
+        return None, (jsonify({"success": False, "error": "Missing latitude or longitude (or place)"}), 400)
 
     try:
-        lat_float = float(latitude)
-        lon_float = float(longitude)
-        radius_float = float(radius_miles)
-    except ValueError:
-        return jsonify({"success": False, "error": "Invalid numeric input for coordinates or radius"}), 400
+        params = {
+            "latitude": float(latitude),
+            "longitude": float(longitude),
+            "radius_miles": float(radius_miles),
+        }
+    except (TypeError, ValueError):
+        return None, (jsonify({"success": False, "error": "Invalid numeric input for coordinates or radius"}), 400)
+
+    if data.get('itinerary'):
+        # Optional visiting order: only some categories, and/or what fits in a number of hours
+        params["itinerary"] = True
+        categories = data.get('categories')
+        if isinstance(categories, str):
+            categories = [c.strip() for c in categories.split(',') if c.strip()]
+        if categories:
+            if not isinstance(categories, list) or not all(isinstance(c, str) and c.strip() for c in categories):
+                return None, (jsonify({"success": False, "error": "categories must be a list of category names"}), 400)
+            params["categories"] = [c.strip() for c in categories]
+        if data.get('time_budget_hours') not in (None, ''):
+            try:
+                params["time_budget_hours"] = float(data['time_budget_hours'])
+            except (TypeError, ValueError):
+                params["time_budget_hours"] = 0
+            if params["time_budget_hours"] <= 0:
+                return None, (jsonify({"success": False, "error": "time_budget_hours must be a positive number"}), 400)
+    return params, None
+
+
+def itinerary_from_output(output):
+    """The itinerary adventure_finder.py printed (an "Itinerary: {...}" line), or None."""
+    for line in (output or "").splitlines():
+        if line.startswith("Itinerary: "):
+            try:
+                return json.loads(line[len("Itinerary: "):])
+            except json.JSONDecodeError as e:
+                print(f"Warning: could not parse itinerary output: {e}", file=sys.stderr)
+    return None
 
+
+def generate_trip_map(params, output_path):
+    """Runs adventure_finder.py for the given params and checks the map was written to output_path."""
     # Arguments for adventure_finder.py
     args = [
-        str(lat_float),
-        str(lon_float),
-        '--radius_miles', str(radius_float),
-        '--output', MAP_OUTPUT_PATH # Ensure script saves map where Flask can find it
+        str(params["latitude"]),
+        str(params["longitude"]),
+        '--radius_miles', str(params["radius_miles"]),
+        '--output', output_path # Ensure script saves map where Flask can find it
     ]
+    if params.get("itinerary"):
+        args.append('--itinerary')
+        if params.get("categories"):
+            args += ['--categories', ','.join(params["categories"])]
+        if params.get("time_budget_hours"):
+            args += ['--time_budget_hours', str(params["time_budget_hours"])]
 
     result = run_script('adventure_finder.py', args)
 
-    if result["success"]:
-        # Check if the map file was actually created by the script
-        if os.path.exists(MAP_OUTPUT_PATH):
-             # Return the relative path/URL the frontend can use to fetch the map
-            return jsonify({"success": True, "map_url": f"/{MAP_FILENAME}"})
+    if not result["success"]:
+        return {"success": False, "error": result["error"]}
+    # Check if the map file was actually created by the script
+    if not os.path.exists(output_path):
+        error_msg = f"Script executed but map file '{output_path}' not found. Script output: {result.get('output', '')} Stderr: {result.get('error', '')}"
+        print(error_msg, file=sys.stderr)
+        return {"success": False, "error": error_msg}
+    if params.get("itinerary"):
+        return {"success": True, "itinerary": itinerary_from_output(result.get("output"))}
+    return {"success": True}
+
+
+def parse_route_request(data):
+    """Validates plan_route input. Returns (params, None) or (None, (error_response, status))."""
+    waypoints = data.get('waypoints')
+    polyline = data.get('polyline')
+    if not waypoints and not polyline:
+        return None, (jsonify({"success": False, "error": "Provide 'waypoints' or 'polyline'"}), 400)
+
+    try:
+        params = {"radius_miles": float(data.get('radius_miles', 15.0))}
+        if waypoints:
+            # Accept [[lat, lon], ...] or [{"latitude": ..., "longitude": ...}, ...]
+            params["waypoints"] = [
+                [float(p["latitude"]), float(p["longitude"])] if isinstance(p, dict) else [float(p[0]), float(p[1])]
+                for p in waypoints
+            ]
         else:
-            error_msg = f"Script executed but map file '{MAP_OUTPUT_PATH}' not found. Script output: {result.get('output', '')} Stderr: {result.get('error', '')}"
-            print(error_msg, file=sys.stderr)
-            return jsonify({"success": False, "error": error_msg}), 500
+            params["polyline"] = str(polyline)
+    except (TypeError, ValueError, KeyError, IndexError):
+        return None, (jsonify({"success": False, "error": "Invalid waypoints or radius"}), 400)
+    return params, None
+
+
+def generate_route_map(params, output_path):
+    """Runs route_finder.py for the given params and checks the map was written to output_path."""
+    if "waypoints" in params:
+        args = ['--waypoints', ';'.join(f"{lat},{lon}" for lat, lon in params["waypoints"])]
     else:
-        return jsonify({"success": False, "error": result["error"]}), 500
+        args = ['--polyline', params["polyline"]]
+    args += ['--radius_miles', str(params["radius_miles"]), '--output', output_path]
+
+    result = run_script('route_finder.py', args)
+
+    if not result["success"]:
+        return {"success": False, "error": result["error"]}
+    if not os.path.exists(output_path):
+        error_msg = f"Script executed but map file '{output_path}' not found. Script output: {result.get('output', '')} Stderr: {result.get('error', '')}"
+        print(error_msg, file=sys.stderr)
+        return {"success": False, "error": error_msg}
+    # route_finder.py maps what it has when the deadline is near and says so
+    return {"success": True, "partial": "Partial results:" in result.get("output", "")}
+
+
+# --- Background Jobs ---
+
+def run_plan_trip_job(params, job_id):
+    """Job handler: renders the trip map into a per-job file so concurrent jobs don't collide."""
+    map_filename = f"{job_id}.html"
+    result = generate_trip_map(params, os.path.join(JOB_MAPS_DIR, map_filename))
+    if not result["success"]:
+        raise RuntimeError(result["error"])
+    if "itinerary" in result:
+        return {"map_url": f"/maps/{map_filename}", "itinerary": result["itinerary"]}
+    return {"map_url": f"/maps/{map_filename}"}
+
+
+def run_plan_route_job(params, job_id):
+    """Job handler: renders the combined route map into a per-job file."""
+    map_filename = f"{job_id}.html"
+    result = generate_route_map(params, os.path.join(JOB_MAPS_DIR, map_filename))
+    if not result["success"]:
+        raise RuntimeError(result["error"])
+    return {"map_url": f"/maps/{map_filename}", "partial": result["partial"]}
+
+
+def run_warm_trip_job(params, job_id):
+    """Job handler for the warm-up scheduler: renders a popular cell's map and stores it for plan_trip."""
+    result = run_plan_trip_job(params, job_id)
+    warmup.store_result(params, result, get_shared_cache(SHARED_CACHE_PATH))
+    return result
+
+
+JOB_HANDLERS = {
+    "plan_trip": run_plan_trip_job,
+    "plan_route": run_plan_route_job,
+    warmup.JOB_KIND: run_warm_trip_job,
+}
+# Each job kind runs under its own time budget (including any wait for an admission slot);
+# a job past it is killed and marked failed
+JOB_HANDLERS = {
+    kind: deadlines.with_deadline(f"job_{kind}", JOB_BUDGETS[kind])(admitted_job(kind, handler))
+    for kind, handler in JOB_HANDLERS.items()
+}
+
+_job_pool = None
+_job_pool_lock = threading.Lock()
+
+def get_job_pool():
+    """Starts the worker pool on first use; starting it also requeues jobs orphaned by a crash."""
+    global _job_pool
+    if _job_pool is None:
+        with _job_pool_lock:
+            if _job_pool is None:
+                pool = JobWorkerPool(JobStore(JOB_DB_PATH), JOB_HANDLERS, num_workers=JOB_WORKERS)
+                pool.start()
+                if warmup.ENABLED:
+                    start_warmup_scheduler(pool)
+                _job_pool = pool
+    return _job_pool
+
+
+def stop_job_pool(timeout=JOB_SHUTDOWN_GRACE):
+    """Stops this process's worker pool (if started), giving running jobs up to timeout seconds to finish."""
+    if _job_pool is not None:
+        _job_pool.stop(timeout)
+
+
+def start_warmup_scheduler(pool):
+    """Pre-generates maps for popular locations off-peak (WARMUP=1); see src/APIs/warmup.py."""
+    def submit(params):
+        job, created = pool.store.submit(warmup.JOB_KIND, params, priority=warmup.JOB_PRIORITY)
+        if created:
+            pool.notify()
+
+    warmup.WarmupScheduler(submit, get_shared_cache(SHARED_CACHE_PATH)).start()
+
+
+def submit_job(kind, params):
+    """Queues (or dedupes) a job and returns the 202 response pointing at its status URLs."""
+    pool = get_job_pool()
+    job, created = pool.store.submit(kind, params)
+    if created:
+        pool.notify()
+    body = public_view(job)
+    body.update({
+        "success": True,
+        "deduplicated": not created,
+        "status_url": f"/api/jobs/{job['id']}",
+        "events_url": f"/api/jobs/{job['id']}/events",
+    })
+    return jsonify(body), 202
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Poll a background job's status (and its result once done)."""
+    job = get_job_pool().store.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": f"Unknown job: {job_id}"}), 404
+    return jsonify(dict(public_view(job), success=True))
+
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """Server-Sent Events stream of a job's status changes; ends when the job finishes."""
+    store = get_job_pool().store
+    if store.get(job_id) is None:
+        return jsonify({"success": False, "error": f"Unknown job: {job_id}"}), 404
+
+    def events():
+        last_status = None
+        while True:
+            job = store.get(job_id)
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield f"event: status\ndata: {json.dumps(public_view(job))}\n\n"
+            if job["status"] in TERMINAL_STATES:
+                return
+            time.sleep(0.5)
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+
+# --- API Endpoints ---
+
+@app.route('/api/plan_trip', methods=['POST'])
+@endpoint_deadline('plan_trip')
+@admitted('plan_trip')
+def plan_trip():
+    """Endpoint to generate the adventure map.
+
+    With "async": true the trip is queued as a background job and a job ID is returned
+    immediately (HTTP 202); poll /api/jobs/<id> or subscribe to /api/jobs/<id>/events.
+    Requests in a cell with a map precomputed by the warm-up scheduler get it straight away.
+    With "itinerary": true the spots are also ordered into a route from the search centre
+    (optionally only "categories", fitting "time_budget_hours"), drawn on the map and returned.
+    """
+    data = request.json or {}
+    params, error = parse_trip_request(data)
+    if error:
+        return error
+
+    # Popular locations may have a map precomputed by the warm-up scheduler
+    cache = get_shared_cache(SHARED_CACHE_PATH)
+    warmup.record_request(params, cache)
+    # Warm-up maps have no itinerary
+    precomputed = None if params.get("itinerary") else warmup.lookup(params, cache)
+    if precomputed:
+        cache.incr("warmup:served")
+        return jsonify({"success": True, "map_url": precomputed["map_url"], "precomputed": True})
+
+    if data.get('async') or request.args.get('mode') == 'async':
+        return submit_job("plan_trip", params)
+
+    unavailable = upstream_unavailable("gemini")
+    if unavailable:
+        # Fail fast while Gemini is down, falling back to an older warm-up map of the area if there is one
+        stale = None if params.get("itinerary") else warmup.lookup(params, cache, allow_stale=True)
+        if stale:
+            return jsonify({"success": True, "map_url": stale["map_url"], "precomputed": True, "stale": True})
+        return unavailable
+
+    result = generate_trip_map(params, MAP_OUTPUT_PATH)
+    if result["success"]:
+        # Return the relative path/URL the frontend can use to fetch the map
+        body = {"success": True, "map_url": f"/{MAP_FILENAME}"}
+        if "itinerary" in result:
+            body["itinerary"] = result["itinerary"]
+        return jsonify(body)
+    return jsonify({"success": False, "error": result["error"]}), 500
+
+@app.route('/api/plan_route', methods=['POST'])
+@endpoint_deadline('plan_route')
+@admitted('plan_route')
+def plan_route():
+    """Endpoint to map adventure spots along a route ("waypoints" list or encoded "polyline").
+
+    The route is split into grid cells that are queried concurrently and merged into one map.
+    Supports "async": true like /api/plan_trip.
+    """
+    data = request.json or {}
+    params, error = parse_route_request(data)
+    if error:
+        return error
+
+    if data.get('async') or request.args.get('mode') == 'async':
+        return submit_job("plan_route", params)
+
+    unavailable = upstream_unavailable("gemini")
+    if unavailable:
+        return unavailable
+
+    # Each route map gets its own file, so it can be cached like a job map
+    map_filename = f"route-{uuid.uuid4().hex}.html"
+    result = generate_route_map(params, os.path.join(JOB_MAPS_DIR, map_filename))
+    if result["success"]:
+        return jsonify({"success": True, "map_url": f"/maps/{map_filename}", "partial": result["partial"]})
+    return jsonify({"success": False, "error": result["error"]}), 500
+
 # Endpoint to serve the generated map file
 @app.route(f'/{MAP_FILENAME}')
 def serve_map():
     # Ensure the map file exists before trying to serve
     if not os.path.exists(MAP_OUTPUT_PATH):
         return "Map file not found.", 404
-    return send_from_directory(MAP_OUTPUT_DIR, MAP_FILENAME)
+    # The map is regenerated in place, so clients revalidate it with its ETag
+    return send_static(MAP_OUTPUT_PATH, STATIC_CACHE_DIR)
+
+# Cluster/point data written next to a large map (see src/APIs/map_clusters.py)
+@app.route(f'/{os.path.splitext(MAP_FILENAME)[0]}_data/<path:filename>')
+def serve_map_data(filename):
+    path = safe_join(os.path.splitext(MAP_OUTPUT_PATH)[0] + '_data', filename)
+    if path is None or not os.path.isfile(path):
+        return "Map data not found.", 404
+    return send_static(path, STATIC_CACHE_DIR)
+
+# Endpoint to serve maps rendered by background jobs (and their cluster data directories)
+@app.route('/maps/<path:filename>')
+def serve_job_map(filename):
+    path = safe_join(JOB_MAPS_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        return "Map file not found.", 404
+    # Job maps are written once under a unique job ID and never change
+    return send_static(path, STATIC_CACHE_DIR, immutable=True)
+
+# Endpoint to serve star charts rendered by the local astronomy engine
+@app.route('/charts/<path:filename>')
+def serve_star_chart(filename):
+    path = safe_join(CHARTS_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        return "Chart not found.", 404
+    # Chart filenames are a hash of the location, time and style, so they never change
+    return send_static(path, STATIC_CACHE_DIR, immutable=True)
+
+# Tile proxy: generated maps load base-layer tiles from here when TILE_PROXY=1
+@app.route('/tiles/<source>/<int:z>/<int:x>/<int:y>')
+def serve_tile(source, z, x, y):
+    if not tile_cache.proxy_enabled() or source not in tile_cache.TILE_SOURCES:
+        return "Not Found", 404
+    tile = tiles.get(source, z, x, y)
+    if tile is None:
+        return "Tile unavailable.", 502
+    data, content_type, max_age = tile
+    etag = tile_cache.tile_etag(data)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": f"public, max-age={max_age}"}
+    if etag in request.if_none_match:
+        return Response(status=304, headers=headers)
+    return Response(data, mimetype=content_type, headers=headers)
 
 # --- Static File Serving ---
 
+def send_frontend_file(filename):
+    """Sends a frontend_web file; assets requested with a matching ?v= fingerprint are cached forever."""
+    path = safe_join(FRONTEND_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        return "Not Found", 404
+    version = request.args.get('v')
+    immutable = version is not None and version == file_fingerprint(path)
+    return send_static(path, STATIC_CACHE_DIR, immutable=immutable)
+
 # Serve the main index.html page
 @app.route('/')
 def serve_index():
-    return send_from_directory('frontend_web', 'index.html')
+    return send_frontend_file('index.html')
 
 # Serve other files (HTML, CSS, JS) from the frontend_web directory
 @app.route('/<path:filename>')
@@ -127,15 +745,82 @@ def serve_frontend_files(filename):
     if filename.startswith('api/') or filename == MAP_FILENAME:
         # Let other specific routes handle these
         return "Not Found", 404 # Or use Flask's abort(404)
-    return send_from_directory('frontend_web', filename)
+    return send_frontend_file(filename)
 
 
 # --- API Endpoints ---
 # (Existing endpoints remain below)
 
+@app.route('/api/health', methods=['GET'])
+def health():
+    """Liveness check; reports which worker process answered."""
+    return jsonify({"success": True, "pid": os.getpid()})
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Counters shared by all workers and scripts, plus the admission queues of every worker.
+
+    Counters: llm:<task>:*, model:<task>:<model>:* (routing), ladder:<task>:<rung>:*, upstream:<name>:* (hedging),
+    deadline:<endpoint>:expired and admit:<class>:*.
+    """
+    counters = get_shared_cache(SHARED_CACHE_PATH).counters()
+    derived = {}
+    for key, value in counters.items():
+        if key.startswith("llm:") and key.endswith(":calls") and value:
+            task = key[len("llm:"):-len(":calls")]
+            failures = counters.get(f"llm:{task}:parse_failures", 0)
+            derived[f"llm:{task}:parse_failure_rate"] = failures / value
+            derived[f"llm:{task}:avg_prompt_tokens"] = counters.get(f"llm:{task}:prompt_tokens", 0) / value
+        elif key.startswith("ladder:") and key.endswith(":calls") and value:
+            # ladder:<task>:<rung>: bytes and latency per attempt, and how often the answer was kept
+            prefix = key[:-len(":calls")]
+            derived[f"{prefix}:avg_bytes"] = counters.get(f"{prefix}:bytes", 0) / value
+            derived[f"{prefix}:avg_latency_ms"] = counters.get(f"{prefix}:latency_ms", 0) / value
+            derived[f"{prefix}:accept_rate"] = counters.get(f"{prefix}:accepted", 0) / value
+        elif key.startswith("model:") and key.endswith(":calls") and value:
+            # model:<task>:<model>: compares the tiers a task was routed to (including A/B samples)
+            prefix = key[:-len(":calls")]
+            failures = counters.get(f"{prefix}:parse_failures", 0) + counters.get(f"{prefix}:errors", 0)
+            derived[f"{prefix}:success_rate"] = 1 - failures / value
+            derived[f"{prefix}:avg_latency_ms"] = counters.get(f"{prefix}:latency_ms", 0) / value
+            derived[f"{prefix}:avg_cost_usd"] = counters.get(f"{prefix}:cost_usd", 0) / value
+    derived.update(hedge_metrics(counters))
+    return jsonify({"success": True, "counters": counters, "derived": derived,
+                    "admission": admission.all_snapshots(get_shared_cache(SHARED_CACHE_PATH))})
+
+
+# --- Place Names ---
+
+def lookup_limit(default, maximum=20):
+    try:
+        return max(1, min(int(request.args.get('limit', default)), maximum))
+    except ValueError:
+        return default
+
+@app.route('/api/geocode', methods=['GET'])
+def geocode():
+    """Coordinates for a place name (?q=Charlottesville, VA) from the offline gazetteer."""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"success": False, "error": "Missing query (q)"}), 400
+    results = get_gazetteer().geocode(query, limit=lookup_limit(5))
+    if not results:
+        return jsonify({"success": False, "error": f"No place found for '{query}'"}), 404
+    return jsonify({"success": True, "results": results})
+
+@app.route('/api/autocomplete', methods=['GET'])
+def autocomplete():
+    """Place-name suggestions for a typed prefix (?q=char&limit=8), most populous first."""
+    query = request.args.get('q', '').strip()
+    suggestions = get_gazetteer().autocomplete(query, limit=lookup_limit(8)) if query else []
+    return jsonify({"success": True, "suggestions": suggestions})
+
+
 @app.route('/api/identify', methods=['POST'])
+@endpoint_deadline('identify')
+@admitted('identify')
 def identify_object():
-    """Endpoint to identify animal, bird, or flora from an uploaded image."""
+    """Endpoint to identify animal, bird, or flora from an uploaded image (id_type=auto detects the type)."""
     if 'image' not in request.files:
         return jsonify({"success": False, "error": "No image file provided"}), 400
     if 'id_type' not in request.form:
@@ -147,11 +832,12 @@ def identify_object():
     if file.filename == '':
         return jsonify({"success": False, "error": "No selected file"}), 400
 
-    # Map id_type to script name
+    # Map id_type to script name ('auto' classifies and identifies every subject in one model call)
     script_map = {
         'animal': 'animal_identification.py',
         'bird': 'bird_identification.py',
-        'flora': 'flora_identification.py'
+        'flora': 'flora_identification.py',
+        'auto': 'auto_identification.py'
     }
 
     if id_type not in script_map:
@@ -159,6 +845,10 @@ def identify_object():
 
     script_to_run = script_map[id_type]
 
+    unavailable = upstream_unavailable("gemini")
+    if unavailable:
+        return unavailable
+
     if file:
         # Use a more robust temporary file handling approach if possible in production
         # For simplicity here, save to uploads with a unique name
@@ -196,6 +886,8 @@ def identify_object():
             else: # Success but no output? Should not happen if scripts work
                  return jsonify({"success": False, "error": f"Script {script_to_run} ran successfully but produced no output."}), 500
 
+        except deadlines.DeadlineExceeded:
+            raise # Answered as a timeout by endpoint_deadline
         except Exception as e:
             error_msg = f"Error processing identification request: {e}"
             print(error_msg, file=sys.stderr)
@@ -212,22 +904,59 @@ def identify_object():
     return jsonify({"success": False, "error": "File processing failed"}), 500
 
 
+# --- Precomputed Fish Table ---
+
+_fish_table = None
+_fish_table_mtime = None
+_fish_table_lock = threading.Lock()
+
+def lookup_fish_table(latitude, longitude):
+    """Fish species from the memory-mapped table, or None if the table is missing or doesn't cover the cell."""
+    global _fish_table, _fish_table_mtime
+    meta_path = FISH_TABLE_PATH + ".json"
+    try:
+        mtime = os.path.getmtime(meta_path)
+    except OSError:
+        return None
+    if _fish_table is None or mtime != _fish_table_mtime:
+        # (Re)open after a rebuild; the .npy is memory-mapped, not read into memory
+        with _fish_table_lock:
+            if _fish_table is None or mtime != _fish_table_mtime:
+                try:
+                    _fish_table = fish_table.FishTable(FISH_TABLE_PATH)
+                    _fish_table_mtime = mtime
+                except (OSError, ValueError, ImportError) as e:
+                    print(f"Warning: could not load fish table: {e}", file=sys.stderr)
+                    return None
+    return _fish_table.lookup(latitude, longitude)
+
+
 @app.route('/api/fishy', methods=['POST'])
+@endpoint_deadline('fishy')
+@admitted('fishy')
 def get_fish_info():
-    """Endpoint to get local fish information."""
-    data = request.json
+    """Endpoint to get local fish information.
+
+    Answers from the precomputed fish table when the location is covered, otherwise runs fishy.py live.
+    """
+    data = request.json or {}
     latitude = data.get('latitude')
     longitude = data.get('longitude')
 
     args = []
-    # fishy.py currently doesn't take args, it uses hardcoded example coords.
-    # We *could* modify fishy.py to accept args, or just run it as is for now.
-    # Let's run it as is for simplicity first. If coords are needed, we'll modify fishy.py later.
-    # if latitude and longitude:
-    #     try:
-    #         args.extend([str(float(latitude)), str(float(longitude))])
-    #     except ValueError:
-    #         return jsonify({"success": False, "error": "Invalid latitude or longitude"}), 400
+    if latitude and longitude:
+        try:
+            lat_float, lon_float = float(latitude), float(longitude)
+        except ValueError:
+            return jsonify({"success": False, "error": "Invalid latitude or longitude"}), 400
+        fish_list = lookup_fish_table(lat_float, lon_float)
+        if fish_list:
+            return jsonify({"success": True, "data": {"fish": fish_list, "source": "table"}})
+        args.extend([str(lat_float), str(lon_float)])
+
+    unavailable = upstream_unavailable("gemini")
+    if unavailable:
+        return unavailable
 
     result = run_script('fishy.py', args)
 
@@ -261,52 +990,148 @@ def get_fish_info():
         return jsonify({"success": False, "error": "fishy.py ran successfully but produced no output."}), 500
 
 
-@app.route('/api/astronomy', methods=['POST'])
-def get_astronomy_info():
-    """Endpoint to get astronomy information (star chart image URL)."""
-    # Get credentials loaded from .env file
-    app_id = os.getenv('APP_ID')
-    app_secret = os.getenv('APP_SECRET')
-    ipinfo_key = os.getenv('API_KEY') # Key for ipinfo.io
+# --- Shared Caches ---
+# Stored in SQLite so every worker process (see serve.py) shares the same entries
 
-    if not app_id or not app_secret:
-         return jsonify({"success": False, "error": "Astronomy API credentials (APP_ID, APP_SECRET) not configured on server."}), 500
-    # Note: ipinfo_key is optional in astronomy_api.py, but we need location.
-    # If key is missing, we'll try to use default coords below.
+IP_LOCATION_TTL = 24 * 3600 # Seconds
+STAR_CHART_TTL = 3600 # Chart URLs are for a given day; refresh hourly
+STAR_CHART_PRECISION = 2 # Decimal places of lat/lon in the cache key (~1 km)
 
-    # Attempt to get client's IP address
-    ip_address = request.headers.get('X-Forwarded-For', request.remote_addr)
-    # Handle potential multiple IPs in X-Forwarded-For
-    if ip_address and ',' in ip_address:
-        ip_address = ip_address.split(',')[0].strip()
+def cached_location_from_ip(ip_address, ipinfo_key):
+    """get_location_from_ip with results shared across workers (last good value served during outages)."""
+    return stale_while_revalidate(
+        f"ipinfo:{ip_address}", IP_LOCATION_TTL, "ipinfo",
+        lambda: astronomy_api.get_location_from_ip(ip_address, ipinfo_key))
 
+def cached_star_chart(latitude, longitude, date_str=None, style="default", app_id=None, app_secret=None,
+                      constellation=None):
+    """get_star_chart_image_url with successful results shared across workers (stale while astronomyapi is down)."""
+    key = "star_chart:{:.{p}f}:{:.{p}f}:{}:{}".format(
+        latitude, longitude, date_str or datetime.date.today().isoformat(), style, p=STAR_CHART_PRECISION)
+    if constellation:
+        key += f":{constellation}"
+    return stale_while_revalidate(
+        key, STAR_CHART_TTL, "astronomyapi",
+        lambda: astronomy_api.get_star_chart_image_url(
+            latitude=latitude, longitude=longitude, date_str=date_str, style=style,
+            app_id=app_id, app_secret=app_secret, constellation=constellation),
+        ok=lambda result: bool(result.get("success")))
+
+
+def local_star_chart(latitude, longitude, date_str=None, style="default", constellation=None):
+    """Renders the chart with the bundled star catalog (no network, no credentials)."""
+    return star_chart.get_star_chart(
+        latitude, longitude, date_str=date_str, style=style, constellation=constellation,
+        output_dir=CHARTS_DIR, url_prefix='/charts/')
+
+
+def astronomy_credentials():
+    """(app_id, app_secret) for astronomyapi.com, or (None, None) when not configured."""
+    app_id, app_secret = os.getenv('APP_ID'), os.getenv('APP_SECRET')
+    return (app_id, app_secret) if app_id and app_secret else (None, None)
+
+
+def astronomy_location(data):
+    """Observer location from the request body (latitude/longitude or place), else the client's IP.
+
+    Returns (location, None) or (None, (error_response, status)).
+    """
+    ipinfo_key = os.getenv('API_KEY') # Key for ipinfo.io
     location_data = None
-    # Handle localhost IPs for testing (ipinfo won't work) or missing ipinfo key
-    if ip_address in ('127.0.0.1', '::1') or not ipinfo_key:
-        if not ipinfo_key:
-             print("Warning: IPInfo API Key (API_KEY) not configured. Using default coordinates for astronomy.", file=sys.stderr)
+    if data.get('latitude') not in (None, '') and data.get('longitude') not in (None, ''):
+        try:
+            location_data = {"latitude": float(data['latitude']), "longitude": float(data['longitude'])}
+        except (TypeError, ValueError):
+            return None, (jsonify({"success": False, "error": "Invalid latitude or longitude"}), 400)
+    elif data.get('place'):
+        matches = get_gazetteer().geocode(data['place'], limit=1)
+        if not matches:
+            return None, (jsonify({"success": False, "error": f"Unknown place: {data['place']}"}), 400)
+        location_data = {"latitude": matches[0]["latitude"], "longitude": matches[0]["longitude"]}
+
+    if location_data is None:
+        # Attempt to get client's IP address
+        ip_address = request.headers.get('X-Forwarded-For', request.remote_addr)
+        # Handle potential multiple IPs in X-Forwarded-For
+        if ip_address and ',' in ip_address:
+            ip_address = ip_address.split(',')[0].strip()
+
+        # Handle localhost IPs for testing (ipinfo won't work) or missing ipinfo key
+        if ip_address in ('127.0.0.1', '::1') or not ipinfo_key:
+            if not ipinfo_key:
+                 print("Warning: IPInfo API Key (API_KEY) not configured. Using default coordinates for astronomy.", file=sys.stderr)
+            else:
+                 print("Detected localhost IP, using default coordinates for astronomy.", file=sys.stderr)
+            # Use default coordinates (e.g., Washington D.C.)
+            location_data = {"latitude": 38.8951, "longitude": -77.0364}
         else:
-             print("Detected localhost IP, using default coordinates for astronomy.", file=sys.stderr)
-        # Use default coordinates (e.g., Washington D.C.)
-        location_data = {"latitude": 38.8951, "longitude": -77.0364}
-    else:
-        location_data = get_location_from_ip(ip_address, ipinfo_key)
+            location_data = cached_location_from_ip(ip_address, ipinfo_key)
 
     if not location_data or "latitude" not in location_data or "longitude" not in location_data:
         error_msg = location_data.get("error", "Could not determine location from IP address.") if location_data else "Could not determine location from IP address."
-        return jsonify({"success": False, "error": error_msg}), 500
+        return None, (jsonify({"success": False, "error": error_msg}), 500)
+    return location_data, None
+
+
+def render_star_chart(latitude, longitude, date_str=None, style="default", constellation=None):
+    """One chart from the primary engine, falling back to the other. Returns the engine's result dict."""
+    app_id, app_secret = astronomy_credentials()
+
+    def remote():
+        # Chart URL from astronomyapi.com (cached across workers)
+        return cached_star_chart(latitude=latitude, longitude=longitude, date_str=date_str, style=style,
+                                 app_id=app_id, app_secret=app_secret, constellation=constellation)
+
+    def local():
+        return local_star_chart(latitude, longitude, date_str=date_str, style=style, constellation=constellation)
+
+    engines = [remote, local] if ASTRONOMY_ENGINE == 'remote' else [local] + ([remote] if app_id else [])
+    result = {}
+    for engine in engines:
+        result = engine()
+        if result.get("success"):
+            break
+        print(f"Astronomy engine '{engine.__name__}' failed: {result.get('error')}", file=sys.stderr)
+    return result
+
+
+def valid_date(date_str):
+    try:
+        return datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
 
-    # Call the refactored function to get the star chart URL
-    result = get_star_chart_image_url(
-        latitude=location_data["latitude"],
-        longitude=location_data["longitude"],
-        app_id=app_id,
-        app_secret=app_secret
-    )
+@app.route('/api/astronomy', methods=['POST'])
+@endpoint_deadline('astronomy')
+@admitted('astronomy')
+def get_astronomy_info():
+    """Endpoint to get astronomy information (star chart image URL).
+
+    Uses latitude/longitude (or a place name) from the request body when given, otherwise the
+    client's IP location. Optional body fields: date (YYYY-MM-DD), style, constellation (e.g. "ori").
+    """
+    data = request.get_json(silent=True) or {}
+    if ASTRONOMY_ENGINE == 'remote' and astronomy_credentials()[0] is None:
+        return jsonify({"success": False, "error": "Astronomy API credentials (APP_ID, APP_SECRET) not configured on server."}), 500
+
+    location_data, error = astronomy_location(data)
+    if error:
+        return error
+
+    date_str = data.get('date') or None
+    if date_str and valid_date(date_str) is None:
+        return jsonify({"success": False, "error": "Invalid date (expected YYYY-MM-DD)"}), 400
+
+    result = render_star_chart(location_data["latitude"], location_data["longitude"], date_str=date_str,
+                               style=data.get('style') or "default", constellation=data.get('constellation') or None)
 
     if result.get("success"):
         # Instead of raw output, return the image URL
-        return jsonify({"success": True, "data": {"image_url": result["image_url"]}})
+        body = {"image_url": result["image_url"]}
+        if result.get("stale"):
+            body["stale"] = True # Last good chart, served while astronomyapi.com is failing
+        return jsonify({"success": True, "data": body})
     else:
         error_msg = result.get("error", "Failed to generate star chart.")
         details = result.get("details")
@@ -314,7 +1139,104 @@ def get_astronomy_info():
         return jsonify({"success": False, "error": error_msg, "details": details}), 500
 
 
+# --- Multi-night Astronomy ---
+# Charts for every night of a trip (and every requested view) are rendered or fetched
+# concurrently on one bounded pool per worker, instead of one serialized request per date.
+ASTRONOMY_RANGE_WORKERS = int(os.getenv('ASTRONOMY_RANGE_WORKERS', '4'))
+MAX_RANGE_NIGHTS = 14
+MAX_RANGE_VIEWS = 5
+
+_astronomy_pool = None
+_astronomy_pool_lock = threading.Lock()
+
+def get_astronomy_pool():
+    """Thread pool for chart generation, started on first use (after any fork)."""
+    global _astronomy_pool
+    if _astronomy_pool is None:
+        with _astronomy_pool_lock:
+            if _astronomy_pool is None:
+                _astronomy_pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=ASTRONOMY_RANGE_WORKERS, thread_name_prefix="astronomy")
+    return _astronomy_pool
+
+
+@app.route('/api/astronomy/range', methods=['POST'])
+@endpoint_deadline('astronomy_range')
+@admitted('astronomy_range')
+def get_astronomy_range():
+    """Star charts for each night from start_date to end_date (inclusive, at most MAX_RANGE_NIGHTS).
+
+    Body: location as for /api/astronomy, start_date/end_date (YYYY-MM-DD), style, and views: a list
+    of "area" and/or constellation codes (e.g. ["area", "ori", "sco"]; default ["area"]).
+    Charts that fail (or miss the deadline) are reported per chart; the request succeeds if any chart did.
+    """
+    data = request.get_json(silent=True) or {}
+    if ASTRONOMY_ENGINE == 'remote' and astronomy_credentials()[0] is None:
+        return jsonify({"success": False, "error": "Astronomy API credentials (APP_ID, APP_SECRET) not configured on server."}), 500
+
+    start, end = valid_date(data.get('start_date')), valid_date(data.get('end_date') or data.get('start_date'))
+    if start is None or end is None:
+        return jsonify({"success": False, "error": "Invalid or missing start_date/end_date (expected YYYY-MM-DD)"}), 400
+    nights = (end - start).days + 1
+    if nights < 1 or nights > MAX_RANGE_NIGHTS:
+        return jsonify({"success": False, "error": f"The date range must cover 1 to {MAX_RANGE_NIGHTS} nights"}), 400
+
+    views = data.get('views') or ["area"]
+    if (not isinstance(views, list) or len(views) > MAX_RANGE_VIEWS
+            or not all(isinstance(v, str) and (v == "area" or (len(v) == 3 and v.isalpha())) for v in views)):
+        return jsonify({"success": False, "error": f"views must be a list of up to {MAX_RANGE_VIEWS} entries: \"area\" or 3-letter constellation codes"}), 400
+    views = list(dict.fromkeys(v.lower() for v in views))
+
+    location_data, error = astronomy_location(data)
+    if error:
+        return error
+    latitude, longitude = location_data["latitude"], location_data["longitude"]
+    style = data.get('style') or "default"
+
+    pool = get_astronomy_pool()
+    dates = [(start + datetime.timedelta(days=i)).isoformat() for i in range(nights)]
+    futures = {
+        (date_str, view): pool.submit(deadlines.bind(render_star_chart), latitude, longitude, date_str=date_str,
+                                      style=style, constellation=None if view == "area" else view)
+        for date_str in dates for view in views
+    }
+    done, not_done = concurrent.futures.wait(futures.values(), timeout=deadlines.remaining())
+    for future in not_done:
+        future.cancel()
+
+    results, succeeded = [], 0
+    for date_str in dates:
+        charts = []
+        for view in views:
+            future = futures[(date_str, view)]
+            chart = {"view": view}
+            if future not in done:
+                chart["error"] = "Timed out"
+            else:
+                try:
+                    result = future.result()
+                except Exception as e: # e.g. the deadline passed inside the chart call
+                    result = {"error": str(e)}
+                if result.get("success"):
+                    chart["image_url"] = result["image_url"]
+                    if result.get("stale"):
+                        chart["stale"] = True
+                    succeeded += 1
+                else:
+                    chart["error"] = result.get("error", "Failed to generate star chart.")
+            charts.append(chart)
+        results.append({"date": date_str, "charts": charts})
+
+    body = {"latitude": latitude, "longitude": longitude, "nights": results}
+    if not_done:
+        body["partial"] = True
+    if not succeeded:
+        return jsonify({"success": False, "error": "No star chart could be generated.", "data": body}), 500
+    return jsonify({"success": True, "data": body})
+
+
 # --- Main Execution ---
 if __name__ == '__main__':
-    # Note: debug=True is helpful for development but should be False in production
+    # Note: debug=True is helpful for development but should be False in production.
+    # For production, run `python serve.py` (multiple pre-forked workers) instead.
     app.run(debug=True, port=5001) # Using port 5001 to avoid potential conflicts
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""Payload size and encode/decode time of JSON versus MessagePack and CBOR responses.
+
+Encodes representative /api/* response bodies -- place autocomplete, an auto
+identification with several subjects, and adventure location lists of growing
+size -- as indented JSON (what the identification scripts used to print),
+compact JSON (what the API sends), and the MessagePack and CBOR forms a client
+gets with "Accept: application/msgpack" or "application/cbor". Reports raw and
+gzip-compressed sizes and the median encode and decode times.
+
+Needs msgpack and cbor2 (pip install msgpack cbor2); makes no network or model calls.
+
+Usage (from the project root):
+    python benchmarks/bench_encoding.py [--sizes 35 500 2000] [--repeat 200]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src", "APIs"))
+
+import response_encoding
+from response_encoding import CBOR, MSGPACK
+from gazetteer import get_gazetteer
+
+CATEGORIES = ["Hiking Trail", "Fishing Spot", "Campsite", "Park", "Scenic Viewpoint",
+              "Kayaking/Canoeing Launch Point", "Mountain Biking Trail"]
+
+
+def synthetic_locations(count, seed=0):
+    rng = random.Random(seed)
+    return [{
+        "name": f"Spot {i}",
+        "type": rng.choice(CATEGORIES),
+        "latitude": 38.0 + rng.random() * 2.5,
+        "longitude": -79.0 + rng.random() * 3.0,
+    } for i in range(count)]
+
+
+def identification_payload():
+    subject = {
+        "kingdom": "bird", "common_name": "Northern Cardinal", "scientific_name": "Cardinalis cardinalis",
+        "places_found": "Eastern and central United States, southeastern Canada, Mexico",
+        "fun_fact": "Both males and females sing, and pairs often share song phrases.", "confidence": 0.93,
+    }
+    data = dict(subject, id_type="bird", resolution="thumb", subjects=[subject, dict(subject, kingdom="flora")])
+    return {"success": True, "data": data}
+
+
+def encoders():
+    json_text = lambda obj: json.dumps(obj, indent=4).encode("utf-8")
+    return [
+        ("json-indent", json_text, lambda data: json.loads(data)),
+        ("json", lambda obj: response_encoding.compact_json(obj).encode("utf-8"), lambda data: json.loads(data)),
+        ("msgpack", lambda obj: response_encoding.encode(obj, MSGPACK), lambda data: response_encoding.decode(data, MSGPACK)),
+        ("cbor", lambda obj: response_encoding.encode(obj, CBOR), lambda data: response_encoding.decode(data, CBOR)),
+    ]
+
+
+def median_seconds(fn, arg, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def report(name, payload, repeat):
+    print(f"\n{name}")
+    baseline = None
+    for label, encode, decode in encoders():
+        data = encode(payload)
+        baseline = baseline or len(data)
+        encode_time = median_seconds(encode, payload, repeat)
+        decode_time = median_seconds(decode, data, repeat)
+        print(f"  {label:<12} {len(data):9d} B ({len(data) / baseline:6.1%})  gzip {len(gzip.compress(data)):8d} B  "
+              f"encode {encode_time * 1e6:9.1f} us  decode {decode_time * 1e6:9.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON, MessagePack and CBOR response payloads.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[35, 500, 2000],
+                        help="Location list sizes (35 = one finder result: 7 categories x 5).")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    if response_encoding.msgpack is None or response_encoding.cbor2 is None:
+        sys.exit("msgpack and cbor2 are required: pip install msgpack cbor2")
+
+    suggestions = get_gazetteer().autocomplete("rich", limit=8)
+    report("autocomplete (8 places)", {"success": True, "suggestions": suggestions}, args.repeat)
+    report("identification (auto, 2 subjects)", identification_payload(), args.repeat)
+    for size in args.sizes:
+        report(f"locations ({size})", {"success": True, "locations": synthetic_locations(size)},
+               max(10, args.repeat // max(1, size // 100)))
+
+
+if __name__ == "__main__":
+    main()
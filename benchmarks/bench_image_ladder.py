@@ -0,0 +1,129 @@
+"""Bytes sent, latency and accuracy of each rung of the identification image ladder.
+
+For every sample image in src/APIs/images (or --images), identifies the subject
+at each fixed rung (thumb, medium, crop, full) and with the adaptive ladder, and
+reports the average bytes sent, latency, self-reported confidence and accuracy.
+Accuracy is measured against --labels (a JSON file mapping image file names to
+the expected common name) when given, otherwise against the full-resolution
+answer. Also prints the production ladder counters from the shared cache.
+
+Needs google-generativeai, Pillow and a key in GEMINI_API_KEY or src/APIs/secret.py.
+
+Usage (from the project root):
+    python benchmarks/bench_image_ladder.py [--runs 3] [--labels labels.json] [--threshold 0.7]
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src", "APIs"))
+
+import google.generativeai as genai
+import image_ladder
+from image_ladder import CONFIDENCE_PROMPT, RUNGS, identify, image_rungs
+from structured_output import Identification, StructuredOutputError
+from shared_cache import get_shared_cache
+
+# test_<kind>.jpg -> what the prompt asks for (mirrors the identification scripts)
+SUBJECTS = {"animal": "animal", "bird": "bird", "flora": "plant or flower"}
+
+
+def prompt_for(path):
+    kind = os.path.splitext(os.path.basename(path))[0].rsplit("_", 1)[-1]
+    subject = SUBJECTS.get(kind, "animal, bird, or plant")
+    return (f"You are a professional naturalist. Identify the {subject} in the provided image. "
+            "Give its common name, scientific name, common locations/habitats as a comma-separated string "
+            "in places_found, and one interesting fun fact." + CONFIDENCE_PROMPT)
+
+
+def same_name(answer, expected):
+    answer, expected = answer.lower().strip(), expected.lower().strip()
+    return bool(answer) and (answer in expected or expected in answer)
+
+
+def run(model, path, rungs, threshold, runs):
+    """(bytes, seconds, confidence, common name, rung used) per run; empty if the rung doesn't exist for this image."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not any(True for _ in image_rungs(data, rungs)):
+        return []
+    results = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        try:
+            record, details = identify(prompt_for(path), path, Identification, task="bench_ladder",
+                                       threshold=threshold, rungs=rungs, model=model)
+        except (StructuredOutputError, ValueError) as e:
+            print(f"  {os.path.basename(path)} {'+'.join(rungs)}: failed ({e})", file=sys.stderr)
+            continue
+        results.append((details["bytes_sent"], time.perf_counter() - start, details["confidence"],
+                        record["common_name"], details["resolution"]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare identification at each image resolution rung.")
+    parser.add_argument("--images", default=os.path.join(ROOT, "src", "APIs", "images"))
+    parser.add_argument("--labels", help="JSON file mapping image file names to expected common names.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=image_ladder.CONFIDENCE_THRESHOLD)
+    parser.add_argument("--model", default="gemini-1.5-flash-latest")
+    args = parser.parse_args()
+
+    if image_ladder.Image is None:
+        sys.exit("Pillow is required for the lower rungs: pip install pillow")
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        from secret import GEMINI_API_KEY as api_key
+    genai.configure(api_key=api_key)
+    model = genai.GenerativeModel(args.model)
+
+    labels = {}
+    if args.labels:
+        with open(args.labels) as f:
+            labels = json.load(f)
+
+    paths = sorted(glob.glob(os.path.join(args.images, "*.jpg")) + glob.glob(os.path.join(args.images, "*.png")))
+    modes = [(rung, (rung,)) for rung in RUNGS] + [("ladder", RUNGS)]
+    totals = {name: [] for name, _ in modes}
+    for path in paths:
+        name = os.path.basename(path)
+        print(f"\n{name} ({os.path.getsize(path)} bytes)")
+        results = {mode: run(model, path, rungs, args.threshold, args.runs) for mode, rungs in modes}
+        reference = labels.get(name) or next((r[3] for r in results["full"]), "")
+        for mode, _ in modes:
+            rows = results[mode]
+            if not rows:
+                print(f"  {mode:<7} (not used for this image)")
+                continue
+            correct = [same_name(r[3], reference) for r in rows]
+            totals[mode].extend((r[0], r[1], c) for r, c in zip(rows, correct))
+            rungs_used = ",".join(sorted({r[4] for r in rows}))
+            print(f"  {mode:<7} bytes={statistics.mean(r[0] for r in rows):9.0f} "
+                  f"latency={statistics.mean(r[1] for r in rows):5.2f}s "
+                  f"confidence={statistics.mean(r[2] for r in rows):4.2f} "
+                  f"accuracy={sum(correct)}/{len(correct)}"
+                  + (f" answered_at={rungs_used}" if mode == "ladder" else ""))
+
+    print("\nOverall:")
+    for mode, _ in modes:
+        rows = totals[mode]
+        if rows:
+            print(f"  {mode:<7} bytes={statistics.mean(r[0] for r in rows):9.0f} "
+                  f"latency={statistics.mean(r[1] for r in rows):5.2f}s "
+                  f"accuracy={sum(r[2] for r in rows) / len(rows):6.1%}")
+
+    counters = get_shared_cache().counters("ladder:identify")
+    if counters:
+        print("\nProduction counters (shared cache):")
+        for key, value in counters.items():
+            print(f"  {key}: {value:g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Import-time and cold-start report.
+
+Runs `python -X importtime` for the backend and the heavy third-party modules and
+prints the total import time plus the slowest imports, and compares the cost of
+running a script as a fresh subprocess against forking it from the preloaded
+template process.
+
+Usage (from the project root):
+    python benchmarks/bench_import_time.py [--top 15] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TARGETS = [
+    ("backend_app", "import backend_app"),
+    ("astronomy_api", "import src.APIs.astronomy_api"),
+    ("google.generativeai", "import google.generativeai"),
+    ("folium", "import folium"),
+]
+
+
+def import_time_report(statement):
+    """Returns (total_us, [(cumulative_us, module), ...]) from `python -X importtime`."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True, text=True, cwd=ROOT,
+    )
+    if process.returncode != 0:
+        return None, process.stderr.strip().splitlines()[-1:]
+
+    entries = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line[len("import time:"):].split("|")
+        # Nested imports are indented by two spaces per level after the separator
+        entries.append((int(cumulative_us), module[1:].rstrip()))
+    total = sum(cumulative for cumulative, module in entries if not module.startswith(" "))
+    return total, sorted(entries, reverse=True)
+
+
+def time_runs(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def bench_script_start(runs):
+    """Median wall time of a trivial script: fresh interpreter vs template fork."""
+    from src.APIs.script_template import TemplateClient, is_supported
+
+    with tempfile.TemporaryDirectory() as tmp:
+        script = os.path.join(tmp, "noop.py")
+        with open(script, "w") as f:
+            f.write("import google.generativeai, folium\nprint('ok')\n")
+
+        cold = time_runs(lambda: subprocess.run([sys.executable, script], capture_output=True), runs)
+        print(f"  subprocess (cold imports): {cold * 1000:8.1f} ms")
+
+        if not is_supported():
+            print("  template fork: not supported on this platform")
+            return
+        client = TemplateClient(os.path.join(tmp, "template.sock"))
+        try:
+            client.run(script, [])  # Start and warm the template
+            warm = time_runs(lambda: client.run(script, []), runs)
+            print(f"  template fork (preloaded): {warm * 1000:8.1f} ms")
+        finally:
+            client.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import times and script cold-start cost.")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to list per target.")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per script start-up measurement.")
+    args = parser.parse_args()
+
+    for name, statement in TARGETS:
+        total, entries = import_time_report(statement)
+        print(f"\n== {name} ==")
+        if total is None:
+            print(f"  import failed: {' '.join(entries)}")
+            continue
+        print(f"  total import time: {total / 1000:.1f} ms")
+        for cumulative, module in entries[:args.top]:
+            print(f"  {cumulative / 1000:8.1f} ms  {module.strip()}")
+
+    print("\n== script start-up ==")
+    bench_script_start(args.runs)
+
+
+if __name__ == "__main__":
+    main()
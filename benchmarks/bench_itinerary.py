@@ -0,0 +1,82 @@
+"""Solve time and route length of the itinerary optimizer as the number of spots grows.
+
+For random spots spread over a finder-sized area, compares building the distance
+matrix with one vectorized NumPy expression against a pure-Python haversine per
+pair, and reports the nearest-neighbour route length, the length after 2-opt,
+and the full plan_itinerary() time (with and without a time budget).
+
+Needs numpy; makes no network or model calls.
+
+Usage (from the project root):
+    python benchmarks/bench_itinerary.py [--sizes 35 100 300 1000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src", "APIs"))
+
+import itinerary
+from adventure_map import CATEGORIES
+from route_finder import haversine_miles
+
+CENTRE = (38.0293, -78.4767)
+
+
+def synthetic_locations(count, seed=0, spread=0.4):
+    rng = random.Random(seed)
+    return [{
+        "name": f"Spot {i}",
+        "type": rng.choice(list(CATEGORIES)),
+        "latitude": CENTRE[0] + (rng.random() - 0.5) * spread,
+        "longitude": CENTRE[1] + (rng.random() - 0.5) * spread,
+    } for i in range(count)]
+
+
+def median_seconds(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the itinerary optimizer.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[35, 100, 300, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget_hours", type=float, default=8.0)
+    args = parser.parse_args()
+
+    itinerary.distance_matrix([0.0], [0.0])  # Import numpy before timing
+    print(f"{'spots':>6} {'matrix np':>10} {'matrix py':>10} {'nn miles':>9} {'2-opt miles':>11} "
+          f"{'solve':>9} {'solve+budget':>13} {'kept':>5}")
+    for size in args.sizes:
+        locations = synthetic_locations(size, seed=size)
+        lats = [CENTRE[0]] + [loc["latitude"] for loc in locations]
+        lons = [CENTRE[1]] + [loc["longitude"] for loc in locations]
+
+        numpy_time = median_seconds(lambda: itinerary.distance_matrix(lats, lons), args.repeat)
+        python_time = median_seconds(
+            lambda: [[haversine_miles(a, b, c, d) for c, d in zip(lats, lons)] for a, b in zip(lats, lons)],
+            1 if size > 300 else args.repeat)
+
+        dist = itinerary.distance_matrix(lats, lons)
+        nn = itinerary.tour_miles(dist, itinerary.nearest_neighbor(dist))
+        solved = itinerary.plan_itinerary(locations, CENTRE)
+        solve_time = median_seconds(lambda: itinerary.plan_itinerary(locations, CENTRE), args.repeat)
+        budgeted = itinerary.plan_itinerary(locations, CENTRE, time_budget_minutes=args.budget_hours * 60)
+        budget_time = median_seconds(
+            lambda: itinerary.plan_itinerary(locations, CENTRE, time_budget_minutes=args.budget_hours * 60), args.repeat)
+
+        print(f"{size:6d} {numpy_time * 1000:8.2f}ms {python_time * 1000:8.1f}ms {nn:9.1f} {solved['total_miles']:11.1f} "
+              f"{solve_time * 1000:7.1f}ms {budget_time * 1000:11.1f}ms {len(budgeted['stops']):5d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Map size and build time with and without server-side clustering.
+
+Renders adventure maps for synthetic result sets of growing size twice: with a
+folium marker per location (the old behaviour) and with the clustered data
+directory that map_clusters.py writes for large maps. Reports the HTML size the
+browser must parse up front, the largest file it may fetch later, the number of
+features drawn at the initial zoom, and the build time.
+
+Needs folium and numpy; makes no network or model calls.
+
+Usage (from the project root):
+    python benchmarks/bench_map_clusters.py [--sizes 100 1000 5000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src", "APIs"))
+
+import adventure_map
+import map_clusters
+from adventure_map import CATEGORIES, render_map
+
+INITIAL_ZOOM = 8
+
+
+def synthetic_locations(count, seed=0):
+    rng = random.Random(seed)
+    types = list(CATEGORIES)
+    return [{
+        "name": f"Spot {i}",
+        "type": rng.choice(types),
+        "latitude": 38.0 + rng.random() * 2.5,
+        "longitude": -79.0 + rng.random() * 3.0,
+    } for i in range(count)]
+
+
+def measure(locations, output_file, clustered):
+    # Force the mode under test regardless of the threshold
+    adventure_map.CLUSTER_THRESHOLD = 0 if clustered else len(locations) + 1
+    start = time.perf_counter()
+    render_map(locations, [39.2, -77.5], INITIAL_ZOOM, output_file)
+    elapsed = time.perf_counter() - start
+    html_size = os.path.getsize(output_file)
+
+    data_dir = map_clusters.data_dir_for(output_file)
+    if clustered:
+        sizes = [os.path.getsize(os.path.join(data_dir, name)) for name in os.listdir(data_dir)]
+        with open(os.path.join(data_dir, f"clusters_{INITIAL_ZOOM}.json")) as f:
+            drawn = len(json.load(f))
+        largest = max(sizes)
+    else:
+        drawn, largest = len(locations), 0
+    return elapsed, html_size, largest, drawn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-marker and clustered adventure maps.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")  # folium warns about tile providers needing keys
+
+    print(f"{'points':>7} {'mode':<10} {'build':>8} {'html':>10} {'largest fetch':>14} {'drawn@z8':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.sizes:
+            locations = synthetic_locations(count)
+            for clustered in (False, True):
+                mode = "clustered" if clustered else "markers"
+                elapsed, html_size, largest, drawn = measure(locations, os.path.join(tmp, f"{mode}_{count}.html"), clustered)
+                print(f"{count:>7} {mode:<10} {elapsed:>7.2f}s {html_size / 1024:>8.1f}KB {largest / 1024:>12.1f}KB {drawn:>9}")
+
+
+if __name__ == "__main__":
+    main()
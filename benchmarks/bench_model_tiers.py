@@ -0,0 +1,114 @@
+"""Latency, parse success and cost of each Gemini model tier per task (A/B comparison).
+
+Runs the fish, finder and identify prompts (the same ones the scripts send) on
+every tier in model_router.TIERS -- or just --tiers -- several times each, and
+reports median and 90th-percentile latency, parse-success rate, average tokens
+and the estimated cost per call. Also prints the production per-model counters
+(model:*), which include the calls A/B-sampled with MODEL_AB_FRACTION.
+
+Needs google-generativeai and a key in GEMINI_API_KEY or src/APIs/secret.py.
+
+Usage (from the project root):
+    python benchmarks/bench_model_tiers.py [--runs 5] [--tasks fish finder identify] [--tiers lite flash]
+"""
+import argparse
+import base64
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src", "APIs"))
+
+import google.generativeai as genai
+import model_router
+from adventure_map import CATEGORIES
+from image_ladder import CONFIDENCE_PROMPT
+from structured_output import AdventureResults, FishList, Identification, StructuredOutputError, generate_record
+from shared_cache import get_shared_cache
+
+LATITUDE, LONGITUDE, RADIUS_MILES = 38.8951, -77.0364, 15.0
+
+
+def tasks(image_path):
+    """task -> (contents, record type, max_output_tokens), mirroring fishy.py, adventure_finder.py and the identifiers."""
+    with open(image_path, "rb") as f:
+        image = base64.b64encode(f.read()).decode("utf-8")
+    return {
+        "fish": (f"Name the top 5 fish species commonly found at longitude {LONGITUDE} and latitude {LATITUDE}.",
+                 FishList, None),
+        "finder": ((f"You are an expert local guide for outdoor adventures. List up to 5 locations for each of these categories "
+                    f"within about {RADIUS_MILES * 1.60934:.1f} km ({RADIUS_MILES:.1f} miles) of latitude {LATITUDE}, "
+                    f"longitude {LONGITUDE}: {', '.join(CATEGORIES)}. Set \"type\" to one of those category names exactly. "
+                    "Use accurate coordinates, and return fewer (or no) locations rather than inventing any."),
+                   AdventureResults, 4096),
+        "identify": ([("You are a professional naturalist. Identify the animal, bird, or plant in the provided image. "
+                       "Give its common name, scientific name, common locations/habitats as a comma-separated string "
+                       "in places_found, and one interesting fun fact." + CONFIDENCE_PROMPT),
+                      {"inline_data": {"mime_type": "image/jpeg", "data": image}}],
+                     Identification, None),
+    }
+
+
+def run(model_name, contents, record_type, max_output_tokens, runs):
+    model = genai.GenerativeModel(model_name)
+    latencies, prompt_tokens, output_tokens, parsed = [], [], [], 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        try:
+            _, response = generate_record(model, contents, record_type, task="bench_tiers",
+                                          max_output_tokens=max_output_tokens)
+            parsed += 1
+            usage = response.usage_metadata
+            prompt_tokens.append(usage.prompt_token_count)
+            output_tokens.append(usage.candidates_token_count)
+        except StructuredOutputError:
+            pass
+        except Exception as e:
+            print(f"  {model_name}: call failed ({e})", file=sys.stderr)
+        latencies.append(time.perf_counter() - start)
+    return latencies, prompt_tokens, output_tokens, parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Gemini model tiers per task on latency, parse success and cost.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--tasks", nargs="+", default=["fish", "finder", "identify"])
+    parser.add_argument("--tiers", nargs="+", default=list(model_router.TIER_ORDER), choices=model_router.TIER_ORDER)
+    parser.add_argument("--image", default=os.path.join(ROOT, "src", "APIs", "images", "test_bird.jpg"))
+    args = parser.parse_args()
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        from secret import GEMINI_API_KEY as api_key
+    genai.configure(api_key=api_key)
+
+    prompts = tasks(args.image)
+    for task in args.tasks:
+        contents, record_type, max_output_tokens = prompts[task]
+        print(f"\n{task} (routed to {model_router.ROUTES.get(task, model_router.DEFAULT_TIER)})")
+        for tier in args.tiers:
+            model_name = model_router.TIERS[tier]
+            latencies, prompt_tokens, output_tokens, parsed = run(model_name, contents, record_type,
+                                                                  max_output_tokens, args.runs)
+            latencies.sort()
+            p90 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.9))]
+            cost = ""
+            if model_name in model_router.PRICES and prompt_tokens:
+                prompt_price, output_price = model_router.PRICES[model_name]
+                per_call = (statistics.mean(prompt_tokens) * prompt_price + statistics.mean(output_tokens) * output_price) / 1e6
+                cost = f" cost/call=${per_call:.6f}"
+            print(f"  {tier:<6} {model_name:<26} p50={statistics.median(latencies):6.2f}s p90={p90:6.2f}s "
+                  f"parsed={parsed}/{args.runs} prompt_tokens={statistics.mean(prompt_tokens or [0]):7.1f} "
+                  f"output_tokens={statistics.mean(output_tokens or [0]):7.1f}{cost}")
+
+    counters = get_shared_cache().counters("model:")
+    if counters:
+        print("\nProduction counters (shared cache):")
+        for key, value in counters.items():
+            print(f"  {key}: {value:g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Throughput of serve.py as the number of worker processes grows.
+
+For each worker count, starts `python serve.py --workers N` on a free port, then
+drives it with several client processes for a fixed duration and reports
+requests per second and latency percentiles.
+
+Usage (from the project root):
+    python benchmarks/bench_scaling.py [--workers 1,2,4] [--clients 8] [--duration 5] [--path /api/health]
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_TIMEOUT = 30
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/api/health")
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def client_loop(port, path, duration, results):
+    """Issues requests back to back for `duration` seconds and records latencies."""
+    latencies, errors = [], 0
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        start = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            conn.request("GET", path, headers={"Accept-Encoding": "gzip"})
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+            if response.status >= 400:
+                errors += 1
+                continue
+        except OSError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    results.put((latencies, errors))
+
+
+def run_level(workers, clients, duration, path):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not wait_ready(port):
+            print(f"{workers:>7}  server did not start")
+            return
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=client_loop, args=(port, path, duration, results)) for _ in range(clients)]
+        for p in procs:
+            p.start()
+        latencies, errors = [], 0
+        for _ in procs:
+            lat, err = results.get()
+            latencies.extend(lat)
+            errors += err
+        for p in procs:
+            p.join()
+
+        if not latencies:
+            print(f"{workers:>7}  no successful requests ({errors} errors)")
+            return
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+        print(f"{workers:>7}  {len(latencies) / duration:>10.1f}  {p50:>8.2f}  {p99:>8.2f}  {errors:>6}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    levels = sorted({1, 2, 4, cores} & set(range(1, cores + 1))) or [1]
+    parser = argparse.ArgumentParser(description="Measure serve.py throughput versus worker count.")
+    parser.add_argument("--workers", default=",".join(map(str, levels)), help="Comma-separated worker counts to test.")
+    parser.add_argument("--clients", type=int, default=max(4, cores * 2), help="Concurrent client processes.")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds to run each level.")
+    parser.add_argument("--path", default="/api/health", help="Request path to hammer (e.g. / for the index page).")
+    args = parser.parse_args()
+
+    print(f"path={args.path} clients={args.clients} duration={args.duration}s cores={cores}")
+    print(f"{'workers':>7}  {'req/s':>10}  {'p50 ms':>8}  {'p99 ms':>8}  {'errors':>6}")
+    for workers in [int(w) for w in args.workers.split(",")]:
+        run_level(workers, args.clients, args.duration, args.path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Free-text JSON versus structured output for the adventure finder prompt.
+
+Runs the original prompt (long inline example, ```json fence stripping, json.loads)
+and the compact schema-constrained prompt the finder now uses, several times
+each, and reports prompt tokens, output tokens, latency and parse-failure rate.
+Also prints the production counters recorded in the shared cache (llm:*).
+
+Needs google-generativeai and a key in GEMINI_API_KEY or src/APIs/secret.py.
+
+Usage (from the project root):
+    python benchmarks/bench_structured_output.py [--runs 5] [--lat 38.8951 --lon -77.0364]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src", "APIs"))
+
+import google.generativeai as genai
+from structured_output import AdventureResults, StructuredOutputError, json_generation_config, parse_record
+from shared_cache import get_shared_cache
+
+CATEGORIES = ["Hiking Trail", "Fishing Spot", "Campsite", "Park", "Scenic Viewpoint",
+              "Kayaking/Canoeing Launch Point", "Mountain Biking Trail"]
+
+
+def legacy_prompt(latitude, longitude, radius_km, radius_miles):
+    """The finder prompt as it was before structured output (abridged example kept verbatim in spirit)."""
+    category_list_str = ", ".join(CATEGORIES)
+    return f"""
+You are an expert local guide specializing in outdoor adventures.
+Find the top 5 locations for each of the following categories within approximately {radius_km:.1f} km (equivalent to {radius_miles:.1f} miles) of latitude {latitude}, longitude {longitude}:
+{category_list_str}.
+
+Respond ONLY with a valid JSON object containing a single key "locations".
+The value of "locations" should be a list of JSON objects, where each object represents a location and has the following keys:
+- "name": The name of the location.
+- "type": The type of location (must be one of: {category_list_str}).
+- "latitude": The latitude of the location (float).
+- "longitude": The longitude of the location (float).
+
+Aim to provide up to 5 distinct locations for each category if available within the radius.
+
+Example JSON format:
+{{
+  "locations": [
+    {{
+      "name": "Example Trail Head",
+      "type": "Hiking Trail",
+      "latitude": {latitude + 0.01},
+      "longitude": {longitude + 0.01}
+    }},
+    // ... up to 5 hiking trails
+    {{
+      "name": "Example Park Entrance",
+      "type": "Park",
+      "latitude": {latitude + 0.015},
+      "longitude": {longitude - 0.015}
+    }},
+    // ... up to 5 parks
+    {{
+      "name": "Example Scenic Overlook",
+      "type": "Scenic Viewpoint",
+      "latitude": {latitude - 0.01},
+      "longitude": {longitude + 0.01}
+    }},
+    // ... up to 5 viewpoints
+    // ... etc. for all requested categories
+  ]
+}}
+
+Ensure the coordinates are as accurate as possible. Do not include any text before or after the JSON object. If no locations are found for a category or overall, return an empty list or fewer items as appropriate: {{"locations": []}}.
+"""
+
+
+def compact_prompt(latitude, longitude, radius_km, radius_miles):
+    """Mirror of the prompt in adventure_finder.py."""
+    return (
+        f"You are an expert local guide for outdoor adventures. List up to 5 locations for each of these categories "
+        f"within about {radius_km:.1f} km ({radius_miles:.1f} miles) of latitude {latitude}, longitude {longitude}: "
+        f"{', '.join(CATEGORIES)}. Set \"type\" to one of those category names exactly. "
+        "Use accurate coordinates, and return fewer (or no) locations rather than inventing any."
+    )
+
+
+def parse_legacy(text):
+    json_text = text.strip().removeprefix("```json").removesuffix("```").strip()
+    return json.loads(json_text)["locations"]
+
+
+def parse_structured(text):
+    return parse_record(text, AdventureResults)["locations"]
+
+
+def run_mode(model, name, prompt, config, parse, runs):
+    prompt_tokens, output_tokens, latencies, failures = [], [], [], 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        try:
+            response = model.generate_content(prompt, generation_config=config)
+            latencies.append(time.perf_counter() - start)
+            usage = response.usage_metadata
+            prompt_tokens.append(usage.prompt_token_count)
+            output_tokens.append(usage.candidates_token_count)
+            parse(response.text)
+        except (json.JSONDecodeError, KeyError, StructuredOutputError, ValueError):
+            failures += 1
+    print(f"{name:<12} prompt_tokens={statistics.mean(prompt_tokens or [0]):7.1f} "
+          f"output_tokens={statistics.mean(output_tokens or [0]):7.1f} "
+          f"p50_latency={statistics.median(latencies or [0]):6.2f}s "
+          f"parse_failures={failures}/{runs}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare free-text JSON and structured output for the finder.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--lat", type=float, default=38.8951)
+    parser.add_argument("--lon", type=float, default=-77.0364)
+    parser.add_argument("--radius_miles", type=float, default=15.0)
+    parser.add_argument("--model", default="gemini-1.5-flash-latest")
+    args = parser.parse_args()
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        from secret import GEMINI_API_KEY as api_key
+    genai.configure(api_key=api_key)
+    model = genai.GenerativeModel(args.model)
+
+    radius_km = args.radius_miles * 1.60934
+    legacy = legacy_prompt(args.lat, args.lon, radius_km, args.radius_miles)
+    compact = compact_prompt(args.lat, args.lon, radius_km, args.radius_miles)
+    run_mode(model, "free-text", legacy, genai.GenerationConfig(max_output_tokens=4096), parse_legacy, args.runs)
+    run_mode(model, "structured", compact, json_generation_config(AdventureResults, 4096), parse_structured, args.runs)
+
+    counters = get_shared_cache().counters("llm:")
+    if counters:
+        print("\nProduction counters (shared cache):")
+        for key, value in counters.items():
+            print(f"  {key}: {value:g}")
+
+
+if __name__ == "__main__":
+    main()
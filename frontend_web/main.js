@@ -3,6 +3,7 @@ const planTripForm = document.getElementById('plan-trip-form');
 const mapContainer = document.getElementById('map-container');
 const mapIframe = document.getElementById('map-iframe');
 const statusMessage = document.getElementById('status-message'); // Common status element
+const itineraryList = document.getElementById('itinerary-list');
 
 if (planTripForm) {
     planTripForm.addEventListener('submit', async (event) => {
@@ -12,6 +13,10 @@ if (planTripForm) {
         if (statusMessage) statusMessage.textContent = '';
         if (mapContainer) mapContainer.style.display = 'none';
         if (mapIframe) mapIframe.src = 'about:blank'; // Clear previous map
+        if (itineraryList) {
+            itineraryList.innerHTML = '';
+            itineraryList.style.display = 'none';
+        }
 
         // Show loading message
         if (statusMessage) {
@@ -19,21 +24,36 @@ if (planTripForm) {
             statusMessage.className = ''; // Reset classes
         }
 
+        const place = document.getElementById('place')?.value.trim();
         const latitude = document.getElementById('latitude').value;
         const longitude = document.getElementById('longitude').value;
         const radius = document.getElementById('radius').value;
 
+        // Coordinates win when both are given; otherwise the backend geocodes the place name
+        const payload = { radius_miles: radius };
+        if (latitude && longitude) {
+            payload.latitude = latitude;
+            payload.longitude = longitude;
+        } else {
+            payload.place = place;
+        }
+
+        // Optional visiting order, limited to the chosen categories and the time available
+        if (document.getElementById('itinerary')?.checked) {
+            payload.itinerary = true;
+            const hours = document.getElementById('time-budget')?.value;
+            if (hours) payload.time_budget_hours = hours;
+            const categories = Array.from(document.getElementById('categories')?.selectedOptions || []).map((option) => option.value);
+            if (categories.length) payload.categories = categories;
+        }
+
         try {
             const response = await fetch('/api/plan_trip', { // Assuming backend runs on the same origin or proxied
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({
-                    latitude: latitude,
-                    longitude: longitude,
-                    radius_miles: radius
-                }),
+                body: JSON.stringify(payload),
             });
 
             const result = await response.json();
@@ -46,6 +66,16 @@ if (planTripForm) {
                     mapIframe.src = result.map_url + '?t=' + new Date().getTime();
                 }
                  if (mapContainer) mapContainer.style.display = 'block'; // Show the map container
+                if (itineraryList && result.itinerary) {
+                    result.itinerary.stops.forEach((stop) => {
+                        const item = document.createElement('li');
+                        const hours = Math.floor(stop.arrive_minute / 60);
+                        const minutes = String(stop.arrive_minute % 60).padStart(2, '0');
+                        item.textContent = `${stop.name} (${stop.type}) - ${stop.leg_miles} mi, arrive at +${hours}:${minutes}`;
+                        itineraryList.appendChild(item);
+                    });
+                    itineraryList.style.display = result.itinerary.stops.length ? 'block' : 'none';
+                }
             } else {
                 throw new Error(result.error || 'Failed to generate map. Check backend logs.');
             }
@@ -57,8 +87,36 @@ if (planTripForm) {
     });
 }
 
+// Place-name suggestions (answered locally by the backend's gazetteer)
+const placeInput = document.getElementById('place');
+const placeSuggestions = document.getElementById('place-suggestions');
+
+if (placeInput && placeSuggestions) {
+    let suggestTimer = null;
+    placeInput.addEventListener('input', () => {
+        clearTimeout(suggestTimer);
+        const query = placeInput.value.trim();
+        if (query.length < 2) return;
+        suggestTimer = setTimeout(async () => {
+            try {
+                const response = await fetch('/api/autocomplete?limit=8&q=' + encodeURIComponent(query));
+                const result = await response.json();
+                placeSuggestions.innerHTML = '';
+                (result.suggestions || []).forEach((suggestion) => {
+                    const option = document.createElement('option');
+                    option.value = suggestion.label;
+                    placeSuggestions.appendChild(option);
+                });
+            } catch (error) {
+                console.error('Error fetching place suggestions:', error);
+            }
+        }, 150);
+    });
+}
+
 // --- On Trip Page Logic ---
 const imageUpload = document.getElementById('image-upload');
+const identifyAutoBtn = document.getElementById('identify-auto-btn');
 const identifyAnimalBtn = document.getElementById('identify-animal-btn');
 const identifyBirdBtn = document.getElementById('identify-bird-btn');
 const identifyFloraBtn = document.getElementById('identify-flora-btn');
@@ -81,7 +139,7 @@ async function handleIdentification(idType) {
     const file = imageUpload.files[0];
     const formData = new FormData();
     formData.append('image', file);
-    formData.append('id_type', idType); // 'animal', 'bird', or 'flora'
+    formData.append('id_type', idType); // 'animal', 'bird', 'flora', or 'auto'
 
     // Clear previous status/results
     if (onTripStatusMessage) onTripStatusMessage.textContent = '';
@@ -103,15 +161,22 @@ async function handleIdentification(idType) {
         const result = await response.json();
 
         if (response.ok && result.success) {
-            if (onTripStatusMessage) onTripStatusMessage.textContent = `${idType.charAt(0).toUpperCase() + idType.slice(1)} identified successfully!`;
+            // In auto mode the backend reports which type it detected
+            const identifiedType = (result.data && result.data.id_type) || idType;
+            if (onTripStatusMessage) onTripStatusMessage.textContent = `${identifiedType.charAt(0).toUpperCase() + identifiedType.slice(1)} identified successfully!`;
             if (onTripStatusMessage) onTripStatusMessage.className = 'success';
             if (resultsDiv && result.data) {
-                // Format the identification results for display
-                let formattedText = `Identification Results:\n\n`;
-                formattedText += `Common Name: ${result.data.common_name || 'N/A'}\n`;
-                formattedText += `Scientific Name: ${result.data.scientific_name || 'N/A'}\n`;
-                formattedText += `Places Found: ${result.data.places_found || 'N/A'}\n`;
-                formattedText += `Fun Fact: ${result.data.fun_fact || 'N/A'}\n`;
+                // Format the identification results for display (auto mode may return several subjects)
+                const subjects = result.data.subjects || [result.data];
+                let formattedText = `Identification Results:\n`;
+                subjects.forEach((subject) => {
+                    formattedText += `\n`;
+                    if (subject.kingdom) formattedText += `Type: ${subject.kingdom}\n`;
+                    formattedText += `Common Name: ${subject.common_name || 'N/A'}\n`;
+                    formattedText += `Scientific Name: ${subject.scientific_name || 'N/A'}\n`;
+                    formattedText += `Places Found: ${subject.places_found || 'N/A'}\n`;
+                    formattedText += `Fun Fact: ${subject.fun_fact || 'N/A'}\n`;
+                });
 
                 resultsDiv.textContent = formattedText;
                 resultsDiv.style.display = 'block';
@@ -131,6 +196,9 @@ async function handleIdentification(idType) {
 }
 
 // Add event listeners for identification buttons
+if (identifyAutoBtn) {
+    identifyAutoBtn.addEventListener('click', () => handleIdentification('auto'));
+}
 if (identifyAnimalBtn) {
     identifyAnimalBtn.addEventListener('click', () => handleIdentification('animal'));
 }
@@ -223,14 +291,23 @@ async function handleAstronomy() {
         onTripStatusMessage.className = '';
     }
 
+    // Optional coordinates; without them the backend uses the client's IP location
+    const latitude = document.getElementById('info-latitude')?.value;
+    const longitude = document.getElementById('info-longitude')?.value;
+
+    const payload = {};
+    if (latitude && longitude) {
+        payload.latitude = latitude;
+        payload.longitude = longitude;
+    }
+
     try {
-        // No body needed for this request based on current backend implementation
         const response = await fetch('/api/astronomy', {
             method: 'POST',
              headers: {
-                'Content-Type': 'application/json', // Still good practice to send header
+                'Content-Type': 'application/json',
             },
-            body: JSON.stringify({}), // Send empty JSON object
+            body: JSON.stringify(payload),
         });
 
         const result = await response.json();
@@ -245,8 +322,7 @@ async function handleAstronomy() {
                     <p>Star Chart Image URL (click to view):</p>
                     <a href="${result.data.image_url}" target="_blank">${result.data.image_url}</a>
                 `;
-                // Optionally, try to embed the image directly:
-                // resultsDiv.innerHTML += `<br><img src="${result.data.image_url}" alt="Star Chart" style="max-width: 100%; height: auto;">`;
+                resultsDiv.innerHTML += `<br><img src="${result.data.image_url}" alt="Star Chart" style="max-width: 100%; height: auto;">`;
                 resultsDiv.style.display = 'block';
             } else if (resultsDiv) {
                  resultsDiv.textContent = "Astronomy info retrieved, but no image URL found in response.";
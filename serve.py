@@ -0,0 +1,148 @@
+"""Production launcher: runs backend_app with N pre-forked worker processes.
+
+The parent imports the app (and starts the script template process) once, binds
+the listening socket, then forks the workers so they all start warm and accept
+connections from the same socket. Dead workers are restarted. On SIGINT/SIGTERM
+each worker stops accepting connections, finishes its in-flight requests and
+gives running background jobs JOB_SHUTDOWN_GRACE seconds before exiting; workers
+still running SHUTDOWN_TIMEOUT seconds later are killed. Caches and other
+cross-request state live in SQLite under instance/ (see src/APIs/shared_cache.py),
+so every worker sees the same data.
+
+Each worker serves with werkzeug's threaded server (one thread per request),
+which is fine behind a reverse proxy on a trusted network but is not a hardened
+HTTP server. For internet-facing deployments use gunicorn instead, whose
+pre-fork model this mirrors:
+    gunicorn --preload --workers 4 --threads 8 --bind 0.0.0.0:5001 backend_app:app
+
+Usage:
+    python serve.py [--workers N] [--host 0.0.0.0] [--port 5001]
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+RESTART_DELAY = 1.0  # Seconds to wait before replacing a worker that died
+SHUTDOWN_TIMEOUT = 300  # Seconds workers get to drain before they are killed
+
+
+def default_workers():
+    """One worker per core available to this process."""
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+def bind_socket(host, port, backlog=1024):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, host, port):
+    """Serves requests on the shared socket until SIGTERM, then drains them and exits (runs in the forked child)."""
+    from werkzeug.serving import make_server
+    import backend_app
+
+    server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+    server.daemon_threads = False  # So server_close() waits for in-flight requests
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever() to return, so it can't run on this (the serving) thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C reaches the parent, which sends SIGTERM
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        backend_app.stop_job_pool()
+    # A normal exit (never return into the parent's code), so atexit handlers such
+    # as the worker's own script template shutdown run
+    sys.exit(0)
+
+
+def spawn_worker(app, sock, host, port):
+    pid = os.fork()
+    if pid == 0:
+        run_worker(app, sock, host, port)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the backend with multiple pre-forked workers.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_WORKERS", default_workers())),
+                        help="Number of worker processes (default: one per available core, or WEB_WORKERS).")
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"), help="Interface to bind (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "5001")), help="Port to bind (default: 5001).")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        print("Error: pre-forked workers need os.fork (not available on Windows). Use 'python backend_app.py'.", file=sys.stderr)
+        sys.exit(1)
+
+    # Import and warm up once in the parent so every forked worker starts ready
+    import backend_app  # Also loads .env
+    if backend_app.script_template is not None:
+        backend_app.script_template.start()
+    backend_app.get_gazetteer()  # Place-name index, shared copy-on-write by the workers
+
+    sock = bind_socket(args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} worker(s) (parent pid {os.getpid()})", file=sys.stderr)
+
+    workers = set(spawn_worker(backend_app.app, sock, args.host, args.port) for _ in range(args.workers))
+    stopping = False
+
+    def signal_workers(sig):
+        for pid in list(workers):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        if stopping:
+            return
+        stopping = True
+        signal_workers(signal.SIGTERM)
+        signal.alarm(SHUTDOWN_TIMEOUT)
+
+    def kill_stragglers(signum, frame):
+        print(f"Workers still running after {SHUTDOWN_TIMEOUT}s; killing them.", file=sys.stderr)
+        signal_workers(signal.SIGKILL)
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGALRM, kill_stragglers)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        if pid not in workers:
+            continue  # e.g. the script template process
+        workers.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}; restarting.", file=sys.stderr)
+            time.sleep(RESTART_DELAY)
+            workers.add(spawn_worker(backend_app.app, sock, args.host, args.port))
+
+    if backend_app.script_template is not None:
+        backend_app.script_template.stop()
+
+
+if __name__ == "__main__":
+    main()
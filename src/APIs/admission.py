@@ -0,0 +1,308 @@
+import contextlib
+import hashlib
+import itertools
+import math
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+try:
+    from shared_cache import get_shared_cache  # Imported from a script (src/APIs on sys.path)
+except ImportError:
+    from src.APIs.shared_cache import get_shared_cache
+
+# Admission control for the endpoints that cost Gemini quota or heavy work.
+#
+# Two layers, checked in this order:
+#   1. A token bucket per client (API key if one is sent, otherwise the IP),
+#      kept in the shared cache so all worker processes draw from the same
+#      bucket. Each endpoint costs a number of tokens; an empty bucket gets an
+#      immediate 429 with the time until enough tokens have accumulated.
+#   2. A Gate with a concurrency limit for the whole server and, per traffic
+#      class, its own concurrency limit and bounded wait queue. The counts of
+#      active and queued requests are kept in the shared cache, so the limits
+#      hold across all worker processes (serve.py). Free slots go to the waiting
+#      request with the best (priority, arrival) whose class has room, so
+#      interactive requests are served ahead of batch and background work. A
+#      full queue (or a wait longer than the class allows) is rejected at once
+#      with Retry-After instead of piling up, and the tokens it took are refunded.
+#
+# Each worker's counts are stored under its pid; the counts of a worker that
+# has exited are dropped, so a crash can't leak slots. (The shared cache is a
+# local SQLite file, so all workers are on one host.) A slot freed in the same
+# worker wakes its queue at once; one freed in another worker is noticed within
+# POLL_INTERVAL. Arrival order is kept within a worker; across workers, queued
+# requests of the same class are served in roughly that order.
+
+ENABLED = os.getenv("ADMISSION", "1") != "0"
+RATE = float(os.getenv("ADMIT_RATE", "0.5"))             # Tokens per second refilled into each client's bucket
+BURST = float(os.getenv("ADMIT_BURST", "20"))            # Bucket size (largest burst a client may send)
+CONCURRENCY = int(os.getenv("ADMIT_CONCURRENCY", "8"))   # Requests doing work at once across all workers
+TRUST_PROXY = os.getenv("ADMIT_TRUST_PROXY", "0") == "1" # Key clients by X-Forwarded-For (only behind a trusted proxy)
+
+INTERACTIVE, BATCH, BACKGROUND = "interactive", "batch", "background"
+
+SLOTS_KEY = "admit:slots"
+POLL_INTERVAL = 0.2  # Seconds between checks for slots freed by other workers
+
+# Traffic classes: lower priority numbers are served first. max_queue/max_wait of
+# None mean unbounded (background work waits for as long as its deadline allows).
+CLASSES = {
+    INTERACTIVE: {"priority": 0, "max_active": CONCURRENCY, "max_queue": 4 * CONCURRENCY, "max_wait": 15},
+    BATCH: {"priority": 1, "max_active": max(1, CONCURRENCY // 2), "max_queue": 2 * CONCURRENCY, "max_wait": 30},
+    BACKGROUND: {"priority": 2, "max_active": max(1, CONCURRENCY // 4), "max_queue": None, "max_wait": None},
+}
+
+
+class Rejected(RuntimeError):
+    """The request was not admitted; retry_after is a suggested wait in whole seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+def client_key(api_key=None, remote_addr=None, forwarded_for=None):
+    """Bucket key for a client: a hash of its API key, else its IP address."""
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    if TRUST_PROXY and forwarded_for:
+        return "ip:" + forwarded_for.split(",")[0].strip()
+    return f"ip:{remote_addr or 'unknown'}"
+
+
+def _incr(name, amount=1):
+    try:
+        get_shared_cache().incr(f"admit:{name}", amount)
+    except Exception as e:
+        print(f"Warning: could not record admission metric {name}: {e}", file=sys.stderr)
+
+
+# --- Token Buckets ---
+
+def _bucket_ttl(rate, burst):
+    return burst / rate + 60 if rate > 0 else None  # A bucket idle this long is full again anyway
+
+
+def take_tokens(client, cost=1, rate=RATE, burst=BURST, cache=None):
+    """Takes cost tokens from the client's bucket. Returns 0 if admitted, else seconds until it would be."""
+    cache = cache or get_shared_cache()
+    key = f"admit:bucket:{client}"
+    now = time.time()
+    ttl = _bucket_ttl(rate, burst)
+    with cache.transaction():
+        tokens, updated = cache.get(key) or (burst, now)
+        tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+        if tokens >= cost:
+            cache.set(key, [tokens - cost, now], ttl=ttl)
+            return 0
+        cache.set(key, [tokens, now], ttl=ttl)
+    return (cost - tokens) / rate if rate > 0 else float("inf")
+
+
+def refund_tokens(client, cost=1, rate=RATE, burst=BURST, cache=None):
+    """Puts back the tokens taken for a request that the gate then turned away."""
+    try:
+        cache = cache or get_shared_cache()
+        key = f"admit:bucket:{client}"
+        with cache.transaction():
+            bucket = cache.get(key)
+            if bucket is not None:
+                cache.set(key, [min(burst, bucket[0] + cost), bucket[1]], ttl=_bucket_ttl(rate, burst))
+    except Exception as e:
+        print(f"Warning: could not refund admission tokens: {e}", file=sys.stderr)
+
+
+# --- Concurrency Gate ---
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _totals(table, field):
+    """Class -> sum over all workers of the table's field ("active" or "queued")."""
+    totals = defaultdict(int)
+    for counts in table.values():
+        for cls, n in counts.get(field, {}).items():
+            totals[cls] += n
+    return totals
+
+
+def _add(table, field, cls, n):
+    mine = table.setdefault(str(os.getpid()), {"active": {}, "queued": {}})
+    mine[field][cls] = mine[field].get(cls, 0) + n
+
+
+class Gate:
+    """Concurrency limits with bounded per-class priority queues, shared by all worker processes.
+
+    The active and queued counts live in the shared cache (with shared=False, in
+    this process only); the Gate orders this worker's own queued requests.
+    """
+
+    def __init__(self, capacity=CONCURRENCY, classes=CLASSES, shared=True):
+        self.capacity = capacity
+        self.classes = classes
+        self.shared = shared
+        self._cond = threading.Condition()
+        self._local = {}                  # The slot table when not shared
+        self._waiting = []                # (priority, arrival, class) of this worker's queued requests
+        self._arrivals = itertools.count()
+        self._avg_hold = {}               # class -> moving average of seconds a slot is held
+
+    @contextlib.contextmanager
+    def _table(self):
+        """{pid: {"active": {class: n}, "queued": {class: n}}} of live workers, saved on exit. Hold self._cond."""
+        if not self.shared:
+            yield self._local
+            return
+        cache = get_shared_cache()
+        with cache.transaction():
+            table = {pid: counts for pid, counts in (cache.get(SLOTS_KEY) or {}).items() if _pid_alive(int(pid))}
+            yield table
+            cache.set(SLOTS_KEY, table)
+
+    def _can_start(self, table, entry):
+        """True if the queued entry may take a slot now: there is room, and no better-placed request could."""
+        priority, _, cls = entry
+        active, queued = _totals(table, "active"), _totals(table, "queued")
+
+        def has_room(c):
+            return sum(active.values()) < self.capacity and active[c] < self.classes[c]["max_active"]
+
+        if not has_room(cls):
+            return False
+        if any(queued[c] and self.classes[c]["priority"] < priority and has_room(c) for c in self.classes):
+            return False  # A more urgent class is waiting in some worker
+        return min(e for e in self._waiting if has_room(e[2])) == entry
+
+    def _estimate(self, cls, queued):
+        hold = self._avg_hold.get(cls, 5.0)
+        return hold * (queued + 1) / self.classes[cls]["max_active"]
+
+    def retry_after(self, cls):
+        """Rough seconds until a queued request of this class would be served."""
+        with self._cond, self._table() as table:
+            return self._estimate(cls, _totals(table, "queued")[cls])
+
+    def acquire(self, cls, timeout=None, bounded=True):
+        """Waits for a slot (at most the class's max_wait, or timeout if sooner); raises Rejected otherwise.
+
+        With bounded=False (the server's own queued jobs) the class's max_wait and queue
+        limit don't apply: only timeout ends the wait.
+        """
+        spec = self.classes[cls]
+        waits = [t for t in (spec["max_wait"] if bounded else None, timeout) if t is not None]
+        limit = time.monotonic() + min(waits) if waits else None
+        entry = (spec["priority"], next(self._arrivals), cls)
+        with self._cond:
+            self._waiting.append(entry)
+            counted = False  # Whether the entry is in the table's queued counts
+            try:
+                with self._table() as table:
+                    started = self._can_start(table, entry)
+                    if started:
+                        _add(table, "active", cls, 1)
+                    else:
+                        queued = _totals(table, "queued")[cls]
+                        if bounded and spec["max_queue"] is not None and queued >= spec["max_queue"]:
+                            raise Rejected(f"The {cls} queue is full.", self._estimate(cls, queued))
+                        _add(table, "queued", cls, 1)
+                if started:
+                    return
+                counted = True
+                while True:
+                    left = None if limit is None else limit - time.monotonic()
+                    if left is not None and left <= 0:
+                        raise Rejected(f"Timed out waiting in the {cls} queue.", self.retry_after(cls))
+                    # Released slots in this worker notify at once; other workers' are seen by polling
+                    self._cond.wait(left if not self.shared else POLL_INTERVAL if left is None else min(left, POLL_INTERVAL))
+                    with self._table() as table:
+                        started = self._can_start(table, entry)
+                        if started:
+                            _add(table, "queued", cls, -1)
+                            _add(table, "active", cls, 1)
+                    if started:
+                        counted = False
+                        return
+            finally:
+                if counted:
+                    with self._table() as table:
+                        _add(table, "queued", cls, -1)
+                self._waiting.remove(entry)
+                self._cond.notify_all()  # The next entry may be startable now
+
+    def release(self, cls, held_seconds=None):
+        with self._cond:
+            try:
+                with self._table() as table:
+                    _add(table, "active", cls, -1)
+            except Exception as e:
+                # The slot stays counted until this worker exits
+                print(f"Warning: could not release admission slot: {e}", file=sys.stderr)
+            if held_seconds is not None:
+                previous = self._avg_hold.get(cls, held_seconds)
+                self._avg_hold[cls] = 0.8 * previous + 0.2 * held_seconds
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self, cls, timeout=None, bounded=True):
+        """Holds a slot for the duration of the block (no token bucket; for the server's own work)."""
+        self.acquire(cls, timeout, bounded)
+        held_from = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(cls, time.monotonic() - held_from)
+
+    def snapshot(self):
+        """Active and queued requests per class in this worker."""
+        with self._cond, self._table() as table:
+            mine = table.get(str(os.getpid()), {})
+        return {cls: {"active": mine.get("active", {}).get(cls, 0), "queued": mine.get("queued", {}).get(cls, 0)}
+                for cls in self.classes}
+
+
+def all_snapshots(cache=None):
+    """{"workers": {pid: {class: {"active", "queued"}}}, "total": per-class sums} from the shared slot table."""
+    cache = cache or get_shared_cache()
+    table = {pid: counts for pid, counts in (cache.get(SLOTS_KEY) or {}).items() if _pid_alive(int(pid))}
+    workers = {pid: {cls: {"active": counts.get("active", {}).get(cls, 0), "queued": counts.get("queued", {}).get(cls, 0)}
+                     for cls in CLASSES}
+               for pid, counts in table.items()}
+    active, queued = _totals(table, "active"), _totals(table, "queued")
+    return {"workers": workers, "total": {cls: {"active": active[cls], "queued": queued[cls]} for cls in CLASSES}}
+
+
+@contextlib.contextmanager
+def admit(gate, client, cls, cost=1, timeout=None):
+    """Admits one request for the duration of the block: token bucket first, then a gate slot. Raises Rejected."""
+    if not ENABLED:
+        yield
+        return
+    wait = take_tokens(client, cost)
+    if wait > 0:
+        _incr(f"{cls}:rate_limited")
+        raise Rejected("Too many requests from this client.", wait)
+    start = time.monotonic()
+    try:
+        gate.acquire(cls, timeout)
+    except Rejected:
+        refund_tokens(client, cost)
+        _incr(f"{cls}:queue_rejected")
+        raise
+    _incr(f"{cls}:admitted")
+    _incr(f"{cls}:wait_ms", int((time.monotonic() - start) * 1000))
+    held_from = time.monotonic()
+    try:
+        yield
+    finally:
+        gate.release(cls, time.monotonic() - held_from)
@@ -0,0 +1,160 @@
+import os
+import sys
+from collections import defaultdict
+
+from lazy_import import lazy_module
+from map_clusters import CLUSTER_THRESHOLD, data_dir_for, loader_script, write_cluster_data
+import tile_cache
+
+# Map rendering shared by adventure_finder.py (one area) and route_finder.py (a
+# whole route): base tile layers, one toggleable layer per location category,
+# and an optional route line. Maps with more than CLUSTER_THRESHOLD locations
+# are clustered server-side instead (see map_clusters.py).
+
+folium = lazy_module("folium")
+
+# Define categories and their map styling
+CATEGORIES = {
+    "Hiking Trail": {"color": "green", "icon": "leaf"},
+    "Fishing Spot": {"color": "blue", "icon": "tint"}, # Water drop
+    "Campsite": {"color": "orange", "icon": "home"}, # Tent/home icon
+    "Park": {"color": "darkgreen", "icon": "tree-conifer"}, # Using glyphicon
+    "Scenic Viewpoint": {"color": "purple", "icon": "eye-open"}, # Using glyphicon
+    "Kayaking/Canoeing Launch Point": {"color": "cadetblue", "icon": "road"}, # Simple road/launch icon
+    "Mountain Biking Trail": {"color": "red", "icon": "bicycle"} # Using glyphicon
+}
+
+
+# Base layers: (proxy source, folium tiles name or URL, attribution, layer name)
+BASE_LAYERS = [
+    ("stamen-terrain", 'Stamen Terrain', 'Map tiles by Stamen Design, CC BY 3.0 — Map data © OpenStreetMap contributors', 'Terrain'),
+    ("carto-light", 'CartoDB positron', 'Map tiles by CartoDB, under CC BY 3.0. Data by OpenStreetMap, under ODbL.', 'Light Map'),
+    ("carto-dark", 'CartoDB dark_matter', 'Map tiles by CartoDB, under CC BY 3.0. Data by OpenStreetMap, under ODbL.', 'Dark Map'),
+    # Esri World Imagery (Satellite) - Often works without API key for basic use
+    ("esri-imagery", 'https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
+     'Tiles &copy; Esri &mdash; Source: Esri, i-cubed, USDA, USGS, AEX, GeoEye, Getmapping, Aerogrid, IGN, IGP, UPR-EGP, and the GIS User Community', 'Satellite'),
+]
+OSM_ATTRIBUTION = '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
+
+
+def create_base_map(location, zoom_start):
+    """Folium map with OpenStreetMap plus the optional terrain, light, dark and satellite layers.
+
+    With TILE_PROXY=1 every layer loads its tiles through this server's caching /tiles proxy.
+    """
+    proxied = tile_cache.proxy_enabled()
+    # Start with the default OpenStreetMap tiles
+    if proxied:
+        m = folium.Map(location=location, zoom_start=zoom_start, tiles=None)
+        folium.TileLayer(tiles=tile_cache.proxy_url("osm"), attr=OSM_ATTRIBUTION, name='OpenStreetMap').add_to(m)
+    else:
+        m = folium.Map(location=location, zoom_start=zoom_start, tiles="OpenStreetMap")
+
+    # --- Add Additional Base Map Tile Layers ---
+    for source, tiles, attr, name in BASE_LAYERS:
+        folium.TileLayer(
+            tiles=tile_cache.proxy_url(source) if proxied else tiles,
+            attr=attr,
+            name=name
+        ).add_to(m)
+    return m
+
+
+def add_locations(m, locations):
+    """Adds a marker per location, grouped into one layer per category."""
+    # --- Create Feature Groups for Location Categories ---
+    feature_groups = defaultdict(lambda: folium.FeatureGroup(name="Unknown Category", show=False)) # Start with category layers potentially hidden
+    for cat_name in CATEGORIES.keys():
+         # Use the category name directly for the layer control label
+        feature_groups[cat_name] = folium.FeatureGroup(name=cat_name)
+
+    # Add markers to the appropriate feature group
+    for loc in locations:
+        try:
+            loc_lat = float(loc.get("latitude", 0))
+            loc_lon = float(loc.get("longitude", 0))
+            loc_name = loc.get("name", "Unknown Location")
+            loc_type = loc.get("type", "Unknown Category") # Default if type is missing/invalid
+
+            if loc_lat != 0 and loc_lon != 0: # Basic check for valid coordinates
+                popup_text = f"<b>{loc_name}</b><br>Type: {loc_type}<br>Lat: {loc_lat:.4f}, Lon: {loc_lon:.4f}"
+
+                # Get style from CATEGORIES, default if type unknown
+                style = CATEGORIES.get(loc_type, {"color": "gray", "icon": "question-sign"})
+
+                marker = folium.Marker(
+                    location=[loc_lat, loc_lon],
+                    popup=popup_text,
+                    tooltip=loc_name,
+                    icon=folium.Icon(color=style["color"], icon=style["icon"], prefix='glyphicon')
+                )
+
+                # Add marker to the correct feature group
+                if loc_type in feature_groups:
+                    marker.add_to(feature_groups[loc_type])
+                else:
+                     # Add to a default 'Unknown' group if type doesn't match known categories
+                     print(f"Warning: Location '{loc_name}' has unknown type '{loc_type}'. Adding to 'Unknown Category' group.", file=sys.stderr)
+                     marker.add_to(feature_groups["Unknown Category"])
+
+            else:
+                 print(f"Warning: Skipping location '{loc_name}' due to invalid coordinates ({loc.get('latitude')}, {loc.get('longitude')}).", file=sys.stderr)
+
+        except (ValueError, TypeError) as e:
+            print(f"Warning: Could not process location data: {loc}. Error: {e}", file=sys.stderr)
+        except Exception as e:
+             print(f"Warning: An unexpected error occurred processing location: {loc}. Error: {e}", file=sys.stderr)
+
+    # Add all feature groups to the map
+    for group in feature_groups.values():
+        group.add_to(m)
+
+
+def add_clustered_locations(m, locations, output_file):
+    """Writes cluster/point data next to output_file and adds the script that loads it on demand."""
+    data_dir = data_dir_for(output_file)
+    write_cluster_data(locations, data_dir)
+    colors = {name: style["color"] for name, style in CATEGORIES.items()}
+    script = loader_script(m.get_name(), os.path.basename(data_dir) + "/", colors)
+    # Run after the map object has been created (it is defined later in the same script block)
+    m.get_root().script.add_child(folium.Element(
+        f"document.addEventListener('DOMContentLoaded', function() {{ {script} }});"))
+
+
+def add_stop_numbers(m, route):
+    """Numbers the points of a route after its start (the visiting order of an itinerary)."""
+    group = folium.FeatureGroup(name="Itinerary")
+    for number, (lat, lon) in enumerate(route[1:], start=1):
+        folium.Marker(
+            location=[lat, lon],
+            tooltip=f"Stop {number}",
+            icon=folium.DivIcon(
+                icon_size=(22, 22), icon_anchor=(11, 30),
+                html=f'<div style="background:#3388ff;color:#fff;border-radius:11px;width:22px;height:22px;'
+                     f'text-align:center;font:bold 12px/22px sans-serif;">{number}</div>')
+        ).add_to(group)
+    group.add_to(m)
+
+
+def render_map(locations, location, zoom_start, output_file, route=None, number_stops=False):
+    """Builds the full adventure map (optionally with a route line) and saves it to output_file.
+
+    With number_stops, the route's points after the start are labelled with their visiting order.
+    """
+    m = create_base_map(location, zoom_start)
+    if route:
+        folium.PolyLine(route, color="#3388ff", weight=4, opacity=0.7, tooltip="Route").add_to(m)
+        lats, lons = [p[0] for p in route], [p[1] for p in route]
+        m.fit_bounds([[min(lats), min(lons)], [max(lats), max(lons)]])
+        if number_stops:
+            add_stop_numbers(m, route)
+    if len(locations) > CLUSTER_THRESHOLD:
+        add_clustered_locations(m, locations, output_file)
+    else:
+        add_locations(m, locations)
+
+    # Add layer control (toggles) to the map
+    folium.LayerControl().add_to(m)
+
+    # Save the map to an HTML file
+    m.save(output_file)
@@ -3,6 +3,8 @@ import base64
 import requests
 import datetime
 import sys
+from src.APIs.upstream import call_upstream
+from src.APIs.deadlines import DeadlineExceeded
 
 # Note: This script now expects credentials (APP_ID, APP_SECRET, API_KEY)
 # to be loaded into the environment by the calling script (e.g., backend_app.py using dotenv).
@@ -28,7 +30,7 @@ def get_location_from_ip(ip_address, ipinfo_api_key):
     url = f"https://ipinfo.io/{ip_address}/json?token={ipinfo_api_key}"
 
     try:
-        response = requests.get(url, timeout=5) # Add timeout
+        response = call_upstream("ipinfo", requests.get, url, timeout=5) # Add timeout
         response.raise_for_status()
         data = response.json()
         print("IPInfo API Response:", data, file=sys.stderr) # Debugging
@@ -52,13 +54,20 @@ def get_location_from_ip(ip_address, ipinfo_api_key):
     except requests.exceptions.RequestException as e:
         print(f"Error fetching location from ipinfo.io: {e}", file=sys.stderr)
         return None
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"Unexpected error in get_location_from_ip: {e}", file=sys.stderr)
         return None
 
 
-def get_star_chart_image_url(latitude, longitude, date_str=None, style="default", app_id=None, app_secret=None):
-    """Generates a star chart using the Astronomy API and returns the image URL."""
+def get_star_chart_image_url(latitude, longitude, date_str=None, style="default", app_id=None, app_secret=None,
+                             constellation=None):
+    """Generates a star chart using the Astronomy API and returns the image URL.
+
+    With a constellation code (e.g. "ori") the chart is centred on that constellation
+    instead of the default area view.
+    """
     auth_string = get_auth_string(app_id, app_secret)
     if not auth_string:
         return {"error": "Astronomy API credentials (APP_ID, APP_SECRET) missing."}
@@ -71,14 +80,15 @@ def get_star_chart_image_url(latitude, longitude, date_str=None, style="default"
     if date_str is None:
         date_str = datetime.date.today().strftime("%Y-%m-%d")
 
-    payload = {
-        "style": style,
-        "observer": {
-            "latitude": latitude,
-            "longitude": longitude,
-            "date": date_str
-        },
-        "view": {
+    if constellation:
+        view = {
+            "type": "constellation",
+            "parameters": {
+                "constellation": constellation
+            }
+        }
+    else:
+        view = {
             "type": "area",
             "parameters": {
                 "position": {
@@ -91,11 +101,20 @@ def get_star_chart_image_url(latitude, longitude, date_str=None, style="default"
                 "zoom": 2 # Adjust zoom as needed
             }
         }
+
+    payload = {
+        "style": style,
+        "observer": {
+            "latitude": latitude,
+            "longitude": longitude,
+            "date": date_str
+        },
+        "view": view
     }
 
     try:
         # Increase timeout to 30 seconds
-        response = requests.post(ASTRONOMY_API_URL, json=payload, headers=headers, timeout=30)
+        response = call_upstream("astronomyapi", requests.post, ASTRONOMY_API_URL, json=payload, headers=headers, timeout=30)
         response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
 
         response_data = response.json()
@@ -113,6 +132,8 @@ def get_star_chart_image_url(latitude, longitude, date_str=None, style="default"
         print(f"Error calling Astronomy API: {e}", file=sys.stderr)
         print(f"Response: {error_details}", file=sys.stderr)
         return {"error": "Failed to generate star map.", "details": error_details}
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"Unexpected error in get_star_chart_image_url: {e}", file=sys.stderr)
         return {"error": f"An unexpected error occurred: {e}"}
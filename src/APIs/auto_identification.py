@@ -0,0 +1,90 @@
+import json
+import argparse
+import sys
+from secret import GEMINI_API_KEY
+from lazy_import import lazy_module
+from image_ladder import CONFIDENCE_PROMPT, identify
+from structured_output import AutoIdentification, StructuredOutputError
+
+# Imported on first use to keep script start-up fast
+genai = lazy_module("google.generativeai")
+
+# Identification types the model may assign (same names as /api/identify's id_type)
+KINGDOMS = ("animal", "bird", "flora")
+KINGDOM_ALIASES = {"plant": "flora", "flower": "flora"}
+
+# --- Argument Parsing ---
+parser = argparse.ArgumentParser(description="Detect and identify the animals, birds and plants in an image with one model call.")
+parser.add_argument("image_path", help="Path to the image file.")
+args = parser.parse_args()
+image_path = args.image_path
+
+# --- Configuration ---
+# Set up the API key
+try:
+    genai.configure(api_key=GEMINI_API_KEY)
+except Exception as e:
+    print(f"Error configuring GenAI: {e}", file=sys.stderr)
+    sys.exit(1)
+
+# --- Model Interaction ---
+# The model tier is chosen per call by model_router.py (MODEL_ROUTES)
+
+# Classify and identify every subject in one pass; the image is attached at increasing
+# resolutions until the primary subject's identification is confident enough (see image_ladder.py)
+prompt = (
+    "You are a professional naturalist (zoologist, ornithologist and botanist). "
+    "Identify each distinct animal, bird, or plant/flower in the provided image, most prominent first. "
+    "For each, set kingdom to \"animal\", \"bird\" or \"flora\" (birds are \"bird\", not \"animal\"), "
+    "and give its common name, scientific name, common locations/habitats as a comma-separated string "
+    "in places_found, and one interesting fun fact. Return an empty list if there are none."
+    + CONFIDENCE_PROMPT
+)
+
+def usable_subjects(record):
+    """The record's subjects of a known kingdom, with kingdom normalized ("Bird " -> "bird", "plant" -> "flora")."""
+    subjects = []
+    for subject in record["subjects"]:
+        kingdom = subject["kingdom"].strip().lower()
+        kingdom = KINGDOM_ALIASES.get(kingdom, kingdom)
+        if kingdom in KINGDOMS:
+            subjects.append(dict(subject, kingdom=kingdom))
+    return subjects
+
+def primary_confidence(record):
+    """Confidence of the most prominent subject (0 if nothing usable was found)."""
+    subjects = usable_subjects(record)
+    return subjects[0]["confidence"] if subjects else 0.0
+
+# --- API Call and Response Handling ---
+try:
+    # One request decides the kind of each subject and identifies it
+    record, ladder = identify(prompt, image_path, AutoIdentification, task="identify_auto",
+                              confidence_of=primary_confidence)
+    subjects = usable_subjects(record)
+    if subjects:
+        # The primary subject's fields stay at the top level so existing clients keep working
+        result = dict(subjects[0])
+        result["id_type"] = subjects[0]["kingdom"]
+        result["subjects"] = subjects
+        result["resolution"] = ladder["resolution"]
+    else:
+        result = {
+            "error": "No animal, bird or plant was found in the image."
+        }
+except FileNotFoundError:
+    print(f"Error: Image file not found at {image_path}", file=sys.stderr)
+    sys.exit(1)
+except StructuredOutputError as e:
+    result = {
+        "error": "Failed to parse JSON response from API.",
+        "details": str(e)
+    }
+except Exception as e:
+    result = {
+        "error": f"An error occurred during API call: {e}"
+    }
+
+# --- Output ---
+# Return the result as JSON
+print(json.dumps(result))
@@ -0,0 +1,119 @@
+import contextlib
+import functools
+import os
+import sys
+import threading
+import time
+
+try:
+    from shared_cache import get_shared_cache  # Imported from a script (src/APIs on sys.path)
+except ImportError:
+    from src.APIs.shared_cache import get_shared_cache
+
+# End-to-end request deadlines.
+#
+# Each endpoint (and background job kind) has a time budget. The backend sets
+# an absolute deadline for the request's thread; run_script passes it to the
+# script process in the REQUEST_DEADLINE environment variable and kills the
+# script when it runs out, and call_upstream caps each upstream call's timeout
+# at the time remaining. Code that can stop early (e.g. route_finder.py) asks
+# remaining() and returns partial results instead.
+#
+# Deadlines are wall-clock (time.time()) so they mean the same in every process.
+
+DEADLINE_ENV = "REQUEST_DEADLINE"
+EXIT_CODE = 124  # Exit status of a script that ran out of time (as timeout(1) uses), mapped back by the backend
+
+_local = threading.local()
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out."""
+
+
+def budget(name, default):
+    """Seconds allowed for an endpoint or job kind; override with DEADLINE_<NAME> (e.g. DEADLINE_PLAN_TRIP)."""
+    return float(os.getenv(f"DEADLINE_{name.upper()}", default))
+
+
+def current():
+    """The absolute deadline for this thread (or, in a script, from REQUEST_DEADLINE), or None."""
+    deadline = getattr(_local, "deadline", None)
+    if deadline is None and os.getenv(DEADLINE_ENV):
+        try:
+            deadline = float(os.environ[DEADLINE_ENV])
+        except ValueError:
+            deadline = None
+    return deadline
+
+
+def remaining():
+    """Seconds left before the deadline (may be negative), or None without a deadline."""
+    deadline = current()
+    return None if deadline is None else deadline - time.time()
+
+
+def check():
+    """Raises DeadlineExceeded if the deadline has passed."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded.")
+
+
+def capped_timeout(timeout):
+    """timeout (seconds, or None) limited to the time remaining; raises DeadlineExceeded if none is left."""
+    check()
+    left = remaining()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+@contextlib.contextmanager
+def deadline(seconds):
+    """Runs the block with a deadline seconds from now (or the enclosing deadline, if sooner)."""
+    previous = getattr(_local, "deadline", None)
+    new = time.time() + seconds
+    _local.deadline = new if previous is None else min(previous, new)
+    try:
+        yield _local.deadline
+    finally:
+        _local.deadline = previous
+
+
+def bind(fn):
+    """fn wrapped to run under the calling thread's deadline (for work handed to a thread pool)."""
+    bound = current()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if bound is None:
+            return fn(*args, **kwargs)
+        with deadline(bound - time.time()):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def record_expired(name):
+    """Counts an expired deadline under deadline:<name>:expired (and the deadline:expired total)."""
+    try:
+        cache = get_shared_cache()
+        cache.incr("deadline:expired")
+        cache.incr(f"deadline:{name}:expired")
+    except Exception as e:
+        print(f"Warning: could not record expired deadline: {e}", file=sys.stderr)
+
+
+def with_deadline(name, seconds):
+    """Decorator: runs fn under a deadline and counts DeadlineExceeded (which is re-raised)."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with deadline(seconds):
+                try:
+                    return fn(*args, **kwargs)
+                except DeadlineExceeded:
+                    record_expired(name)
+                    raise
+        return wrapper
+    return decorate
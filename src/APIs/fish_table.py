@@ -0,0 +1,132 @@
+import argparse
+import datetime
+import json
+import math
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from lazy_import import lazy_module
+
+np = lazy_module("numpy")
+
+# Offline regional fish-species table.
+#
+# Fish species by location change slowly, so instead of a live generation per
+# /api/fishy request, `build` runs get_top_fish once per cell of a lat/lon grid
+# covering the service area and writes two files:
+#   <name>.npy   int16 array [n_lat, n_lon, FISH_PER_CELL] of species indices (-1 = none)
+#   <name>.json  grid origin/step/shape and the species name list
+# The .npy is opened memory-mapped, so a lookup is two index computations and a
+# slice -- no model call and no parsing. Cells outside the grid (or never built)
+# return None and the caller falls back to live generation.
+
+FISH_PER_CELL = 5
+EMPTY = -1
+
+
+def cell_index(lat, lon, meta):
+    """(row, col) of the grid cell containing lat/lon, or None if outside the table."""
+    row = math.floor((lat - meta["lat_min"]) / meta["step"])
+    col = math.floor((lon - meta["lon_min"]) / meta["step"])
+    n_lat, n_lon = meta["shape"][:2]
+    if 0 <= row < n_lat and 0 <= col < n_lon:
+        return row, col
+    return None
+
+
+class FishTable:
+    """Memory-mapped fish table; lookups are O(1) and read only the cell's few bytes."""
+
+    def __init__(self, path_prefix):
+        with open(path_prefix + ".json") as f:
+            self.meta = json.load(f)
+        self.species = self.meta["species"]
+        self.cells = np.load(path_prefix + ".npy", mmap_mode="r")
+
+    def lookup(self, lat, lon):
+        """Species names for the cell containing lat/lon, or None if the table can't answer."""
+        index = cell_index(lat, lon, self.meta)
+        if index is None:
+            return None
+        names = [self.species[i] for i in self.cells[index].tolist() if i != EMPTY]
+        return names or None
+
+
+def grid_centers(lat_min, lat_max, lon_min, lon_max, step):
+    n_lat = max(1, math.ceil((lat_max - lat_min) / step))
+    n_lon = max(1, math.ceil((lon_max - lon_min) / step))
+    for row in range(n_lat):
+        for col in range(n_lon):
+            yield row, col, lat_min + (row + 0.5) * step, lon_min + (col + 0.5) * step
+
+
+def build(lat_min, lat_max, lon_min, lon_max, step, output, workers=4):
+    """Runs get_top_fish for every grid cell and writes the table files. Returns the number of filled cells."""
+    from fishy import get_top_fish
+
+    n_lat = max(1, math.ceil((lat_max - lat_min) / step))
+    n_lon = max(1, math.ceil((lon_max - lon_min) / step))
+    cells = np.full((n_lat, n_lon, FISH_PER_CELL), EMPTY, dtype=np.int16)
+    species, species_index = [], {}
+
+    centers = list(grid_centers(lat_min, lat_max, lon_min, lon_max, step))
+    print(f"Building {n_lat}x{n_lon} fish table ({len(centers)} cells)...", file=sys.stderr)
+
+    def fetch(center):
+        row, col, lat, lon = center
+        return row, col, get_top_fish(lon, lat)
+
+    filled = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for done, (row, col, fish) in enumerate(executor.map(fetch, centers), start=1):
+            for k, name in enumerate(fish[:FISH_PER_CELL]):
+                if name not in species_index:
+                    species_index[name] = len(species)
+                    species.append(name)
+                cells[row, col, k] = species_index[name]
+            filled += bool(fish)
+            if done % 50 == 0:
+                print(f"  {done}/{len(centers)} cells", file=sys.stderr)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    meta = {
+        "lat_min": lat_min,
+        "lon_min": lon_min,
+        "step": step,
+        "shape": list(cells.shape),
+        "species": species,
+        "built_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    # Each file is written under a temporary name and renamed into place (array first, so a
+    # reader never sees metadata without its data). Overwriting the .npy in place would change
+    # the pages a running backend has memory-mapped under it; after a rename it keeps the old file.
+    for path, write in ((output + ".npy", lambda f: np.save(f, cells)),
+                        (output + ".json", lambda f: f.write(json.dumps(meta).encode("utf-8")))):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    return filled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the regional fish-species table used by /api/fishy.")
+    parser.add_argument("command", choices=["build", "lookup"], help="Build the table, or look up one location.")
+    parser.add_argument("--lat-min", type=float, default=36.5, help="Southern edge of the grid (default covers VA/MD/DC).")
+    parser.add_argument("--lat-max", type=float, default=39.7)
+    parser.add_argument("--lon-min", type=float, default=-83.7)
+    parser.add_argument("--lon-max", type=float, default=-75.2)
+    parser.add_argument("--step", type=float, default=0.5, help="Cell size in degrees (default: 0.5).")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent generations while building.")
+    parser.add_argument("--output", default=os.path.join("instance", "fish_table"),
+                        help="Path prefix for the .npy/.json files (default: instance/fish_table).")
+    parser.add_argument("--lat", type=float, help="Latitude for lookup.")
+    parser.add_argument("--lon", type=float, help="Longitude for lookup.")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        filled = build(args.lat_min, args.lat_max, args.lon_min, args.lon_max, args.step, args.output, args.workers)
+        print(f"Wrote {args.output}.npy/.json with {filled} filled cell(s).")
+    else:
+        print(FishTable(args.output).lookup(args.lat, args.lon))
@@ -1,39 +1,38 @@
-import google.generativeai as genai
+import argparse
 from secret import GEMINI_API_KEY
+from lazy_import import lazy_module
+from structured_output import FishList, StructuredOutputError
+from model_router import generate
+
+# Imported on first use to keep script start-up fast
+genai = lazy_module("google.generativeai")
 
 def get_top_fish(longitude, latitude):
     # Configure the GenAI client
     genai.configure(api_key=GEMINI_API_KEY)
 
-    # Select the model
-    model = genai.GenerativeModel('gemini-1.5-flash-latest') # Try another common model
-
-    # Construct the prompt
-    prompt = (
-        f"List only the names of the top 5 fish species commonly found at longitude {longitude} and latitude {latitude}. "
-        "Provide the list separated by newlines. Do not include any introductory text, explanations, or numbering."
-    )
+    # Construct the prompt (the response schema makes the model return just the list)
+    prompt = f"Name the top 5 fish species commonly found at longitude {longitude} and latitude {latitude}."
 
     try:
-        # Call the Google GenAI API
-        response = model.generate_content(prompt)
-
-        # Extract the response text
-        # Ensure response.text exists and is not empty before splitting
-        if response.text:
-            fish_list = response.text.split("\n")
-            return [fish.strip() for fish in fish_list if fish.strip()]
-        else:
-            print("Received empty response from Google GenAI API.")
-            return []
+        # Call the Google GenAI API with structured output (a small task: routed to the lite tier)
+        result, details = generate("fish", prompt, FishList)
+        return [fish.strip() for fish in result["fish"] if fish.strip()][:5]
+    except StructuredOutputError as e:
+        print(f"Could not parse response from Google GenAI API: {e}")
+        return []
     except Exception as e:
         print(f"Error fetching data from Google GenAI API: {e}")
         return []
 
 if __name__ == "__main__":
-    # Example coordinates (replace with actual user location)
-    user_longitude = -77.0364
-    user_latitude = 38.8951
+    # Coordinates are optional; default to the example location (Washington, D.C.)
+    parser = argparse.ArgumentParser(description="List the top fish species near a location.")
+    parser.add_argument("latitude", type=float, nargs="?", default=38.8951, help="Latitude (default: 38.8951).")
+    parser.add_argument("longitude", type=float, nargs="?", default=-77.0364, help="Longitude (default: -77.0364).")
+    args = parser.parse_args()
+    user_longitude = args.longitude
+    user_latitude = args.latitude
 
     top_fish = get_top_fish(user_longitude, user_latitude)
     if top_fish:
@@ -0,0 +1,208 @@
+import argparse
+import bisect
+import csv
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+
+# Offline gazetteer: place-name geocoding and autocomplete without a network call.
+#
+# data/places.csv holds US places with at least 5,000 people and cities
+# elsewhere with at least 50,000 (name, US state, country code, coordinates,
+# population), taken from GeoNames (geonames.org, CC BY 4.0); data/countries.csv
+# names the countries.
+#
+# The index is a sorted array of normalized keys (lower case, accents and
+# punctuation removed) with a parallel array of place ids. Every place is
+# indexed under its full name and under each later word of it ("angeles" finds
+# Los Angeles), so a prefix lookup is a bisect to the first key >= prefix and a
+# scan while keys still start with it. Very short prefixes match thousands of
+# keys, so the best places for every prefix of up to SHORT_PREFIX characters
+# are ranked once at load time instead of per request.
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DATA_PATH = os.path.join(DATA_DIR, "places.csv")
+COUNTRIES_PATH = os.path.join(DATA_DIR, "countries.csv")  # ISO code -> English name
+SHORT_PREFIX = 2
+TOP_K = 10
+MAX_SCAN = 5000  # Keys examined at most for one longer prefix
+
+US_STATES = {
+    "alabama": "AL", "alaska": "AK", "arizona": "AZ", "arkansas": "AR", "california": "CA",
+    "colorado": "CO", "connecticut": "CT", "delaware": "DE", "district of columbia": "DC",
+    "florida": "FL", "georgia": "GA", "hawaii": "HI", "idaho": "ID", "illinois": "IL",
+    "indiana": "IN", "iowa": "IA", "kansas": "KS", "kentucky": "KY", "louisiana": "LA",
+    "maine": "ME", "maryland": "MD", "massachusetts": "MA", "michigan": "MI", "minnesota": "MN",
+    "mississippi": "MS", "missouri": "MO", "montana": "MT", "nebraska": "NE", "nevada": "NV",
+    "new hampshire": "NH", "new jersey": "NJ", "new mexico": "NM", "new york": "NY",
+    "north carolina": "NC", "north dakota": "ND", "ohio": "OH", "oklahoma": "OK", "oregon": "OR",
+    "pennsylvania": "PA", "rhode island": "RI", "south carolina": "SC", "south dakota": "SD",
+    "tennessee": "TN", "texas": "TX", "utah": "UT", "vermont": "VT", "virginia": "VA",
+    "washington": "WA", "west virginia": "WV", "wisconsin": "WI", "wyoming": "WY",
+    "usa": "US",
+}
+
+
+def normalize(text):
+    """Lower-case ASCII key: accents stripped, punctuation turned into spaces, whitespace collapsed."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+class Gazetteer:
+    """Places from a CSV file with a sorted-array prefix index."""
+
+    def __init__(self, path=DATA_PATH, countries_path=COUNTRIES_PATH):
+        with open(countries_path, newline="", encoding="utf-8") as f:
+            self.country_names = {row["code"]: row["name"] for row in csv.DictReader(f)}
+        # Words a query may use after the comma: state names and country names -> codes.
+        # A name can stand for both ("Georgia" is GA and GE), so each maps to a tuple.
+        self.qualifiers = {name: (code,) for name, code in US_STATES.items()}
+        for code, name in self.country_names.items():
+            self.qualifiers[normalize(name)] = self.qualifiers.get(normalize(name), ()) + (code,)
+
+        self.names, self.regions, self.countries = [], [], []
+        self.latitudes, self.longitudes, self.populations = array("d"), array("d"), array("l")
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                self.names.append(row["name"])
+                self.regions.append(row["region"])
+                self.countries.append(row["country"])
+                self.latitudes.append(float(row["latitude"]))
+                self.longitudes.append(float(row["longitude"]))
+                self.populations.append(int(row["population"] or 0))
+
+        entries = []
+        for place_id, name in enumerate(self.names):
+            words = normalize(name).split()
+            for i in range(len(words)):
+                # Full-name keys rank ahead of keys starting at a later word
+                entries.append((" ".join(words[i:]), i > 0, place_id))
+        entries.sort()
+        self.keys = [key for key, _, _ in entries]
+        self.partial = array("b", (partial for _, partial, _ in entries))
+        self.ids = array("l", (place_id for _, _, place_id in entries))
+
+        self.short = {}
+        for start, key in enumerate(self.keys):
+            for length in range(1, min(SHORT_PREFIX, len(key)) + 1):
+                self.short.setdefault(key[:length], []).append(start)
+        for prefix, positions in self.short.items():
+            self.short[prefix] = self._rank(positions)[:TOP_K * 4]
+
+    def __len__(self):
+        return len(self.names)
+
+    def _rank(self, positions):
+        """Index positions ordered best first: full-name matches, then by population."""
+        return sorted(positions, key=lambda pos: (self.partial[pos], -self.populations[self.ids[pos]]))
+
+    def place(self, place_id):
+        region = self.regions[place_id]
+        country = self.countries[place_id]
+        country_name = self.country_names.get(country, country)
+        return {
+            "name": self.names[place_id],
+            "region": region,
+            "country": country,
+            "label": ", ".join(part for part in (self.names[place_id], region, country_name) if part),
+            "latitude": self.latitudes[place_id],
+            "longitude": self.longitudes[place_id],
+            "population": self.populations[place_id],
+        }
+
+    def _matches(self, key, qualifier):
+        if not qualifier:
+            return True
+        return self.regions[key].upper() in qualifier or self.countries[key].upper() in qualifier
+
+    def _prefix_positions(self, prefix, qualified=False):
+        # The precomputed lists are too short to filter by state/country
+        if len(prefix) <= SHORT_PREFIX and not qualified:
+            return self.short.get(prefix, [])
+        start = bisect.bisect_left(self.keys, prefix)
+        end = start
+        while end < len(self.keys) and end - start < MAX_SCAN and self.keys[end].startswith(prefix):
+            end += 1
+        return self._rank(range(start, end))
+
+    def autocomplete(self, text, limit=TOP_K):
+        """Places whose name (or a later word of it) starts with text; "name, ST" narrows by state/country."""
+        name, qualifier = self.parse_query(text)
+        if not name:
+            return []
+        results, seen = [], set()
+        for pos in self._prefix_positions(name, qualifier is not None):
+            place_id = self.ids[pos]
+            if place_id not in seen and self._matches(place_id, qualifier):
+                seen.add(place_id)
+                results.append(self.place(place_id))
+                if len(results) >= limit:
+                    break
+        return results
+
+    def geocode(self, text, limit=5):
+        """Places whose full name is text (most populous first), else the best autocomplete matches."""
+        name, qualifier = self.parse_query(text)
+        if not name:
+            return []
+        start = bisect.bisect_left(self.keys, name)
+        exact = []
+        for pos in range(start, len(self.keys)):
+            if self.keys[pos] != name:
+                break
+            place_id = self.ids[pos]
+            if not self.partial[pos] and self._matches(place_id, qualifier):
+                exact.append(place_id)
+        if exact:
+            exact.sort(key=lambda place_id: -self.populations[place_id])
+            return [self.place(place_id) for place_id in exact[:limit]]
+        return self.autocomplete(text, limit)
+
+    def parse_query(self, text):
+        """("normalized name", (STATE/COUNTRY CODES,) or None) from e.g. "Charlottesville, Virginia".
+
+        Only the first part after the name narrows the match, so a label such as
+        "Charlottesville, VA, United States" looks up the place it came from.
+        """
+        parts = str(text or "").split(",")
+        qualifier = normalize(parts[1]) if len(parts) > 1 else ""
+        if qualifier:
+            qualifier = tuple(code.upper() for code in self.qualifiers.get(qualifier, (qualifier,)))
+        return normalize(parts[0]), qualifier or None
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """Process-wide Gazetteer, loaded on first use."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = Gazetteer()
+    return _default
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up places in the offline gazetteer.")
+    parser.add_argument("query", help='Place name, optionally with a state or country code ("Paris, TX").')
+    parser.add_argument("--autocomplete", action="store_true", help="Treat the query as a prefix.")
+    parser.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    gazetteer = get_gazetteer()
+    print(f"Loaded {len(gazetteer)} places in {(time.perf_counter() - start) * 1000:.0f} ms", file=sys.stderr)
+    start = time.perf_counter()
+    results = (gazetteer.autocomplete if args.autocomplete else gazetteer.geocode)(args.query, args.limit)
+    print(f"Lookup took {(time.perf_counter() - start) * 1000:.3f} ms", file=sys.stderr)
+    for place in results:
+        print(f"{place['label']}: {place['latitude']:.4f}, {place['longitude']:.4f} (population {place['population']})")
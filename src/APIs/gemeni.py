@@ -1,11 +1,19 @@
-from google import genai
+from APIs.lazy_import import lazy_module
 from APIs.secret import GEMINI_API_KEY
 
-client = genai.Client(api_key= GEMINI_API_KEY)
+# The client library is imported (and the client built) on the first call
+genai = lazy_module("google.genai")
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = genai.Client(api_key= GEMINI_API_KEY)
+    return _client
 
 def generate_gemini_response(prompt):
-    response = client.models.generate_content(
+    response = get_client().models.generate_content(
         model="gemini-2.0-flash",
         contents=prompt
     )
-    return response
\ No newline at end of file
+    return response
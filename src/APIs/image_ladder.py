@@ -0,0 +1,144 @@
+import base64
+import io
+import os
+import sys
+import time
+
+try:
+    from PIL import Image, ImageOps  # Optional: pip install pillow
+except ImportError:
+    Image = None
+
+from shared_cache import get_shared_cache
+from structured_output import StructuredOutputError
+from model_router import generate
+import deadlines
+
+# Adaptive image-resolution ladder for identification.
+#
+# Most subjects can be identified from a small thumbnail, so instead of always
+# sending the full-resolution upload the identification scripts try the rungs
+# below in order and stop at the first answer whose self-reported confidence
+# reaches CONFIDENCE_THRESHOLD:
+#   thumb   longest side THUMB_PX
+#   medium  longest side MEDIUM_PX
+#   crop    centre CROP_FRACTION of the image at MEDIUM_PX (more pixels on a small, centred subject)
+#   full    the original file, unchanged
+# Rungs that would not be smaller than the original are skipped. Without Pillow
+# only the full rung is available, which is the previous behaviour.
+#
+# Bytes sent, latency and how often each rung's answer is accepted are counted
+# in the shared cache (ladder:<task>:<rung>:*) and summarised at /api/metrics.
+
+THUMB_PX = 384
+MEDIUM_PX = 1024
+CROP_FRACTION = 0.6
+JPEG_QUALITY = 85
+CONFIDENCE_THRESHOLD = float(os.getenv("IDENTIFY_CONFIDENCE", "0.7"))
+ENABLED = os.getenv("IMAGE_LADDER", "1") != "0"
+
+RUNGS = ("thumb", "medium", "crop", "full")
+
+CONFIDENCE_PROMPT = (" Set confidence to how sure you are of the identification, from 0 to 1; "
+                     "use a low value if the image is too small or unclear to be sure.")
+
+
+def _jpeg(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+def image_rungs(data, rungs=RUNGS):
+    """Yields (rung, JPEG bytes) for each usable rung of an image, cheapest first; "full" is the original."""
+    image = None
+    if Image is not None and ENABLED:
+        try:
+            image = ImageOps.exif_transpose(Image.open(io.BytesIO(data))).convert("RGB")
+        except Exception as e:
+            print(f"Warning: could not decode image for resizing, sending it as is: {e}", file=sys.stderr)
+    if image is not None:
+        longest = max(image.size)
+        for rung in rungs:
+            if rung in ("thumb", "medium"):
+                size = THUMB_PX if rung == "thumb" else MEDIUM_PX
+                if longest <= size:
+                    continue
+                scaled = image.copy()
+                scaled.thumbnail((size, size))
+            elif rung == "crop":
+                # Only worthwhile when "medium" had to shrink the image
+                if longest <= MEDIUM_PX:
+                    continue
+                width, height = image.size
+                left, top = int(width * (1 - CROP_FRACTION) / 2), int(height * (1 - CROP_FRACTION) / 2)
+                scaled = image.crop((left, top, width - left, height - top))
+                scaled.thumbnail((MEDIUM_PX, MEDIUM_PX))
+            else:
+                continue
+            encoded = _jpeg(scaled)
+            if len(encoded) < len(data):
+                yield rung, encoded
+    if "full" in rungs:
+        yield "full", data
+
+
+def record_rung(task, rung, num_bytes, seconds, accepted):
+    """Counts one attempt at a rung under ladder:<task>:<rung>:*."""
+    try:
+        cache = get_shared_cache()
+        prefix = f"ladder:{task}:{rung}"
+        cache.incr(f"{prefix}:calls")
+        cache.incr(f"{prefix}:bytes", num_bytes)
+        cache.incr(f"{prefix}:latency_ms", int(seconds * 1000))
+        if accepted:
+            cache.incr(f"{prefix}:accepted")
+    except Exception as e:
+        print(f"Warning: could not record ladder metrics: {e}", file=sys.stderr)
+
+
+def identify(prompt, image_path, record_type, task, confidence_of=lambda record: record["confidence"],
+             threshold=None, rungs=RUNGS, model=None):
+    """Identifies the image, escalating through the rungs until the answer is confident enough.
+
+    Each rung is generated on the task's routed model (see model_router.py) unless model is given.
+    Returns (record, details): the accepted record (else the most confident one, preferring
+    larger rungs on a tie), and {"resolution", "confidence", "attempts", "bytes_sent", "model"}.
+    Raises StructuredOutputError (or the upstream error) only if no rung produced a record.
+    """
+    threshold = CONFIDENCE_THRESHOLD if threshold is None else threshold
+    with open(image_path, "rb") as f:
+        data = f.read()
+
+    best, best_confidence, best_rung, best_model = None, -1.0, None, None
+    attempts, bytes_sent = 0, 0
+    last_error = None
+    for rung, payload in image_rungs(data, rungs):
+        contents = [prompt, {"inline_data": {"mime_type": "image/jpeg", "data": base64.b64encode(payload).decode("utf-8")}}]
+        start = time.perf_counter()
+        try:
+            record, routed = generate(task, contents, record_type, model=model)
+        except StructuredOutputError as e:
+            record, last_error = None, e  # Unusable answer; a bigger image may do better
+        except Exception:
+            if best is not None:
+                break  # Out of time or the upstream failed: answer with what we have
+            raise
+        attempts += 1
+        bytes_sent += len(payload)
+
+        confidence = confidence_of(record) if record is not None else 0.0
+        accepted = record is not None and (confidence >= threshold or rung == "full")
+        record_rung(task, rung, len(payload), time.perf_counter() - start, accepted)
+        # The accepted answer is the one returned; otherwise ties go to the later (larger) rung
+        if record is not None and (accepted or confidence >= best_confidence):
+            best, best_confidence, best_rung, best_model = record, confidence, rung, routed["model"]
+        if accepted:
+            break
+        print(f"Identification at '{rung}' resolution has confidence {confidence:.2f}; escalating.", file=sys.stderr)
+
+    if best is None:
+        raise last_error or StructuredOutputError("No image resolution produced an identification.")
+    return best, {"resolution": best_rung, "confidence": best_confidence,
+                  "attempts": attempts, "bytes_sent": bytes_sent, "model": best_model}
+
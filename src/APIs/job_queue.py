@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+import uuid
+
+# Durable background job queue backed by a local SQLite database.
+#
+# Jobs survive restarts: anything still marked "running" by a process that is
+# no longer alive is put back on the queue when a worker pool starts, unless it
+# has already been claimed MAX_ATTEMPTS times -- a job that keeps crashing its
+# worker is marked failed instead of being retried forever. Jobs are
+# deduplicated by a hash of (kind, params), so submitting the same trip twice
+# returns the existing job instead of paying for a second generation.
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+TERMINAL_STATES = (DONE, FAILED)
+
+DEFAULT_DEDUP_TTL = 3600  # Seconds a finished job keeps answering identical submissions
+POLL_INTERVAL = 0.5       # Seconds an idle worker sleeps between queue checks
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))  # Claims before an orphaned job is failed, not requeued
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner_pid INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_input_hash ON jobs (input_hash);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created_at);
+"""
+
+
+def input_hash(kind, params):
+    """Stable hash of a job's inputs, used for deduplication."""
+    payload = json.dumps({"kind": kind, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """SQLite-backed job table. Safe to share between threads and processes."""
+
+    def __init__(self, db_path, dedup_ttl=DEFAULT_DEDUP_TTL):
+        self.db_path = db_path
+        self.dedup_ttl = dedup_ttl
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # A short-lived connection per operation keeps this thread- and fork-safe
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _to_dict(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def submit(self, kind, params, priority=0):
+        """Queues a job unless an identical one is pending or recently finished.
+
+        Returns (job, created) where created is False for a deduplicated submission.
+        """
+        digest = input_hash(kind, params)
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                """SELECT * FROM jobs WHERE input_hash = ?
+                   AND (status IN (?, ?) OR (status = ? AND updated_at >= ?))
+                   ORDER BY created_at DESC LIMIT 1""",
+                (digest, QUEUED, RUNNING, DONE, now - self.dedup_ttl),
+            ).fetchone()
+            if row is not None:
+                conn.execute("COMMIT")
+                return self._to_dict(row), False
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                """INSERT INTO jobs (id, kind, input_hash, params, status, priority, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (job_id, kind, digest, json.dumps(params), QUEUED, priority, now, now),
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            conn.execute("COMMIT")
+            return self._to_dict(row), True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def get(self, job_id):
+        conn = self._connect()
+        try:
+            return self._to_dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+        finally:
+            conn.close()
+
+    def claim(self, kinds=None):
+        """Atomically moves the next queued job (lowest priority value first) to running."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            query = "SELECT * FROM jobs WHERE status = ?"
+            params = [QUEUED]
+            if kinds:
+                query += f" AND kind IN ({', '.join('?' for _ in kinds)})"
+                params.extend(kinds)
+            query += " ORDER BY priority, created_at LIMIT 1"
+            row = conn.execute(query, params).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, owner_pid = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (RUNNING, os.getpid(), time.time(), row["id"]),
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            conn.execute("COMMIT")
+            return self._to_dict(row)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _finish(self, job_id, status, result=None, error=None):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+        finally:
+            conn.close()
+
+    def complete(self, job_id, result):
+        self._finish(job_id, DONE, result=result)
+
+    def fail(self, job_id, error):
+        self._finish(job_id, FAILED, error=error)
+
+    def recover(self, max_attempts=MAX_ATTEMPTS):
+        """Requeues running jobs whose owning process has died (e.g. after a crash).
+
+        Jobs already claimed max_attempts times are marked failed instead. Returns (requeued, failed).
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT id, owner_pid, attempts FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+            requeued = failed = 0
+            for row in rows:
+                if _pid_alive(row["owner_pid"]):
+                    continue
+                if row["attempts"] >= max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, owner_pid = NULL, error = ?, updated_at = ? WHERE id = ?",
+                        (FAILED, f"The job's worker stopped {row['attempts']} time(s) while running it; not retrying.",
+                         time.time(), row["id"]),
+                    )
+                    failed += 1
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, owner_pid = NULL, updated_at = ? WHERE id = ?",
+                        (QUEUED, time.time(), row["id"]),
+                    )
+                    requeued += 1
+            conn.execute("COMMIT")
+            return requeued, failed
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+
+class JobWorkerPool:
+    """Pool of worker threads that run queued jobs through per-kind handler functions.
+
+    A handler takes the job's params dict and job ID and returns a JSON-serializable result,
+    or raises to mark the job failed.
+    """
+
+    def __init__(self, store, handlers, num_workers=2):
+        self.store = store
+        self.handlers = dict(handlers)
+        self.num_workers = num_workers
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        recovered, failed = self.store.recover()
+        if recovered:
+            print(f"Recovered {recovered} unfinished job(s) from a previous run.", file=sys.stderr)
+        if failed:
+            print(f"Marked {failed} job(s) failed after {MAX_ATTEMPTS} interrupted attempts.", file=sys.stderr)
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Stops claiming jobs; with a timeout, waits up to that long for running jobs to finish.
+
+        A job still running when the process exits is requeued by the next start().
+        """
+        self._stop.set()
+        self._wakeup.set()
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+            for thread in self._threads:
+                thread.join(max(0.0, deadline - time.monotonic()))
+
+    def notify(self):
+        """Wakes idle workers after a submission instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    def _work(self):
+        kinds = list(self.handlers)
+        while not self._stop.is_set():
+            job = self.store.claim(kinds)
+            if job is None:
+                self._wakeup.wait(POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            try:
+                result = self.handlers[job["kind"]](job["params"], job["id"])
+                self.store.complete(job["id"], result)
+            except Exception as e:
+                traceback.print_exc()
+                self.store.fail(job["id"], str(e))
+
+
+def public_view(job):
+    """The job fields that are safe to return to clients."""
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
@@ -0,0 +1,52 @@
+import importlib
+import sys
+import types
+
+# Heavy third-party modules (google.generativeai, folium, requests, ...) take
+# hundreds of milliseconds to import. Wrapping them with lazy_module() defers
+# that cost until the first attribute access, so code paths that never touch
+# them (argument errors, cache hits, health checks) start up fast.
+
+
+class LazyModule(types.ModuleType):
+    """Module placeholder that imports the real module on first attribute access."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_name"] = name
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            module = importlib.import_module(self.__dict__["_lazy_name"])
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<lazy module '{self.__dict__['_lazy_name']}' ({state})>"
+
+
+def lazy_module(name):
+    """Returns the module if it is already imported, otherwise a lazy placeholder.
+
+    ImportError is raised at first use rather than here, so callers can keep their
+    existing 'except ImportError' handling around the code that actually uses it.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+def is_loaded(module):
+    """True if a (possibly lazy) module has actually been imported."""
+    if isinstance(module, LazyModule):
+        return module.__dict__["_lazy_module"] is not None
+    return True
@@ -0,0 +1,193 @@
+import json
+import math
+import os
+import shutil
+
+from lazy_import import lazy_module
+
+np = lazy_module("numpy")
+
+# Server-side clustering for maps with many locations.
+#
+# A folium marker per location makes the map HTML (and the browser's work)
+# grow linearly with the number of points. For large result sets the points are
+# instead written to a data directory next to the map:
+#   clusters_<z>.json   one summary per CELL_PX screen-pixel grid cell at zoom z
+#                       ([lat, lon, count, name, type]; name/type only for single points)
+#   points_<x>_<y>.json the individual points in one DETAIL_ZOOM web-mercator tile
+# The map HTML only carries a small script that fetches the summaries for the
+# current zoom, or the point tiles in view once zoomed past MAX_CLUSTER_ZOOM, and
+# draws just what is inside the viewport. The HTML size stays constant and the
+# number of drawn features is bounded by the viewport, not the point count.
+#
+# Clusters for every zoom are computed with vectorized NumPy (grid cell ids,
+# np.unique and weighted bincounts), so building them is fast for thousands of points.
+
+CLUSTER_THRESHOLD = 200   # Maps with more locations than this are clustered
+MIN_ZOOM = 3
+MAX_CLUSTER_ZOOM = 13     # Beyond this zoom individual points are shown
+DETAIL_ZOOM = 11          # Zoom level of the point tiles (~20 km across)
+CELL_PX = 60              # Cluster grid cell size in screen pixels
+TILE_PX = 256
+
+
+def mercator_pixels(lats, lons, zoom):
+    """Web-mercator pixel coordinates of lat/lon arrays at a zoom level."""
+    scale = TILE_PX * 2.0 ** zoom
+    lat = np.radians(np.clip(lats, -85.05112878, 85.05112878))
+    x = (lons + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * scale
+    return x, y
+
+
+def _group(x, y, cell):
+    """Group index per point for a square grid of the given pixel size: (inverse, first index, counts)."""
+    cx = np.floor(x / cell).astype(np.int64)
+    cy = np.floor(y / cell).astype(np.int64)
+    keys = cx * (1 << 32) + cy
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return inverse, first, np.bincount(inverse)
+
+
+def cluster_zoom(lats, lons, zoom, names, types):
+    """Cluster summaries at one zoom: [[lat, lon, count, name, type], ...] (centroids of each grid cell)."""
+    x, y = mercator_pixels(lats, lons, zoom)
+    inverse, first, counts = _group(x, y, CELL_PX)
+    mean_lat = np.bincount(inverse, weights=lats) / counts
+    mean_lon = np.bincount(inverse, weights=lons) / counts
+    clusters = []
+    for lat, lon, count, i in zip(mean_lat.tolist(), mean_lon.tolist(), counts.tolist(), first.tolist()):
+        single = count == 1
+        clusters.append([round(lat, 5), round(lon, 5), count, names[i] if single else None, types[i] if single else None])
+    return clusters
+
+
+def point_tiles(lats, lons, names, types):
+    """Individual points grouped by their DETAIL_ZOOM tile: {(x, y): [[lat, lon, name, type], ...]}."""
+    x, y = mercator_pixels(lats, lons, DETAIL_ZOOM)
+    tx = np.floor(x / TILE_PX).astype(np.int64)
+    ty = np.floor(y / TILE_PX).astype(np.int64)
+    tiles = {}
+    for i, key in enumerate(zip(tx.tolist(), ty.tolist())):
+        tiles.setdefault(key, []).append([round(float(lats[i]), 5), round(float(lons[i]), 5), names[i], types[i]])
+    return tiles
+
+
+def write_cluster_data(locations, data_dir):
+    """Writes the per-zoom summaries and point tiles for locations into data_dir (replacing old data)."""
+    valid = []
+    for loc in locations:
+        try:
+            lat, lon = float(loc.get("latitude", 0)), float(loc.get("longitude", 0))
+        except (TypeError, ValueError):
+            continue
+        if lat != 0 and lon != 0:  # Same validity check as individual markers
+            valid.append((lat, lon, str(loc.get("name", "Unknown Location")), str(loc.get("type", "Unknown Category"))))
+
+    if os.path.isdir(data_dir):
+        shutil.rmtree(data_dir)
+    os.makedirs(data_dir)
+
+    lats = np.array([v[0] for v in valid], dtype=float)
+    lons = np.array([v[1] for v in valid], dtype=float)
+    names = [v[2] for v in valid]
+    types = [v[3] for v in valid]
+
+    for zoom in range(MIN_ZOOM, MAX_CLUSTER_ZOOM + 1):
+        clusters = cluster_zoom(lats, lons, zoom, names, types) if valid else []
+        with open(os.path.join(data_dir, f"clusters_{zoom}.json"), "w") as f:
+            json.dump(clusters, f, separators=(",", ":"))
+    for (x, y), points in (point_tiles(lats, lons, names, types) if valid else {}).items():
+        with open(os.path.join(data_dir, f"points_{x}_{y}.json"), "w") as f:
+            json.dump(points, f, separators=(",", ":"))
+    return len(valid)
+
+
+LOADER_SCRIPT = """
+(function() {
+    var map = %(map)s;
+    var base = %(base)s;
+    var colors = %(colors)s;
+    var minZoom = %(min_zoom)d, maxClusterZoom = %(max_cluster_zoom)d, detailZoom = %(detail_zoom)d;
+    var layer = L.layerGroup().addTo(map);
+    var cache = {};
+    var generation = 0;
+
+    function load(name) {
+        if (!cache[name]) {
+            cache[name] = fetch(base + name).then(function(r) { return r.ok ? r.json() : []; })
+                                            .catch(function() { return []; });
+        }
+        return cache[name];
+    }
+
+    function escapeHtml(text) {
+        var div = document.createElement("div");
+        div.textContent = text;
+        return div.innerHTML;
+    }
+
+    function pointMarker(lat, lon, name, type) {
+        return L.circleMarker([lat, lon], {radius: 7, color: colors[type] || "gray", fillOpacity: 0.8})
+            .bindTooltip(escapeHtml(name))
+            .bindPopup("<b>" + escapeHtml(name) + "</b><br>Type: " + escapeHtml(type) +
+                       "<br>Lat: " + lat.toFixed(4) + ", Lon: " + lon.toFixed(4));
+    }
+
+    function clusterMarker(lat, lon, count) {
+        var marker = L.circleMarker([lat, lon], {radius: Math.min(30, 10 + 4 * Math.log(count)), color: "#3388ff", fillOpacity: 0.6})
+            .bindTooltip(count + " locations");
+        marker.on("click", function() { map.setView([lat, lon], Math.min(map.getZoom() + 2, maxClusterZoom + 1)); });
+        return marker;
+    }
+
+    function render() {
+        var current = ++generation;
+        var zoom = Math.round(map.getZoom());
+        var bounds = map.getBounds().pad(0.25);
+        var draw = function(items, makeMarker) {
+            if (current !== generation) return;  // A newer view has been requested
+            layer.clearLayers();
+            items.forEach(function(item) {
+                if (bounds.contains([item[0], item[1]])) layer.addLayer(makeMarker(item));
+            });
+        };
+
+        if (zoom <= maxClusterZoom) {
+            load("clusters_" + Math.max(zoom, minZoom) + ".json").then(function(clusters) {
+                draw(clusters, function(c) { return c[2] === 1 ? pointMarker(c[0], c[1], c[3], c[4]) : clusterMarker(c[0], c[1], c[2]); });
+            });
+        } else {
+            var nw = map.project(bounds.getNorthWest(), detailZoom).divideBy(256).floor();
+            var se = map.project(bounds.getSouthEast(), detailZoom).divideBy(256).floor();
+            var requests = [];
+            for (var x = nw.x; x <= se.x; x++) {
+                for (var y = nw.y; y <= se.y; y++) requests.push(load("points_" + x + "_" + y + ".json"));
+            }
+            Promise.all(requests).then(function(tiles) {
+                draw([].concat.apply([], tiles), function(p) { return pointMarker(p[0], p[1], p[2], p[3]); });
+            });
+        }
+    }
+
+    map.on("moveend", render);
+    render();
+})();
+"""
+
+
+def loader_script(map_name, data_url, colors):
+    """JavaScript that draws the clustered data for the map variable map_name."""
+    return LOADER_SCRIPT % {
+        "map": map_name,
+        "base": json.dumps(data_url),
+        "colors": json.dumps(colors),
+        "min_zoom": MIN_ZOOM,
+        "max_cluster_zoom": MAX_CLUSTER_ZOOM,
+        "detail_zoom": DETAIL_ZOOM,
+    }
+
+
+def data_dir_for(output_file):
+    """Data directory written next to a map file: adventure_map.html -> adventure_map_data/."""
+    return os.path.splitext(output_file)[0] + "_data"
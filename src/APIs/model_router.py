@@ -0,0 +1,205 @@
+import os
+import random
+import sys
+import threading
+import time
+
+from lazy_import import lazy_module
+from shared_cache import get_shared_cache
+from structured_output import StructuredOutputError, generate_record
+from upstream import CircuitOpenError
+import deadlines
+
+# Model routing across Gemini tiers.
+#
+# Each task (finder, identify, identify_auto, fish) is mapped to a model tier
+# instead of every script hard-coding one model: listing five fish doesn't need
+# the model that plans a whole area. Tiers and routes are configuration:
+#   MODEL_TIER_LITE / MODEL_TIER_FLASH / MODEL_TIER_PRO   model name of each tier
+#   MODEL_ROUTES="fish=lite,finder=flash"                  task -> tier overrides
+#   MODEL_MAX_TIER=pro                                     highest tier escalation may reach
+#
+# Every call's outcome (parsed or not, latency) is kept per task and model over
+# the last HEALTH_WINDOW seconds in the shared cache. A model whose parse-success
+# rate drops below MIN_SUCCESS_RATE, or whose 90th-percentile latency exceeds
+# the task's SLO, is tried last until its bad samples age out. A call that fails
+# to produce a valid record is retried once on the next tier up (or down, at the
+# ceiling); deadline and open-breaker errors are not retried, since no other
+# tier would do better.
+#
+# A/B mode: with MODEL_AB_FRACTION > 0, that fraction of each task's calls
+# starts on a challenger tier (MODEL_AB_TIER, default the next cheaper tier).
+# Calls, parse failures, latency, tokens and estimated cost are counted per task
+# and model (model:<task>:<model>:*) and compared at /api/metrics.
+
+genai = lazy_module("google.generativeai")
+
+TIER_ORDER = ("lite", "flash", "pro")
+TIERS = {
+    "lite": os.getenv("MODEL_TIER_LITE", "gemini-1.5-flash-8b"),
+    "flash": os.getenv("MODEL_TIER_FLASH", "gemini-1.5-flash-latest"),
+    "pro": os.getenv("MODEL_TIER_PRO", "gemini-1.5-pro-latest"),
+}
+DEFAULT_ROUTES = {"fish": "lite", "finder": "flash", "identify": "flash", "identify_auto": "flash"}
+DEFAULT_TIER = "flash"
+MAX_TIER = os.getenv("MODEL_MAX_TIER", "pro")
+MAX_ATTEMPTS = 2  # Tiers tried per call
+
+# Seconds a task's calls should take at the 90th percentile before its model is avoided
+LATENCY_SLO = {"fish": 5.0, "finder": 30.0, "identify": 10.0, "identify_auto": 15.0}
+DEFAULT_SLO = 20.0
+HEALTH_WINDOW = 300    # Seconds of outcomes considered
+MIN_SAMPLES = 10       # Outcomes in the window before a model can be judged
+MIN_SUCCESS_RATE = 0.8
+
+AB_FRACTION = float(os.getenv("MODEL_AB_FRACTION", "0"))
+AB_TIER = os.getenv("MODEL_AB_TIER")
+
+# USD per million (prompt, output) tokens, for cost estimates only
+PRICES = {
+    "gemini-1.5-flash-8b": (0.0375, 0.15),
+    "gemini-1.5-flash-latest": (0.075, 0.30),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro-latest": (1.25, 5.00),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-2.0-flash": (0.10, 0.40),
+}
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def routes():
+    """Task -> tier, with MODEL_ROUTES overrides ("task=tier,...") applied."""
+    table = dict(DEFAULT_ROUTES)
+    for entry in os.getenv("MODEL_ROUTES", "").split(","):
+        task, _, tier = entry.partition("=")
+        if tier.strip() in TIERS:
+            table[task.strip()] = tier.strip()
+        elif entry.strip():
+            print(f"Warning: ignoring model route '{entry.strip()}' (tiers: {', '.join(TIER_ORDER)})", file=sys.stderr)
+    return table
+
+
+ROUTES = routes()
+
+
+def get_model(name):
+    """GenerativeModel for a model name, created once per process (genai must already be configured)."""
+    model = _models.get(name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(name)
+            if model is None:
+                model = _models[name] = genai.GenerativeModel(name)
+    return model
+
+
+def _counter(task, model_name, name):
+    return f"model:{task}:{model_name}:{name}"
+
+
+def health(task, model_name, cache=None):
+    """(samples, parse-success rate, 90th-percentile latency in seconds) over the last HEALTH_WINDOW seconds."""
+    cache = cache or get_shared_cache()
+    cutoff = time.time() - HEALTH_WINDOW
+    outcomes = [o for o in cache.get(_counter(task, model_name, "window"), []) if o[0] >= cutoff]
+    if not outcomes:
+        return 0, None, None
+    latencies = sorted(o[2] for o in outcomes)
+    p90 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.9))]
+    return len(outcomes), sum(o[1] for o in outcomes) / len(outcomes), p90
+
+
+def is_healthy(task, model_name):
+    try:
+        samples, success_rate, p90 = health(task, model_name)
+    except Exception as e:
+        print(f"Warning: could not read model health for {model_name}: {e}", file=sys.stderr)
+        return True
+    if samples < MIN_SAMPLES:
+        return True
+    return success_rate >= MIN_SUCCESS_RATE and p90 <= LATENCY_SLO.get(task, DEFAULT_SLO)
+
+
+def record_outcome(task, model_name, ok, seconds, response=None, parse_failed=False):
+    """Adds a call to the model's health window and its model:<task>:<model>:* counters."""
+    try:
+        cache = get_shared_cache()
+        now = time.time()
+        key = _counter(task, model_name, "window")
+        with cache.transaction():
+            outcomes = [o for o in cache.get(key, []) if o[0] >= now - HEALTH_WINDOW]
+            outcomes.append([round(now, 1), 1 if ok else 0, round(seconds, 3)])
+            cache.set(key, outcomes[-200:], ttl=HEALTH_WINDOW)
+        cache.incr(_counter(task, model_name, "calls"))
+        cache.incr(_counter(task, model_name, "latency_ms"), int(seconds * 1000))
+        if parse_failed:
+            cache.incr(_counter(task, model_name, "parse_failures"))
+        elif not ok:
+            cache.incr(_counter(task, model_name, "errors"))
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+            output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+            cache.incr(_counter(task, model_name, "prompt_tokens"), prompt_tokens)
+            cache.incr(_counter(task, model_name, "output_tokens"), output_tokens)
+            if model_name in PRICES:
+                prompt_price, output_price = PRICES[model_name]
+                cache.incr(_counter(task, model_name, "cost_usd"),
+                           (prompt_tokens * prompt_price + output_tokens * output_price) / 1e6)
+    except Exception as e:
+        # Metrics must never break a generation
+        print(f"Warning: could not record model metrics: {e}", file=sys.stderr)
+
+
+def challenger(tier):
+    """Tier an A/B-sampled call starts on instead of tier."""
+    if AB_TIER in TIERS and AB_TIER != tier:
+        return AB_TIER
+    index = TIER_ORDER.index(tier)
+    return TIER_ORDER[index - 1] if index > 0 else TIER_ORDER[index + 1]
+
+
+def plan(task):
+    """Tiers to try for a task, in order: its route (or the A/B challenger), then escalation, healthy models first."""
+    primary = ROUTES.get(task, DEFAULT_TIER)
+    if AB_FRACTION > 0 and random.random() < AB_FRACTION:
+        primary = challenger(primary)
+    start = TIER_ORDER.index(primary)
+    ceiling = max(start, TIER_ORDER.index(MAX_TIER) if MAX_TIER in TIERS else len(TIER_ORDER) - 1)
+    order = [primary] + list(TIER_ORDER[start + 1:ceiling + 1]) + list(reversed(TIER_ORDER[:start]))
+    healthy = [tier for tier in order if is_healthy(task, TIERS[tier])]
+    return healthy + [tier for tier in order if tier not in healthy]
+
+
+def generate(task, contents, record_type, max_output_tokens=None, model=None):
+    """Schema-constrained generation on the task's routed model, escalating to another tier on failure.
+
+    Returns (record, details) with details {"model", "tier", "attempts"}. Pass model to
+    bypass routing (benchmarks). Raises the last error if no tier produced a record.
+    """
+    if model is not None:
+        record, _ = generate_record(model, contents, record_type, task=task, max_output_tokens=max_output_tokens)
+        return record, {"model": getattr(model, "model_name", None), "tier": None, "attempts": 1}
+
+    last_error = None
+    for attempt, tier in enumerate(plan(task)[:MAX_ATTEMPTS], start=1):
+        model_name = TIERS[tier]
+        start = time.monotonic()
+        try:
+            record, response = generate_record(get_model(model_name), contents, record_type,
+                                               task=task, max_output_tokens=max_output_tokens)
+        except (deadlines.DeadlineExceeded, CircuitOpenError):
+            raise
+        except StructuredOutputError as e:
+            record_outcome(task, model_name, False, time.monotonic() - start, parse_failed=True)
+            last_error = e
+        except Exception as e:
+            record_outcome(task, model_name, False, time.monotonic() - start)
+            last_error = e
+        else:
+            record_outcome(task, model_name, True, time.monotonic() - start, response)
+            return record, {"model": model_name, "tier": tier, "attempts": attempt}
+        print(f"Model '{model_name}' failed for {task}: {last_error}", file=sys.stderr)
+    raise last_error
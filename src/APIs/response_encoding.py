@@ -0,0 +1,102 @@
+import json
+
+try:
+    import msgpack  # Optional: pip install msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2  # Optional: pip install cbor2
+except ImportError:
+    cbor2 = None
+
+# Compact binary encodings for API responses.
+#
+# Clients that send "Accept: application/msgpack" (or application/cbor) get the
+# same response object encoded as MessagePack (or CBOR) instead of JSON. In
+# binary responses, lists of places/locations (objects with latitude and
+# longitude) are also reshaped into a columnar form, so the field names are sent
+# once and the coordinates travel as one flat numeric array:
+#   {"fields": ["name", "type"], "rows": [["Old Rag", "Hiking Trail"], ...],
+#    "coords": [38.5517, -78.3156, ...]}     (lat, lon pairs, COORD_DECIMALS places)
+# JSON responses are left exactly as they were.
+
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+COORD_DECIMALS = 5  # ~1 m
+
+# Media types a client may ask for -> canonical type (x-msgpack is still common)
+MEDIA_TYPES = {
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    "application/cbor": CBOR,
+}
+
+
+def offered():
+    """Media types that can be produced with the libraries installed, in preference order."""
+    return [name for name, canonical in MEDIA_TYPES.items()
+            if (canonical == MSGPACK and msgpack is not None) or (canonical == CBOR and cbor2 is not None)]
+
+
+def _is_location(item):
+    return isinstance(item, dict) and "latitude" in item and "longitude" in item
+
+
+def compact_locations(obj):
+    """obj with every non-empty list of location objects replaced by its columnar form."""
+    if isinstance(obj, dict):
+        return {key: compact_locations(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        if obj and all(_is_location(item) for item in obj):
+            fields = []
+            for item in obj:
+                fields.extend(key for key in item if key not in ("latitude", "longitude") and key not in fields)
+            coords = []
+            for item in obj:
+                try:
+                    coords.append(round(float(item["latitude"]), COORD_DECIMALS))
+                    coords.append(round(float(item["longitude"]), COORD_DECIMALS))
+                except (TypeError, ValueError):
+                    coords.extend((None, None))
+            rows = [[compact_locations(item.get(field)) for field in fields] for item in obj]
+            return {"fields": fields, "rows": rows, "coords": coords}
+        return [compact_locations(item) for item in obj]
+    return obj
+
+
+def encode(obj, media_type):
+    """Bytes of obj in the given (canonical or alias) binary media type."""
+    canonical = MEDIA_TYPES[media_type]
+    obj = compact_locations(obj)
+    if canonical == MSGPACK:
+        # Floats stay 64-bit: timestamps (e.g. job created_at) don't survive 32-bit precision
+        return msgpack.packb(obj, use_bin_type=True)
+    return cbor2.dumps(obj, canonical=True)  # Canonical CBOR picks the shortest exact float width
+
+
+def decode(data, media_type):
+    """Inverse of encode() (locations stay in columnar form; see expand_locations)."""
+    if MEDIA_TYPES[media_type] == MSGPACK:
+        return msgpack.unpackb(data, raw=False)
+    return cbor2.loads(data)
+
+
+def expand_locations(obj):
+    """Turns columnar location lists back into lists of objects (what a JSON client would get)."""
+    if isinstance(obj, dict):
+        if set(obj) == {"fields", "rows", "coords"}:
+            coords = obj["coords"]
+            return [dict(zip(obj["fields"], [expand_locations(v) for v in row]),
+                         latitude=coords[2 * i], longitude=coords[2 * i + 1])
+                    for i, row in enumerate(obj["rows"])]
+        return {key: expand_locations(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [expand_locations(item) for item in obj]
+    return obj
+
+
+def compact_json(obj):
+    """The JSON text the API sends (no indentation or spaces after separators)."""
+    return json.dumps(obj, separators=(",", ":"))
@@ -0,0 +1,241 @@
+import argparse
+import math
+import os
+import queue
+import sys
+import threading
+import time
+
+import deadlines
+
+from adventure_finder import configure_genai, find_adventure_locations
+from adventure_map import render_map
+from shared_cache import get_shared_cache
+from upstream import CIRCUIT_OPEN_EXIT_CODE, CircuitOpenError
+
+# Adventure spots along a whole route, rendered as one map.
+#
+# Instead of one plan_trip per stop (each repeating the search for overlapping
+# areas), the route is split into cells of a fixed global grid sized so one
+# finder query of radius_miles covers a whole cell. Each cell the route passes
+# through is queried once -- concurrently -- and results are deduplicated across
+# cells, so the work scales with the area covered rather than the number of
+# stops. Cell results are kept in the shared cache, so overlapping routes (and
+# repeat requests) reuse them.
+
+MILES_PER_DEGREE_LAT = 69.0
+MAX_CELLS = 30            # Upper bound on finder queries per route
+CELL_CACHE_TTL = 24 * 3600  # Seconds a cell's locations are reused
+DUPLICATE_MILES = 1.0     # Same-named locations closer than this are one place
+RENDER_MARGIN = 5.0       # Seconds kept back from the request deadline to render the map
+
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 3958.8 * 2 * math.asin(math.sqrt(a))
+
+
+def decode_polyline(encoded):
+    """Decodes a Google encoded polyline (precision 5) into [(lat, lon), ...]."""
+    points, index, lat, lon = [], 0, 0, 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            result, shift = 0, 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        points.append((lat / 1e5, lon / 1e5))
+    return points
+
+
+def parse_waypoints(text):
+    """Parses "lat,lon;lat,lon;..." into [(lat, lon), ...]."""
+    points = []
+    for pair in text.split(";"):
+        if pair.strip():
+            lat, lon = pair.split(",")
+            points.append((float(lat), float(lon)))
+    return points
+
+
+def cell_size_miles(radius_miles):
+    # A square of side r*sqrt(2) fits inside a circle of radius r
+    return radius_miles * math.sqrt(2)
+
+
+def cell_of(lat, lon, side_miles):
+    """(row, col) of the global grid cell containing a point. Cells are side_miles square."""
+    lat_step = side_miles / MILES_PER_DEGREE_LAT
+    row = math.floor(lat / lat_step)
+    centre_lat = (row + 0.5) * lat_step
+    lon_step = side_miles / (MILES_PER_DEGREE_LAT * max(math.cos(math.radians(centre_lat)), 0.01))
+    return row, math.floor(lon / lon_step)
+
+
+def cell_centre(row, col, side_miles):
+    lat_step = side_miles / MILES_PER_DEGREE_LAT
+    centre_lat = (row + 0.5) * lat_step
+    lon_step = side_miles / (MILES_PER_DEGREE_LAT * max(math.cos(math.radians(centre_lat)), 0.01))
+    return round(centre_lat, 5), round((col + 0.5) * lon_step, 5)
+
+
+def route_cells(points, radius_miles):
+    """Cells covered by the route, in route order, each listed once."""
+    side = cell_size_miles(radius_miles)
+    cells = []
+    seen = set()
+
+    def visit(lat, lon):
+        cell = cell_of(lat, lon, side)
+        if cell not in seen:
+            seen.add(cell)
+            cells.append(cell)
+
+    visit(*points[0])
+    for (lat1, lon1), (lat2, lon2) in zip(points, points[1:]):
+        # Sample each segment finely enough that no cell it crosses is skipped
+        steps = max(1, math.ceil(haversine_miles(lat1, lon1, lat2, lon2) / (side / 4)))
+        for i in range(1, steps + 1):
+            t = i / steps
+            visit(lat1 + (lat2 - lat1) * t, lon1 + (lon2 - lon1) * t)
+    return cells
+
+
+def dedupe_locations(locations):
+    """Drops repeats of the same place returned by neighbouring cells."""
+    kept = []
+    by_name = {}
+    for loc in locations:
+        name = " ".join(str(loc.get("name", "")).lower().split())
+        lat, lon = loc.get("latitude"), loc.get("longitude")
+        if any(haversine_miles(lat, lon, other["latitude"], other["longitude"]) < DUPLICATE_MILES
+               for other in by_name.get(name, [])):
+            continue
+        by_name.setdefault(name, []).append(loc)
+        kept.append(loc)
+    return kept
+
+
+def find_route_locations(points, radius_miles, workers=4, max_cells=MAX_CELLS):
+    """Queries every cell along the route concurrently. Returns (locations, number of cells, cells answered).
+
+    Under a request deadline, cells still unanswered RENDER_MARGIN seconds before it
+    are given up on, so a partial map can still be rendered in time.
+    """
+    cells = route_cells(points, radius_miles)
+    if len(cells) > max_cells:
+        raise ValueError(f"Route covers {len(cells)} areas; the limit is {max_cells}. Use a smaller radius or a shorter route.")
+
+    side = cell_size_miles(radius_miles)
+    cache = get_shared_cache()
+    model = None
+    pending = []
+    results = {}
+    for row, col in cells:
+        cached = cache.get(f"finder:cell:{row}:{col}:{radius_miles:g}")
+        if cached is not None:
+            results[(row, col)] = cached
+        else:
+            pending.append((row, col))
+    print(f"Route covers {len(cells)} area(s); {len(cells) - len(pending)} cached, querying {len(pending)}.", file=sys.stderr)
+
+    if pending:
+        configure_genai()
+
+        def query(cell):
+            lat, lon = cell_centre(*cell, side)
+            return find_adventure_locations(lat, lon, radius_miles)
+
+        todo, done = queue.Queue(), queue.Queue()
+        for cell in pending:
+            todo.put(cell)
+        abandoned = threading.Event()
+
+        def work():
+            while not abandoned.is_set():
+                try:
+                    cell = todo.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    done.put((cell, query(cell), None))
+                except Exception as e:
+                    done.put((cell, None, e))
+
+        # Daemon threads, not a ThreadPoolExecutor: interpreter exit joins pool threads,
+        # so queries abandoned at the deadline would keep the script from exiting
+        for _ in range(min(workers, len(pending))):
+            threading.Thread(target=work, name="route-cell", daemon=True).start()
+
+        left = deadlines.remaining()
+        give_up_at = None if left is None else time.monotonic() + max(left - RENDER_MARGIN, 0)
+        try:
+            for _ in pending:
+                timeout = None if give_up_at is None else max(give_up_at - time.monotonic(), 0)
+                (row, col), locations, error = done.get(timeout=timeout)
+                if isinstance(error, deadlines.DeadlineExceeded):
+                    continue  # Left unanswered, like the cells still running at the deadline
+                if error is not None:
+                    raise error
+                results[(row, col)] = locations
+                if locations:
+                    cache.set(f"finder:cell:{row}:{col}:{radius_miles:g}", locations, ttl=CELL_CACHE_TTL)
+        except queue.Empty:
+            print(f"Deadline approaching; giving up on {len(cells) - len(results)} area(s).", file=sys.stderr)
+        finally:
+            abandoned.set()
+
+    merged = [loc for cell in cells if cell in results for loc in results[cell]]
+    return dedupe_locations(merged), len(cells), len(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find and map adventure spots along a route.")
+    route = parser.add_mutually_exclusive_group(required=True)
+    route.add_argument("--waypoints", help='Stops as "lat,lon;lat,lon;...".')
+    route.add_argument("--polyline", help="Route as a Google encoded polyline.")
+    parser.add_argument("--radius_miles", type=float, default=15.0, help="Search radius around the route in miles (default: 15.0).")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent area queries (default: 4).")
+    parser.add_argument("--output", default="route_map.html", help="Output HTML map file name (default: route_map.html).")
+    args = parser.parse_args()
+
+    try:
+        points = parse_waypoints(args.waypoints) if args.waypoints else decode_polyline(args.polyline)
+    except (ValueError, IndexError) as e:
+        print(f"Error: Invalid route: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not points:
+        print("Error: The route has no points.", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        locations, num_cells, num_answered = find_route_locations(points, args.radius_miles, workers=args.workers)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    except CircuitOpenError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(CIRCUIT_OPEN_EXIT_CODE)
+    if num_answered < num_cells:
+        print(f"Partial results: {num_answered} of {num_cells} area(s) searched before the deadline.")
+
+    if locations:
+        print(f"Found {len(locations)} adventure spots in {num_cells} area(s). Generating map...")
+        try:
+            centre = [sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points)]
+            render_map(locations, centre, 8, args.output, route=[list(p) for p in points])
+            print(f"Map successfully saved to: {os.path.abspath(args.output)}")
+        except Exception as e:
+            print(f"An error occurred during map generation: {e}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        print("No adventure locations found or retrieved to map.")
@@ -0,0 +1,221 @@
+import argparse
+import atexit
+import contextlib
+import importlib
+import io
+import json
+import os
+import runpy
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+# A "template" process imports the heavy libraries the scripts need once, then
+# forks a child for every script run. The child starts with everything already
+# warm, so a script run costs a fork instead of a fresh interpreter plus
+# several hundred milliseconds of imports.
+#
+# Protocol (one connection per run, newline-delimited JSON over a Unix socket):
+#   client -> template: {"script": path, "args": [...], "cwd": dir, "env": {...}, "timeout": seconds}
+#   template -> client: {"returncode": int, "stdout": str, "stderr": str}
+# A child that outlives its timeout is killed by SIGALRM and sends nothing; the
+# client reports that run as timed out.
+
+# Modules preloaded into the template before any fork
+PRELOAD_MODULES = [
+    "google.generativeai",
+    "folium",
+    "requests",
+    "PIL.Image",  # Optional (image resolution ladder)
+    "base64",
+    "argparse",
+]
+
+STARTUP_TIMEOUT = 30  # Seconds to wait for the template socket to appear
+KILL_GRACE = 2        # Extra seconds the client waits for a child past its timeout
+
+
+def is_supported():
+    """Forking templates need os.fork and Unix sockets (not available on Windows)."""
+    return hasattr(os, "fork") and hasattr(socket, "AF_UNIX")
+
+
+# --- Template Server ---
+
+def preload_modules(names=PRELOAD_MODULES):
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"Template: could not preload {name}: {e}", file=sys.stderr)
+
+
+def _exit_code(exc):
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+
+def _run_job(conn):
+    """Runs one script inside a freshly forked child and reports its output."""
+    rfile = conn.makefile("r", encoding="utf-8")
+    job = json.loads(rfile.readline())
+    script_path = job["script"]
+    if job.get("timeout") is not None:
+        # SIGALRM's default action terminates the child even inside a blocking C call
+        signal.setitimer(signal.ITIMER_REAL, max(0.01, job["timeout"]))
+    os.environ.update(job.get("env") or {})
+
+    os.chdir(job.get("cwd") or os.getcwd())
+    sys.argv = [script_path] + list(job.get("args", []))
+    sys.path[0] = os.path.dirname(os.path.abspath(script_path))
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    returncode = 0
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            runpy.run_path(script_path, run_name="__main__")
+        except SystemExit as e:
+            returncode = _exit_code(e)
+        except BaseException:
+            traceback.print_exc()
+            returncode = 1
+
+    result = {"returncode": returncode, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+    conn.sendall((json.dumps(result) + "\n").encode("utf-8"))
+
+
+def serve(socket_path):
+    """Preloads modules, then forks a child per incoming script request (runs forever)."""
+    preload_modules()
+
+    # Children are reaped automatically; the template never waits on them
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    os.chmod(socket_path, 0o600)
+    server.listen(64)
+    print(f"Template process {os.getpid()} ready on {socket_path}", file=sys.stderr)
+
+    while True:
+        try:
+            conn, _ = server.accept()
+        except InterruptedError:
+            continue
+        pid = os.fork()
+        if pid == 0:
+            server.close()
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            try:
+                _run_job(conn)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                conn.close()
+                os._exit(0)
+        conn.close()
+
+
+# --- Client ---
+
+class TemplateClient:
+    """Starts the template process on first use and submits script runs to it."""
+
+    def __init__(self, socket_path=None):
+        if socket_path is None:
+            socket_dir = tempfile.mkdtemp(prefix="script-template-")
+            socket_path = os.path.join(socket_dir, "template.sock")
+        self.socket_path = socket_path
+        self._process = None
+        self._owner_pid = None
+        self._lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def _running(self):
+        if self._process is None:
+            return False
+        if self._owner_pid != os.getpid():
+            # Started by the parent before a fork (pre-forked workers): share it while it is alive
+            try:
+                os.kill(self._process.pid, 0)
+            except OSError:
+                return False
+            return os.path.exists(self.socket_path)
+        return self._process.poll() is None
+
+    def start(self):
+        """Launches the template process if it is not already running. Returns True when ready."""
+        with self._lock:
+            if self._running():
+                return True
+            self._owner_pid = os.getpid()
+            self._process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--socket", self.socket_path],
+                stdin=subprocess.DEVNULL,
+            )
+            deadline = time.monotonic() + STARTUP_TIMEOUT
+            while time.monotonic() < deadline:
+                if os.path.exists(self.socket_path):
+                    return True
+                if self._process.poll() is not None:
+                    break
+                time.sleep(0.05)
+            print("Warning: template process did not start; falling back to plain subprocesses.", file=sys.stderr)
+            self.stop()
+            return False
+
+    def stop(self):
+        # Only the process that launched the template may shut it down
+        if self._process is not None and self._owner_pid == os.getpid() and self._process.poll() is None:
+            self._process.terminate()
+            self._process.wait()
+        self._process = None
+
+    def run(self, script_path, args_list, cwd=None, env=None, timeout=None):
+        """Runs a script in a forked child of the template.
+
+        env is added to the child's environment; a child still running after timeout seconds
+        is killed. Returns a dict with returncode/stdout/stderr (plus "timed_out": True for a
+        killed run), or None if the template is unavailable (the caller should then fall back
+        to a normal subprocess).
+        """
+        if not self.start():
+            return None
+        job = {"script": script_path, "args": list(args_list), "cwd": cwd, "env": env or {}, "timeout": timeout}
+        timed_out = {"returncode": None, "stdout": "", "stderr": "", "timed_out": True}
+        start = time.monotonic()
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                conn.connect(self.socket_path)
+                if timeout is not None:
+                    conn.settimeout(timeout + KILL_GRACE)
+                conn.sendall((json.dumps(job) + "\n").encode("utf-8"))
+                line = conn.makefile("r", encoding="utf-8").readline()
+        except socket.timeout:
+            return timed_out
+        except OSError as e:
+            print(f"Warning: template process unavailable ({e}).", file=sys.stderr)
+            return None
+        if not line:
+            if timeout is not None and time.monotonic() - start >= timeout:
+                return timed_out  # The child was killed by its timer
+            return None
+        return json.loads(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the preloaded script template process.")
+    parser.add_argument("--socket", required=True, help="Path of the Unix socket to listen on.")
+    args = parser.parse_args()
+    serve(args.socket)
@@ -0,0 +1,134 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Key/value store shared by every worker process on the host.
+#
+# When the server runs as several pre-forked workers (see serve.py), anything
+# cached in a module-level dict would be duplicated -- and diverge -- in each
+# process. This store keeps cached values and counters in one SQLite database in
+# WAL mode, so readers never block the writer and all workers see the same state.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+class SharedCache:
+    """JSON values with optional TTLs plus atomic counters, stored in SQLite (WAL mode)."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # One connection per thread (and per process: connections must not cross a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # --- Cached values ---
+
+    def get(self, key, default=None):
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return default
+        return json.loads(row[0])
+
+    def get_with_age(self, key):
+        """Returns (value, expired) ignoring the TTL, or (None, True) if the key was never set."""
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None, True
+        return json.loads(row[0]), row[1] is not None and row[1] < time.time()
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        self._connect().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), expires_at),
+        )
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def purge_expired(self):
+        """Deletes expired entries. Returns the number removed."""
+        cursor = self._connect().execute(
+            "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+        )
+        return cursor.rowcount
+
+    # --- Counters ---
+
+    def incr(self, key, amount=1):
+        """Atomically adds amount to a counter and returns the new value."""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO counters (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+                (key, amount),
+            )
+            return conn.execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()[0]
+
+    def counters(self, prefix=""):
+        rows = self._connect().execute(
+            "SELECT key, value FROM counters WHERE key LIKE ? ORDER BY key", (prefix + "%",)
+        ).fetchall()
+        return {key: value for key, value in rows}
+
+    def transaction(self):
+        """Context manager for an exclusive read-modify-write across processes."""
+        return _Transaction(self._connect())
+
+
+class _Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_shared_cache(db_path=None):
+    """Process-wide SharedCache; the path comes from SHARED_CACHE_PATH or defaults to instance/."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                if db_path is None:
+                    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+                    db_path = os.getenv("SHARED_CACHE_PATH", os.path.join(root, "instance", "shared_cache.sqlite3"))
+                _default = SharedCache(db_path)
+    return _default
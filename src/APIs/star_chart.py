@@ -0,0 +1,185 @@
+import csv
+import datetime
+import hashlib
+import json
+import math
+import os
+import sys
+
+from lazy_import import lazy_module
+
+np = lazy_module("numpy")
+
+# Local star-chart engine: computes where the bundled bright stars sit in the
+# observer's sky and renders an all-sky SVG chart, with no call to
+# astronomyapi.com. The result has the same shape as
+# astronomy_api.get_star_chart_image_url ({"success": True, "image_url": ...}).
+#
+# Positions use the standard equatorial -> horizontal transform (J2000
+# coordinates, no precession/refraction, which is well below a chart pixel), and
+# are computed for all stars at once with NumPy.
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+STAR_CATALOG_PATH = os.path.join(DATA_DIR, "bright_stars.csv")
+CONSTELLATIONS_PATH = os.path.join(DATA_DIR, "constellations.json")
+
+DEFAULT_LOCAL_HOUR = 21  # Charts show the sky at 9 pm local (mean solar) time
+CHART_SIZE = 800         # SVG width (and sky disc height) in pixels
+FOOTER_HEIGHT = 30       # Caption strip below the sky disc
+LABEL_MAGNITUDE = 1.5    # Stars brighter than this get a name label
+
+# Colour schemes named after the astronomyapi.com styles
+STYLES = {
+    "default": {"background": "#0b1026", "sky": "#101a3c", "star": "#ffffff", "line": "#5c7cfa", "text": "#c9d4ff", "highlight": "#ffd43b"},
+    "inverted": {"background": "#ffffff", "sky": "#f1f3f5", "star": "#000000", "line": "#868e96", "text": "#212529", "highlight": "#e03131"},
+    "navy": {"background": "#001f3f", "sky": "#002b57", "star": "#f8f9fa", "line": "#74c0fc", "text": "#d0ebff", "highlight": "#ffd43b"},
+    "red": {"background": "#1a0000", "sky": "#260000", "star": "#ff8787", "line": "#c92a2a", "text": "#ffa8a8", "highlight": "#ffe066"},
+}
+
+_catalog = None
+_constellations = None
+
+
+def load_catalog():
+    """Bright-star catalog as (names, ra_hours, dec_degrees, magnitudes) arrays, loaded once."""
+    global _catalog
+    if _catalog is None:
+        with open(STAR_CATALOG_PATH, newline="") as f:
+            rows = list(csv.DictReader(f))
+        _catalog = (
+            [row["name"] for row in rows],
+            np.array([float(row["ra_hours"]) for row in rows]),
+            np.array([float(row["dec_degrees"]) for row in rows]),
+            np.array([float(row["magnitude"]) for row in rows]),
+        )
+    return _catalog
+
+
+def load_constellations():
+    global _constellations
+    if _constellations is None:
+        with open(CONSTELLATIONS_PATH) as f:
+            _constellations = json.load(f)
+    return _constellations
+
+
+def observation_time(date_str, longitude, local_hour=DEFAULT_LOCAL_HOUR):
+    """UTC datetime for local_hour (mean solar time at longitude) on date_str (YYYY-MM-DD)."""
+    if date_str is None:
+        date = datetime.date.today()
+    else:
+        date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
+    local = datetime.datetime.combine(date, datetime.time(), tzinfo=datetime.timezone.utc)
+    return local + datetime.timedelta(hours=local_hour - longitude / 15.0)
+
+
+def local_sidereal_hours(when_utc, longitude):
+    """Local mean sidereal time in hours."""
+    j2000 = datetime.datetime(2000, 1, 1, 12, tzinfo=datetime.timezone.utc)
+    days = (when_utc - j2000).total_seconds() / 86400.0
+    gmst = 18.697374558 + 24.06570982441908 * days
+    return (gmst + longitude / 15.0) % 24.0
+
+
+def horizontal_coordinates(ra_hours, dec_degrees, latitude, longitude, when_utc):
+    """Vectorized altitude/azimuth (degrees; azimuth from north through east) for arrays of RA/Dec."""
+    lst = local_sidereal_hours(when_utc, longitude)
+    hour_angle = np.radians((lst - ra_hours) * 15.0)
+    dec = np.radians(dec_degrees)
+    lat = math.radians(latitude)
+
+    sin_alt = np.sin(dec) * math.sin(lat) + np.cos(dec) * math.cos(lat) * np.cos(hour_angle)
+    altitude = np.arcsin(np.clip(sin_alt, -1.0, 1.0))
+    azimuth = np.arctan2(
+        -np.cos(dec) * np.sin(hour_angle),
+        np.sin(dec) * math.cos(lat) - np.cos(dec) * np.cos(hour_angle) * math.sin(lat),
+    )
+    return np.degrees(altitude), np.degrees(azimuth) % 360.0
+
+
+def project(altitude, azimuth, size=CHART_SIZE):
+    """Zenith-centred azimuthal-equidistant projection, north up and east left (as seen looking up)."""
+    radius = size / 2.0 - 30
+    r = (90.0 - altitude) / 90.0 * radius
+    az = np.radians(azimuth)
+    return size / 2.0 - r * np.sin(az), size / 2.0 - r * np.cos(az)
+
+
+def _escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def render_svg(latitude, longitude, when_utc, style="default", constellation=None):
+    """Renders the sky above the observer as an SVG document (string)."""
+    colors = STYLES.get(style, STYLES["default"])
+    names, ra, dec, mag = load_catalog()
+    altitude, azimuth = horizontal_coordinates(ra, dec, latitude, longitude, when_utc)
+    x, y = project(altitude, azimuth)
+    visible = altitude > 0
+    index = {name: i for i, name in enumerate(names)}
+    size, centre, radius = CHART_SIZE, CHART_SIZE / 2.0, CHART_SIZE / 2.0 - 30
+    height = size + FOOTER_HEIGHT
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{height}" viewBox="0 0 {size} {height}" '
+        f'font-family="sans-serif" font-size="12">',
+        f'<rect width="{size}" height="{height}" fill="{colors["background"]}"/>',
+        f'<circle cx="{centre}" cy="{centre}" r="{radius}" fill="{colors["sky"]}" stroke="{colors["line"]}"/>',
+    ]
+    for label, dx, dy in (("N", 0, -radius - 12), ("S", 0, radius + 20), ("E", -radius - 18, 4), ("W", radius + 8, 4)):
+        parts.append(f'<text x="{centre + dx - 4:.1f}" y="{centre + dy:.1f}" fill="{colors["text"]}">{label}</text>')
+
+    # Constellation figures (a line is drawn when both ends are above the horizon)
+    for code, figure in load_constellations().items():
+        highlighted = code == constellation
+        stroke = colors["highlight"] if highlighted else colors["line"]
+        width = 2.0 if highlighted else 0.8
+        for a, b in figure["lines"]:
+            i, j = index[a], index[b]
+            if visible[i] and visible[j]:
+                parts.append(f'<line x1="{x[i]:.1f}" y1="{y[i]:.1f}" x2="{x[j]:.1f}" y2="{y[j]:.1f}" '
+                             f'stroke="{stroke}" stroke-width="{width}"/>')
+
+    # Stars: brighter (lower magnitude) stars get bigger dots
+    star_radius = np.clip(4.0 - 0.9 * mag, 0.8, 5.5)
+    for i in np.flatnonzero(visible):
+        parts.append(f'<circle cx="{x[i]:.1f}" cy="{y[i]:.1f}" r="{star_radius[i]:.2f}" fill="{colors["star"]}"/>')
+        if mag[i] < LABEL_MAGNITUDE:
+            parts.append(f'<text x="{x[i] + 6:.1f}" y="{y[i] - 4:.1f}" fill="{colors["text"]}">{_escape(names[i])}</text>')
+
+    title = f"Sky at {latitude:.2f}, {longitude:.2f} - {when_utc:%Y-%m-%d %H:%M} UTC"
+    if constellation:
+        figure = load_constellations().get(constellation)
+        if figure:
+            shown = any(visible[index[a]] and visible[index[b]] for a, b in figure["lines"])
+            title += f" - {figure['name']}" + ("" if shown else " (below the horizon)")
+    parts.append(f'<text x="10" y="{height - 10}" fill="{colors["text"]}">{_escape(title)}</text>')
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def get_star_chart(latitude, longitude, date_str=None, style="default", constellation=None,
+                   output_dir=None, url_prefix="/charts/"):
+    """Renders a star chart locally and returns {"success": True, "image_url": ...} like the remote API.
+
+    Charts are content-addressed files in output_dir, so a repeated request reuses the existing file.
+    """
+    try:
+        if constellation and constellation not in load_constellations():
+            return {"error": f"Unknown constellation code: {constellation}"}
+        when_utc = observation_time(date_str, longitude)
+        key = json.dumps([round(latitude, 3), round(longitude, 3), when_utc.isoformat(), style, constellation])
+        filename = hashlib.sha256(key.encode("utf-8")).hexdigest()[:24] + ".svg"
+        path = os.path.join(output_dir, filename)
+        if not os.path.exists(path):
+            os.makedirs(output_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(render_svg(latitude, longitude, when_utc, style, constellation))
+            os.replace(tmp_path, path)
+        return {"success": True, "image_url": url_prefix + filename}
+    except ValueError as e:
+        return {"error": f"Invalid star chart request: {e}"}
+    except Exception as e:
+        print(f"Unexpected error in get_star_chart: {e}", file=sys.stderr)
+        return {"error": f"An unexpected error occurred: {e}"}
@@ -0,0 +1,255 @@
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import brotli  # Optional: pip install brotli
+except ImportError:
+    brotli = None
+
+# Compressed variants and cache validators for static files (frontend_web and
+# generated maps).
+#
+# Every file is identified by a hash of its content, which doubles as its ETag.
+# gzip/brotli variants are stored under <cache_dir>/<hash>.<ext>, either built
+# ahead of time (`python src/APIs/static_cache.py build frontend_web`) or written
+# the first time a client asks for that encoding. HTML pages have their local
+# CSS/JS references rewritten to `file.css?v=<hash>` so those assets can be sent
+# with an immutable Cache-Control header.
+#
+# File contents are memoized per process, least recently used first out once
+# they exceed MEMO_MAX_BYTES. When a file's content changes, the variants of its
+# previous hash are deleted; variants not served for VARIANT_MAX_AGE (their mtime
+# is touched on every use) are swept, at most once per SWEEP_INTERVAL, so the
+# variants of deleted maps don't accumulate.
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+MIN_COMPRESS_SIZE = 512  # Bytes; smaller files aren't worth compressing
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+ENCODINGS = {"br": ".br", "gzip": ".gz"}  # Preference order when q-values tie
+FINGERPRINT_LENGTH = 12
+MEMO_MAX_BYTES = int(float(os.getenv("STATIC_MEMO_MAX_MB", "64")) * 1024 * 1024)
+VARIANT_MAX_AGE = 7 * 24 * 3600  # Seconds an unused compressed variant is kept
+SWEEP_INTERVAL = 3600            # Seconds between sweeps of a cache directory
+
+# <link href="style.css"> / <script src="main.js"> with a plain relative path
+ASSET_REF_PATTERN = re.compile(r'(?P<attr>src|href)="(?P<path>[\w./-]+\.(?:css|js))"')
+
+_entries = OrderedDict()  # absolute path -> ((mtime, size), entry), least recently used first
+_entries_bytes = 0
+_entries_lock = threading.Lock()
+_last_sweep = {}  # cache_dir -> time of its last sweep
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def available_encodings():
+    return [name for name in ENCODINGS if name != "br" or brotli is not None]
+
+
+def compress(data, encoding):
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def file_fingerprint(path):
+    """Short content hash used in ?v= query strings."""
+    return load_entry(path)["etag"][:FINGERPRINT_LENGTH]
+
+
+def fingerprint_html(data, directory):
+    """Rewrites local CSS/JS references in an HTML page to include a content fingerprint."""
+    text = data.decode("utf-8")
+
+    def add_version(match):
+        asset_path = os.path.join(directory, match.group("path"))
+        if not os.path.isfile(asset_path):
+            return match.group(0)
+        return f'{match.group("attr")}="{match.group("path")}?v={file_fingerprint(asset_path)}"'
+
+    return ASSET_REF_PATTERN.sub(add_version, text).encode("utf-8")
+
+
+def load_entry(path):
+    """Returns {etag, data, mimetype} for a file, memoized until its mtime/size change."""
+    stat = os.stat(path)
+    path = os.path.abspath(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _entries_lock:
+        memo = _entries.get(path)
+        if memo is not None and memo[0] == version:
+            _entries.move_to_end(path)
+            return memo[1]
+
+    with open(path, "rb") as f:
+        data = f.read()
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if mimetype == "text/html":
+        data = fingerprint_html(data, os.path.dirname(path))
+    entry = {"etag": content_hash(data), "data": data, "mimetype": mimetype}
+    _remember(path, version, entry)
+    return entry
+
+
+def _remember(path, version, entry):
+    global _entries_bytes
+    with _entries_lock:
+        previous = _entries.pop(path, None)
+        if previous is not None:
+            _entries_bytes -= len(previous[1]["data"])
+            if previous[1]["etag"] != entry["etag"]:
+                entry["replaces"] = previous[1]["etag"]  # Its variants are deleted by ensure_variant
+        _entries[path] = (version, entry)
+        _entries_bytes += len(entry["data"])
+        while _entries_bytes > MEMO_MAX_BYTES and len(_entries) > 1:
+            _, (_, evicted) = _entries.popitem(last=False)
+            _entries_bytes -= len(evicted["data"])
+
+
+def variant_path(cache_dir, etag, encoding):
+    return os.path.join(cache_dir, etag + ENCODINGS[encoding])
+
+
+def remove_variants(cache_dir, etag):
+    for encoding in ENCODINGS:
+        try:
+            os.remove(variant_path(cache_dir, etag, encoding))
+        except FileNotFoundError:
+            pass
+
+
+def sweep(cache_dir, max_age=VARIANT_MAX_AGE):
+    """Deletes variants not used for max_age seconds. Returns the number removed."""
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        names = os.listdir(cache_dir)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        path = os.path.join(cache_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def ensure_variant(cache_dir, entry, encoding):
+    """Returns the path of the compressed variant, writing it first if needed."""
+    path = variant_path(cache_dir, entry["etag"], encoding)
+    if os.path.exists(path):
+        try:
+            os.utime(path)  # Marks it as recently used for sweep()
+        except OSError:
+            pass
+        return path
+
+    replaced = entry.pop("replaces", None)
+    if replaced is not None:
+        remove_variants(cache_dir, replaced)
+    now = time.time()
+    if now - _last_sweep.get(cache_dir, 0) > SWEEP_INTERVAL:
+        _last_sweep[cache_dir] = now
+        removed = sweep(cache_dir)
+        if removed:
+            print(f"Removed {removed} unused compressed variant(s) from {cache_dir}", file=sys.stderr)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+    with os.fdopen(fd, "wb") as f:
+        f.write(compress(entry["data"], encoding))
+    os.replace(tmp_path, path)  # Atomic, so concurrent requests never see a partial file
+    return path
+
+
+def choose_encoding(accept_encodings, entry):
+    """Picks the best encoding the client accepts, or None for identity."""
+    if not is_compressible(entry["mimetype"]) or len(entry["data"]) < MIN_COMPRESS_SIZE:
+        return None
+    best, best_quality = None, 0
+    for encoding in available_encodings():
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def send_static(path, cache_dir, immutable=False):
+    """Builds a Flask response for a static file with ETag/304 handling and content negotiation."""
+    from flask import request, Response
+
+    entry = load_entry(path)
+    etag = entry["etag"]
+    encoding = choose_encoding(request.accept_encodings, entry)
+    # The same ETag is valid for every encoding: it names the content, not the bytes on the wire
+    headers = {
+        "ETag": f'"{etag}"',
+        "Vary": "Accept-Encoding",
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+    }
+
+    if etag in request.if_none_match:
+        return Response(status=304, headers=headers)
+
+    body = entry["data"]
+    if encoding is not None:
+        try:
+            with open(ensure_variant(cache_dir, entry, encoding), "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            # Removed by a sweep (or as another file's old version) in between; write it again
+            with open(ensure_variant(cache_dir, entry, encoding), "rb") as f:
+                body = f.read()
+        headers["Content-Encoding"] = encoding
+    return Response(body, mimetype=entry["mimetype"], headers=headers)
+
+
+def build(directory, cache_dir):
+    """Precompresses every compressible file under directory. Returns the number of variants written."""
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            entry = load_entry(os.path.join(root, name))
+            if not is_compressible(entry["mimetype"]) or len(entry["data"]) < MIN_COMPRESS_SIZE:
+                continue
+            for encoding in available_encodings():
+                if not os.path.exists(variant_path(cache_dir, entry["etag"], encoding)):
+                    ensure_variant(cache_dir, entry, encoding)
+                    written += 1
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompress static assets (gzip, and brotli if installed).")
+    parser.add_argument("command", choices=["build"], help="Action to run.")
+    parser.add_argument("directories", nargs="+", help="Directories to precompress (e.g. frontend_web).")
+    parser.add_argument("--cache-dir", default=os.path.join("instance", "static_cache"),
+                        help="Where compressed variants are stored (default: instance/static_cache).")
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("Note: 'brotli' not installed; only gzip variants will be built.", file=sys.stderr)
+    for directory in args.directories:
+        count = build(directory, args.cache_dir)
+        print(f"{directory}: wrote {count} compressed variant(s) to {args.cache_dir}")
@@ -0,0 +1,146 @@
+import json
+import sys
+import typing
+from typing import List, TypedDict
+
+from lazy_import import lazy_module
+from shared_cache import get_shared_cache
+from upstream import call_upstream
+import deadlines
+
+# Typed records for Gemini's structured-output mode.
+#
+# Instead of asking for JSON in free text (with a long inline example) and then
+# stripping ```json fences by hand, the scripts pass one of these TypedDicts as
+# the response_schema with response_mime_type="application/json". The model is
+# constrained to emit exactly that shape, and parse_record() turns the text
+# straight into a validated record.
+#
+# Every generation is also counted in the shared cache (calls, parse failures,
+# prompt/output tokens per task) so the effect of a prompt change can be measured.
+
+genai = lazy_module("google.generativeai")
+
+
+class AdventureLocation(TypedDict):
+    name: str
+    type: str
+    latitude: float
+    longitude: float
+
+
+class AdventureResults(TypedDict):
+    locations: List[AdventureLocation]
+
+
+class Identification(TypedDict):
+    common_name: str
+    scientific_name: str
+    places_found: str
+    fun_fact: str
+    confidence: float  # 0-1, self-reported; drives the image resolution ladder
+
+
+class IdentifiedSubject(TypedDict):
+    kingdom: str  # "animal", "bird" or "flora"
+    common_name: str
+    scientific_name: str
+    places_found: str
+    fun_fact: str
+    confidence: float
+
+
+class AutoIdentification(TypedDict):
+    subjects: List[IdentifiedSubject]
+
+
+class FishList(TypedDict):
+    fish: List[str]
+
+
+class StructuredOutputError(ValueError):
+    """The model's response did not match the requested schema."""
+
+
+def json_generation_config(schema, max_output_tokens=None):
+    """GenerationConfig that constrains the response to the given TypedDict schema."""
+    options = {"response_mime_type": "application/json", "response_schema": schema}
+    if max_output_tokens:
+        options["max_output_tokens"] = max_output_tokens
+    return genai.GenerationConfig(**options)
+
+
+def _coerce(value, expected, path):
+    origin = typing.get_origin(expected)
+    if origin in (list, List):
+        if not isinstance(value, list):
+            raise StructuredOutputError(f"{path}: expected a list, got {type(value).__name__}")
+        (item_type,) = typing.get_args(expected)
+        return [_coerce(item, item_type, f"{path}[{i}]") for i, item in enumerate(value)]
+    if typing.is_typeddict(expected):
+        if not isinstance(value, dict):
+            raise StructuredOutputError(f"{path}: expected an object, got {type(value).__name__}")
+        record = {}
+        for key, field_type in typing.get_type_hints(expected).items():
+            if key not in value:
+                raise StructuredOutputError(f"{path}: missing field '{key}'")
+            record[key] = _coerce(value[key], field_type, f"{path}.{key}")
+        return record
+    if expected is float:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise StructuredOutputError(f"{path}: expected a number, got {value!r}")
+        return float(value)
+    if expected is str:
+        return value if isinstance(value, str) else str(value)
+    return value
+
+
+def parse_record(text, record_type):
+    """Parses a structured-output response into a record of record_type (raises StructuredOutputError)."""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"Response is not valid JSON: {e}") from e
+    return _coerce(data, record_type, record_type.__name__)
+
+
+def record_generation(task, response, parsed):
+    """Counts a generation (and its token usage) under llm:<task>:* in the shared cache."""
+    try:
+        usage = getattr(response, "usage_metadata", None)
+        cache = get_shared_cache()
+        cache.incr(f"llm:{task}:calls")
+        if not parsed:
+            cache.incr(f"llm:{task}:parse_failures")
+        if usage is not None:
+            cache.incr(f"llm:{task}:prompt_tokens", getattr(usage, "prompt_token_count", 0) or 0)
+            cache.incr(f"llm:{task}:output_tokens", getattr(usage, "candidates_token_count", 0) or 0)
+    except Exception as e:
+        # Metrics must never break a generation
+        print(f"Warning: could not record generation metrics: {e}", file=sys.stderr)
+
+
+def generate_record(model, contents, record_type, task, max_output_tokens=None):
+    """Runs a schema-constrained generation and returns (record, response).
+
+    Raises StructuredOutputError if the response can't be parsed into record_type.
+    Under a request deadline the call's timeout is the time remaining.
+    """
+    options = {}
+    timeout = deadlines.capped_timeout(None)
+    if timeout is not None:
+        options["request_options"] = {"timeout": timeout}
+    response = call_upstream(
+        "gemini", model.generate_content,
+        contents, generation_config=json_generation_config(record_type, max_output_tokens), **options
+    )
+    try:
+        record = parse_record(response.text, record_type)
+    except (StructuredOutputError, ValueError) as e:
+        record_generation(task, response, parsed=False)
+        if isinstance(e, StructuredOutputError):
+            raise
+        # response.text raises ValueError when the candidate was blocked or empty
+        raise StructuredOutputError(f"Response has no text: {e}") from e
+    record_generation(task, response, parsed=True)
+    return record, response
@@ -0,0 +1,255 @@
+import email.utils
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    from lazy_import import lazy_module  # Imported from a script (src/APIs on sys.path)
+    from upstream import call_upstream
+except ImportError:
+    from src.APIs.lazy_import import lazy_module
+    from src.APIs.upstream import call_upstream
+
+requests = lazy_module("requests")
+
+# Caching proxy for map base-layer tiles.
+#
+# With TILE_PROXY=1 the generated maps load their tiles from /tiles/<source>/z/x/y
+# on this server instead of the third-party tile servers. Tiles are kept on
+# disk (cache_dir/<source>/<z>/<x>/<y> plus a .json with content type, ETag and
+# expiry) for as long as the upstream's Cache-Control/Expires allow, then
+# revalidated with If-None-Match/If-Modified-Since. The cache is bounded to
+# max_bytes by evicting the least recently used tiles (file mtime is touched on
+# every hit). Concurrent requests for the same missing tile share one upstream
+# fetch.
+
+PROXY_PREFIX = "/tiles"
+DEFAULT_MAX_BYTES = int(float(os.getenv("TILE_CACHE_MAX_MB", "512")) * 1024 * 1024)
+DEFAULT_TTL = 24 * 3600   # Seconds, when the upstream sends no cache headers
+MIN_TTL = 60              # Floor for very short upstream lifetimes, so a hot tile is not refetched per request
+USER_AGENT = "Hoohacks25-tile-proxy/1.0"  # The OSM tile usage policy requires an identifying User-Agent
+
+# Upstream URL templates; {s} is filled with one of the source's subdomains
+TILE_SOURCES = {
+    "osm": {"url": "https://tile.openstreetmap.org/{z}/{x}/{y}.png"},
+    "stamen-terrain": {"url": "https://tiles.stadiamaps.com/tiles/stamen_terrain/{z}/{x}/{y}.png"},
+    "carto-light": {"url": "https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}.png", "subdomains": "abcd"},
+    "carto-dark": {"url": "https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}.png", "subdomains": "abcd"},
+    "esri-imagery": {"url": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}"},
+}
+
+
+def proxy_enabled():
+    return os.getenv("TILE_PROXY", "0") == "1"
+
+
+def proxy_url(source):
+    """Leaflet URL template for a source served through the proxy."""
+    return f"{PROXY_PREFIX}/{source}/{{z}}/{{x}}/{{y}}"
+
+
+def upstream_url(source, z, x, y):
+    spec = TILE_SOURCES[source]
+    subdomains = spec.get("subdomains", "")
+    # Spread tiles over the subdomains deterministically, like Leaflet does
+    s = subdomains[(x + y) % len(subdomains)] if subdomains else ""
+    return spec["url"].format(s=s, z=z, x=x, y=y)
+
+
+def cache_policy(headers):
+    """(storable, lifetime) from response headers; lifetime is seconds fresh, or None if unspecified."""
+    cache_control = headers.get("Cache-Control", "")
+    directives = {}
+    for part in cache_control.split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"')
+    if "no-store" in directives or "private" in directives:
+        return False, 0
+    for name in ("s-maxage", "max-age"):
+        if name in directives:
+            try:
+                return True, max(0, int(directives[name]))
+            except ValueError:
+                pass
+    if headers.get("Expires"):
+        try:
+            expires = email.utils.parsedate_to_datetime(headers["Expires"]).timestamp()
+            return True, max(0, int(expires - time.time()))
+        except (TypeError, ValueError):
+            return True, 0
+    return True, None
+
+
+class TileCache:
+    """Disk tile cache with LRU eviction and coalesced upstream fetches."""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, fetch=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.fetch = fetch or self._fetch_upstream
+        self._lock = threading.Lock()
+        self._inflight = {}  # tile key -> [Event set when the fetch finishes, (data, meta)]
+        self._size = None    # Bytes on disk (scanned lazily, then tracked)
+
+    # --- Disk layout ---
+
+    def _paths(self, source, z, x, y):
+        base = os.path.join(self.cache_dir, source, str(z), str(x), str(y))
+        return base, base + ".json"
+
+    def _read(self, source, z, x, y):
+        data_path, meta_path = self._paths(source, z, x, y)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(data_path, "rb") as f:
+                data = f.read()
+        except (OSError, ValueError):
+            return None, None
+        return data, meta
+
+    def _write(self, source, z, x, y, data, meta):
+        data_path, meta_path = self._paths(source, z, x, y)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        old_size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+        for path, payload, mode in ((data_path, data, "wb"), (meta_path, json.dumps(meta), "w")):
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, mode) as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        self._track(len(data) - old_size)
+
+    # --- Size bound ---
+
+    def _scan(self):
+        """(mtime, size, data path) of every cached tile."""
+        tiles = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json") or name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                tiles.append((stat.st_mtime, stat.st_size, path))
+        return tiles
+
+    def _track(self, delta):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._scan())
+            else:
+                self._size += delta
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self):
+        """Removes least recently used tiles until the cache is at 90% of max_bytes. Returns bytes freed."""
+        tiles = sorted(self._scan())
+        total = sum(size for _, size, _ in tiles)
+        target = int(self.max_bytes * 0.9)
+        freed = 0
+        for _, size, path in tiles:
+            if total - freed <= target:
+                break
+            for victim in (path, path + ".json"):
+                try:
+                    os.remove(victim)
+                except OSError:
+                    pass
+            freed += size
+        with self._lock:
+            # Rescanned totals also pick up tiles written by other worker processes
+            self._size = total - freed
+        return freed
+
+    # --- Fetching ---
+
+    def _fetch_upstream(self, url, headers):
+        return call_upstream("tiles", requests.get, url, headers=headers, timeout=10)
+
+    def _refresh(self, source, z, x, y, meta):
+        """Fetches (or revalidates) a tile and stores it. Returns (data, meta) or (None, None)."""
+        headers = {"User-Agent": USER_AGENT}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        response = self.fetch(upstream_url(source, z, x, y), headers)
+
+        storable, lifetime = cache_policy(response.headers)
+        ttl = DEFAULT_TTL if lifetime is None else max(lifetime, MIN_TTL)
+        if response.status_code == 304 and meta:
+            meta = dict(meta, expires_at=time.time() + ttl)
+            data, _ = self._read(source, z, x, y)
+            if data is not None:
+                self._write(source, z, x, y, data, meta)
+                return data, meta
+            return None, None
+        if response.status_code != 200:
+            print(f"Tile proxy: {source} {z}/{x}/{y} returned HTTP {response.status_code}", file=sys.stderr)
+            return None, None
+
+        data = response.content
+        meta = {
+            "content_type": response.headers.get("Content-Type", "image/png"),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "expires_at": time.time() + ttl,
+        }
+        if storable:  # no-store/private tiles are passed through but not kept
+            self._write(source, z, x, y, data, meta)
+        return data, meta
+
+    def get(self, source, z, x, y):
+        """Returns (data, content type, seconds fresh) for a tile, or None if it can't be had."""
+        data, meta = self._read(source, z, x, y)
+        if data is not None and meta.get("expires_at", 0) > time.time():
+            self._touch(source, z, x, y)
+            return data, meta["content_type"], int(meta["expires_at"] - time.time())
+
+        key = (source, z, x, y)
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = [threading.Event(), (data, meta)]
+        if not leader:
+            # Another request is already fetching this tile; wait for it and share its result
+            flight[0].wait(15)
+            data, meta = flight[1]
+        else:
+            try:
+                fresh_data, fresh_meta = self._refresh(source, z, x, y, meta)
+                if fresh_data is not None:
+                    data, meta = fresh_data, fresh_meta
+            except Exception as e:
+                # Serve the stale copy (if any) rather than a hole in the map
+                print(f"Tile proxy: fetching {source} {z}/{x}/{y} failed: {e}", file=sys.stderr)
+            finally:
+                flight[1] = (data, meta)
+                with self._lock:
+                    self._inflight.pop(key, None)
+                flight[0].set()
+
+        if data is None:
+            return None
+        return data, meta["content_type"], max(0, int(meta.get("expires_at", 0) - time.time()))
+
+    def _touch(self, source, z, x, y):
+        try:
+            os.utime(self._paths(source, z, x, y)[0])
+        except OSError:
+            pass
+
+
+def tile_etag(data):
+    return hashlib.sha256(data).hexdigest()[:32]
@@ -0,0 +1,335 @@
+import concurrent.futures
+import os
+import sys
+import threading
+import time
+
+try:
+    from shared_cache import get_shared_cache  # Imported from a script (src/APIs on sys.path)
+    import deadlines
+except ImportError:
+    from src.APIs.shared_cache import get_shared_cache
+    from src.APIs import deadlines
+
+# Upstream call layer: every call to Gemini, astronomyapi.com or ipinfo.io goes
+# through call_upstream(), which records its latency and (optionally) hedges it.
+#
+# Hedging: if a call hasn't returned by the upstream's adaptive latency threshold
+# (the HEDGE_PERCENTILE of its recent latencies), an identical second call is
+# fired and whichever finishes first wins. The loser is abandoned and its result
+# ignored (HTTP and gRPC calls can't be interrupted from another thread); calls
+# run on daemon threads, so an abandoned one never delays the process's exit. A budget caps hedges at
+# HEDGE_BUDGET of all calls so tail-cutting can never double the spend.
+#
+# Latency samples and counters live in the shared cache so the threshold is
+# learned across worker processes and the short-lived script processes.
+#
+# Circuit breakers: each upstream's recent outcomes (exceptions and HTTP 5xx
+# responses are failures) are kept over a BREAKER_WINDOW-second window. When at
+# least BREAKER_MIN_CALLS calls failed at BREAKER_FAILURE_RATE or more, the
+# breaker opens and calls fail immediately with CircuitOpenError instead of
+# waiting out a timeout. After BREAKER_COOLDOWN seconds one trial call is let
+# through (half-open): success closes the breaker, failure reopens it. Breaker
+# state is shared too, so one process's timeouts protect every worker.
+#
+# stale_while_revalidate() builds on this: cached results outlive their TTL, and
+# while the upstream is failing the last good value is served (marked stale)
+# and refreshed in the background once the breaker lets calls through again.
+
+HEDGING_ENABLED = os.getenv("UPSTREAM_HEDGING", "0") == "1"  # Opt-in
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.05"))  # Max fraction of calls that may be hedged
+MIN_SAMPLES = 20     # Don't hedge until the threshold is based on this many samples
+LATENCY_WINDOW = 200  # Recent samples kept per upstream
+
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", "60"))           # Seconds of outcomes considered
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))        # Calls in the window before it can open
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))       # Seconds open before a trial call
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+CIRCUIT_OPEN_EXIT_CODE = 69  # Exit status of a script stopped by an open breaker (EX_UNAVAILABLE)
+REFRESH_INTERVAL = 5  # Seconds between background refresh attempts of stale values
+
+
+
+def _submit(fn, *args):
+    """Runs fn(*args) on a new daemon thread and returns its Future.
+
+    Not a ThreadPoolExecutor: interpreter exit joins pool threads, so an abandoned hedge
+    loser would keep a script process alive until the slow upstream call returned.
+    """
+    future = concurrent.futures.Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="upstream", daemon=True).start()
+    return future
+
+
+class CircuitOpenError(RuntimeError):
+    """The upstream's circuit breaker is open; the call was not attempted."""
+
+
+def _counter(upstream, name):
+    return f"upstream:{upstream}:{name}"
+
+
+def _incr(upstream, name, amount=1):
+    try:
+        get_shared_cache().incr(_counter(upstream, name), amount)
+    except Exception as e:
+        print(f"Warning: could not record upstream metric {name}: {e}", file=sys.stderr)
+
+
+def record_latency(upstream, seconds):
+    """Appends a latency sample to the upstream's sliding window."""
+    try:
+        cache = get_shared_cache()
+        key = _counter(upstream, "latencies")
+        with cache.transaction():
+            samples = cache.get(key, [])
+            samples.append(round(seconds, 4))
+            cache.set(key, samples[-LATENCY_WINDOW:])
+    except Exception as e:
+        print(f"Warning: could not record latency for {upstream}: {e}", file=sys.stderr)
+
+
+def latency_percentile(upstream, percentile):
+    """The given percentile of recent latencies, or None with too few samples."""
+    samples = get_shared_cache().get(_counter(upstream, "latencies"), [])
+    if len(samples) < MIN_SAMPLES:
+        return None
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+    return samples[index]
+
+
+def _within_budget(upstream):
+    counters = get_shared_cache().counters(f"upstream:{upstream}:")
+    calls = counters.get(_counter(upstream, "calls"), 0)
+    hedges = counters.get(_counter(upstream, "hedges"), 0)
+    return hedges + 1 <= HEDGE_BUDGET * max(calls, 1)
+
+
+def _timed(upstream, fn, args, kwargs):
+    start = time.monotonic()
+    result = fn(*args, **kwargs)
+    record_latency(upstream, time.monotonic() - start)
+    return result
+
+
+def _breaker_key(upstream):
+    return _counter(upstream, "breaker")
+
+
+def breaker_state(upstream):
+    """"closed", "open" or "half_open" (an open breaker whose cooldown has passed reads as half_open)."""
+    breaker = get_shared_cache().get(_breaker_key(upstream)) or {}
+    state = breaker.get("state", CLOSED)
+    if state == OPEN and time.time() - breaker["opened_at"] >= BREAKER_COOLDOWN:
+        return HALF_OPEN
+    return state
+
+
+def _allow_call(upstream):
+    """True if the breaker lets this call through (claiming the trial call when half-open)."""
+    cache = get_shared_cache()
+    now = time.time()
+    with cache.transaction():
+        breaker = cache.get(_breaker_key(upstream)) or {"state": CLOSED, "outcomes": []}
+        if breaker["state"] == CLOSED:
+            return True
+        if breaker["state"] == OPEN and now - breaker["opened_at"] < BREAKER_COOLDOWN:
+            return False
+        if breaker["state"] == HALF_OPEN and now - breaker["trial_started"] < BREAKER_COOLDOWN:
+            return False  # Another caller's trial call is in flight
+        # Cooldown over (or a trial call never reported back): this call is the trial
+        breaker.update(state=HALF_OPEN, trial_started=now)
+        cache.set(_breaker_key(upstream), breaker)
+        return True
+
+
+def _record_outcome(upstream, ok):
+    try:
+        cache = get_shared_cache()
+        now = time.time()
+        with cache.transaction():
+            breaker = cache.get(_breaker_key(upstream)) or {"state": CLOSED, "outcomes": []}
+            if breaker["state"] == HALF_OPEN:
+                breaker = {"state": CLOSED, "outcomes": []} if ok else dict(breaker, state=OPEN, opened_at=now)
+                opened = not ok
+            else:
+                outcomes = [o for o in breaker.get("outcomes", []) if o[0] >= now - BREAKER_WINDOW]
+                outcomes.append([round(now, 3), 1 if ok else 0])
+                failures = sum(1 for o in outcomes if not o[1])
+                opened = (breaker["state"] == CLOSED and len(outcomes) >= BREAKER_MIN_CALLS
+                          and failures / len(outcomes) >= BREAKER_FAILURE_RATE)
+                breaker = {"state": OPEN, "opened_at": now, "outcomes": []} if opened else dict(breaker, outcomes=outcomes)
+            cache.set(_breaker_key(upstream), breaker)
+        if opened:
+            print(f"Circuit breaker for {upstream} opened; failing fast for {BREAKER_COOLDOWN:g}s.", file=sys.stderr)
+            _incr(upstream, "breaker_opens")
+    except Exception as e:
+        print(f"Warning: could not record outcome for {upstream}: {e}", file=sys.stderr)
+
+
+def _is_failure(result):
+    # HTTP responses (requests) signal upstream trouble with 5xx rather than an exception
+    status = getattr(result, "status_code", None)
+    return isinstance(status, int) and status >= 500
+
+
+def call_upstream(upstream, fn, *args, hedge=None, **kwargs):
+    """Calls fn(*args, **kwargs) as a request to the named upstream, hedging it when enabled.
+
+    hedge overrides UPSTREAM_HEDGING for this call. Only use it for idempotent calls.
+    Raises CircuitOpenError without calling fn while the upstream's breaker is open.
+    Under a request deadline a timeout= argument is capped at the time remaining, and
+    DeadlineExceeded is raised once it has run out.
+    """
+    if "timeout" in kwargs:
+        kwargs["timeout"] = deadlines.capped_timeout(kwargs["timeout"])
+    else:
+        deadlines.check()
+    if not _allow_call(upstream):
+        _incr(upstream, "short_circuits")
+        raise CircuitOpenError(f"{upstream} is unavailable (circuit breaker open); try again shortly.")
+    _incr(upstream, "calls")
+    try:
+        result = _call(upstream, fn, args, kwargs, hedge)
+    except deadlines.DeadlineExceeded:
+        # The request ran out of time, which says nothing about the upstream's health
+        raise
+    except Exception:
+        _record_outcome(upstream, ok=False)
+        raise
+    _record_outcome(upstream, ok=not _is_failure(result))
+    return result
+
+
+def _call(upstream, fn, args, kwargs, hedge):
+    if not (HEDGING_ENABLED if hedge is None else hedge):
+        return _timed(upstream, fn, args, kwargs)
+
+    threshold = latency_percentile(upstream, HEDGE_PERCENTILE)
+    if threshold is None:
+        return _timed(upstream, fn, args, kwargs)
+
+    primary = _submit(_timed, upstream, fn, args, kwargs)
+    left = deadlines.remaining()
+    done, _ = concurrent.futures.wait([primary], timeout=threshold if left is None else min(threshold, max(left, 0)))
+    if done:
+        return primary.result()
+
+    if not _within_budget(upstream):
+        _incr(upstream, "hedges_denied")
+        return _result(primary)
+
+    _incr(upstream, "hedges")
+    backup = _submit(_timed, upstream, fn, args, kwargs)
+    pending = {primary, backup}
+    first_error = None
+    while pending:
+        done, pending = concurrent.futures.wait(pending, timeout=deadlines.remaining(),
+                                                return_when=concurrent.futures.FIRST_COMPLETED)
+        if not done:
+            raise deadlines.DeadlineExceeded(f"{upstream} did not answer before the request deadline.")
+        for future in done:
+            if future.exception() is None:
+                for loser in pending:
+                    loser.cancel()
+                if future is backup:
+                    _incr(upstream, "hedge_wins")
+                return future.result()
+            first_error = first_error or future.exception()
+    raise first_error
+
+
+def _result(future):
+    """future.result(), giving up at the request deadline (the call itself is abandoned)."""
+    try:
+        return future.result(timeout=deadlines.remaining())
+    except concurrent.futures.TimeoutError:
+        raise deadlines.DeadlineExceeded("Upstream call did not finish before the request deadline.") from None
+
+
+# --- Stale-while-revalidate ---
+
+_refresh_lock = threading.Lock()
+_pending_refreshes = {}  # cache key -> (upstream, fetch, ok, ttl)
+_refresher = None
+
+
+def _refresh_loop():
+    while True:
+        time.sleep(REFRESH_INTERVAL)
+        with _refresh_lock:
+            pending = list(_pending_refreshes.items())
+        for key, (upstream, fetch, ok, ttl) in pending:
+            if breaker_state(upstream) == OPEN:
+                continue  # Still cooling down; don't spend the trial call here
+            try:
+                value = fetch()
+            except Exception as e:
+                print(f"Background refresh of {key} failed: {e}", file=sys.stderr)
+                continue
+            if ok(value):
+                get_shared_cache().set(key, value, ttl=ttl)
+                with _refresh_lock:
+                    _pending_refreshes.pop(key, None)
+
+
+def _schedule_refresh(key, upstream, fetch, ok, ttl):
+    global _refresher
+    with _refresh_lock:
+        _pending_refreshes[key] = (upstream, fetch, ok, ttl)
+        if _refresher is None or not _refresher.is_alive():
+            _refresher = threading.Thread(target=_refresh_loop, name="stale-refresher", daemon=True)
+            _refresher.start()
+
+
+def stale_while_revalidate(key, ttl, upstream, fetch, ok=bool):
+    """Cached fetch() that falls back to the last good value while the upstream is failing.
+
+    Fresh cached values are returned as-is. When the entry has expired and the upstream's
+    breaker is open, or fetch() fails (ok(result) is false), the last good value is returned
+    with "stale": True and refreshed in the background. fetch() must return a dict.
+    """
+    cache = get_shared_cache()
+    value, expired = cache.get_with_age(key)
+    if value is not None and not expired:
+        return value
+    if value is not None and breaker_state(upstream) == OPEN:
+        _incr(upstream, "stale_served")
+        _schedule_refresh(key, upstream, fetch, ok, ttl)
+        return dict(value, stale=True)
+
+    fresh = fetch()
+    if ok(fresh):
+        cache.set(key, fresh, ttl=ttl)
+        return fresh
+    if value is not None:
+        _incr(upstream, "stale_served")
+        _schedule_refresh(key, upstream, fetch, ok, ttl)
+        return dict(value, stale=True)
+    return fresh
+
+
+def hedge_metrics(counters):
+    """Derived hedge rate and win rate (and current breaker state) per upstream from the shared counters."""
+    derived = {}
+    for key, calls in counters.items():
+        if key.startswith("upstream:") and key.endswith(":calls") and calls:
+            upstream = key[len("upstream:"):-len(":calls")]
+            hedges = counters.get(_counter(upstream, "hedges"), 0)
+            wins = counters.get(_counter(upstream, "hedge_wins"), 0)
+            derived[_counter(upstream, "hedge_rate")] = hedges / calls
+            derived[_counter(upstream, "hedge_win_rate")] = wins / hedges if hedges else 0.0
+            derived[_counter(upstream, "breaker_state")] = breaker_state(upstream)
+    return derived
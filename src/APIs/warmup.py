@@ -0,0 +1,198 @@
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+
+try:
+    from shared_cache import get_shared_cache  # Imported from a script (src/APIs on sys.path)
+except ImportError:
+    from src.APIs.shared_cache import get_shared_cache
+
+# Warm-up scheduler: pre-generates adventure maps for popular locations.
+#
+# Every plan_trip request is counted against a grid cell (CELL_STEP degrees,
+# plus the radius) in hourly buckets in the shared cache. During the off-peak
+# window the scheduler takes the cells with the most requests over the last
+# WINDOW_HOURS, and queues a low-priority background job for each one that has
+# no precomputed map yet, at most RATE_PER_HOUR per hour. The job renders the
+# map for the cell centre and stores its URL under the cell, so plan_trip
+# requests that land in the cell are answered without running the finder.
+#
+# One process runs the scheduler at a time (a lease in the shared cache), so
+# pre-forked workers don't multiply the budget.
+
+ENABLED = os.getenv("WARMUP", "0") == "1"  # Opt-in: warm-up runs spend model calls
+CELL_STEP = float(os.getenv("WARMUP_CELL_STEP", "0.05"))     # Degrees (~5 km)
+OFF_PEAK = os.getenv("WARMUP_HOURS", "2-6")                  # Local server hours, start-end (may wrap midnight)
+RATE_PER_HOUR = int(os.getenv("WARMUP_RATE", "10"))          # Max warm-up runs started per hour
+MIN_HITS = int(os.getenv("WARMUP_MIN_HITS", "3"))            # Requests in the window before a cell counts as hot
+WINDOW_HOURS = int(os.getenv("WARMUP_WINDOW_HOURS", "24"))
+RESULT_TTL = int(os.getenv("WARMUP_TTL", str(24 * 3600)))    # Seconds a precomputed map is served
+TICK_INTERVAL = 60  # Seconds between scheduler passes
+
+JOB_KIND = "warm_trip"
+JOB_PRIORITY = 10  # Claimed after user jobs (priority 0)
+
+
+def _hour_bucket(now=None):
+    return int((now or time.time()) // 3600)
+
+
+def cell_key(params):
+    """Grid cell ("row:col:radius") of a trip request's params."""
+    row = math.floor(params["latitude"] / CELL_STEP)
+    col = math.floor(params["longitude"] / CELL_STEP)
+    return f"{row}:{col}:{round(float(params['radius_miles']), 1)}"
+
+
+def record_request(params, cache=None):
+    """Counts a plan_trip request against its cell in the current hour's bucket."""
+    try:
+        cache = cache or get_shared_cache()
+        key = cell_key(params)
+        bucket_key = f"warmup:hits:{_hour_bucket()}"
+        with cache.transaction():
+            hits = cache.get(bucket_key, {})
+            hits[key] = hits.get(key, 0) + 1
+            # Buckets expire on their own once they fall out of the window
+            cache.set(bucket_key, hits, ttl=(WINDOW_HOURS + 1) * 3600)
+    except Exception as e:
+        print(f"Warning: could not record warm-up demand: {e}", file=sys.stderr)
+
+
+def hot_cells(cache=None, window_hours=WINDOW_HOURS, min_hits=MIN_HITS):
+    """[(cell key, hits)] over the last window_hours, most requested first."""
+    cache = cache or get_shared_cache()
+    current = _hour_bucket()
+    totals = {}
+    for bucket in range(current - window_hours + 1, current + 1):
+        for key, count in cache.get(f"warmup:hits:{bucket}", {}).items():
+            totals[key] = totals.get(key, 0) + count
+    return sorted(((k, n) for k, n in totals.items() if n >= min_hits), key=lambda item: (-item[1], item[0]))
+
+
+def cell_params(key):
+    """Trip params for the centre of a cell."""
+    row, col, radius = key.split(":")
+    return {
+        "latitude": round((int(row) + 0.5) * CELL_STEP, 5),
+        "longitude": round((int(col) + 0.5) * CELL_STEP, 5),
+        "radius_miles": float(radius),
+    }
+
+
+def lookup(params, cache=None, allow_stale=False):
+    """The precomputed result ({"map_url": ...}) for the request's cell, or None.
+
+    allow_stale also returns an expired result (e.g. while the model is unavailable).
+    """
+    try:
+        cache = cache or get_shared_cache()
+        if allow_stale:
+            return cache.get_with_age(f"warmup:map:{cell_key(params)}")[0]
+        return cache.get(f"warmup:map:{cell_key(params)}")
+    except Exception as e:
+        print(f"Warning: could not read warm-up cache: {e}", file=sys.stderr)
+        return None
+
+
+def store_result(params, result, cache=None):
+    cache = cache or get_shared_cache()
+    cache.delete(f"warmup:pending:{cell_key(params)}")
+    cache.set(f"warmup:map:{cell_key(params)}", dict(result, generated_at=time.time()), ttl=RESULT_TTL)
+
+
+def in_off_peak(hours=OFF_PEAK, now=None):
+    """True when the local hour is inside the start-end window ("always" for any hour)."""
+    if hours == "always":
+        return True
+    start, end = (int(h) for h in hours.split("-"))
+    hour = time.localtime(now).tm_hour
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+def _take_budget(cache):
+    """Reserves one warm-up run from this hour's budget; False when it's used up."""
+    key = f"warmup:budget:{_hour_bucket()}"
+    with cache.transaction():
+        used = cache.get(key, 0)
+        if used >= RATE_PER_HOUR:
+            return False
+        cache.set(key, used + 1, ttl=2 * 3600)
+        return True
+
+
+def _hold_lease(cache, ttl):
+    """Takes or renews the scheduler lease; only the holder schedules warm-up runs."""
+    with cache.transaction():
+        holder = cache.get("warmup:lease")
+        if holder not in (None, os.getpid()):
+            return False
+        cache.set("warmup:lease", os.getpid(), ttl=ttl)
+        return True
+
+
+def schedule(submit, cache=None, limit=None):
+    """One scheduler pass: queues warm-up jobs for hot cells without a precomputed map.
+
+    submit(params) queues a JOB_KIND job. Returns the number of jobs queued.
+    """
+    cache = cache or get_shared_cache()
+    queued = 0
+    for key, hits in hot_cells(cache):
+        if limit is not None and queued >= limit:
+            break
+        if cache.get(f"warmup:map:{key}") is not None or cache.get(f"warmup:pending:{key}") is not None:
+            continue
+        if not _take_budget(cache):
+            break
+        submit(cell_params(key))
+        # Don't queue the cell again while its job is waiting or running
+        cache.set(f"warmup:pending:{key}", True, ttl=3600)
+        cache.incr("warmup:runs")
+        queued += 1
+    return queued
+
+
+class WarmupScheduler:
+    """Background thread that runs schedule() every TICK_INTERVAL seconds during off-peak hours."""
+
+    def __init__(self, submit, cache=None, interval=TICK_INTERVAL):
+        self.submit = submit
+        self.cache = cache
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="warmup-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                cache = self.cache or get_shared_cache()
+                if in_off_peak() and _hold_lease(cache, ttl=3 * self.interval):
+                    queued = schedule(self.submit, cache)
+                    if queued:
+                        print(f"Warm-up: queued {queued} map(s) for popular locations.", file=sys.stderr)
+            except Exception as e:
+                print(f"Warning: warm-up pass failed: {e}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the plan_trip cells the warm-up scheduler considers hot.")
+    parser.add_argument("--window-hours", type=int, default=WINDOW_HOURS)
+    parser.add_argument("--min-hits", type=int, default=MIN_HITS)
+    args = parser.parse_args()
+
+    cache = get_shared_cache()
+    for key, hits in hot_cells(cache, args.window_hours, args.min_hits):
+        params = cell_params(key)
+        status = "precomputed" if cache.get(f"warmup:map:{key}") is not None else "pending"
+        print(f"{hits:6d}  {params['latitude']:.4f}, {params['longitude']:.4f}  r={params['radius_miles']} mi  {status}")